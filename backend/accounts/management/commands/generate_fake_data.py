@@ -1,21 +1,296 @@
 """
 Django management command to generate fake data
-Usage: python manage.py generate_fake_data
+Usage: python manage.py generate_fake_data [--clear] [--scale N [--workers N] [--batch-size N]]
 """
 
 from django.core.management.base import BaseCommand
+import os
 import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime, timedelta, time
 from django.utils import timezone
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connections
+from django.db.models import Count, Max, Min, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 
 from businesses.models import Category, City, Area, Business, Staff, StaffSchedule
+from businesses.geo import encode_geohash
+from businesses.normalization import update_normalized_fields
+from businesses.ranking import update_all_ranking_scores
+from businesses.search import update_search_vectors
 from services.models import ServiceCategory, Service, ServiceStaff
+from bookings.availability import local_weekday
 from bookings.models import Booking
+from bookings.occupancy import interval_mask, rebuild_occupancy, to_interval
 from reviews.models import Review
+from reviews.stats import recompute_review_stats
 
 User = get_user_model()
 
+# Rows generated per 1.0 of --scale
+SCALE_CUSTOMERS = 100000
+SCALE_BUSINESSES = 2000
+SCALE_BOOKINGS = 1000000
+
+# Phone prefixes for generated accounts, kept apart from the fixed ones
+SCALE_CUSTOMER_PREFIX = '0990'
+SCALE_OWNER_PREFIX = '0991'
+
+# Bookings per work item handed to a worker
+SCALE_WORK_SIZE = 50000
+
+# Past bookings span half a year, future ones the booking horizon
+SCALE_PAST_DAYS = 180
+SCALE_FUTURE_DAYS = 30
+
+# Draws per booking before giving up on a slot for it; the busiest
+# salons fill up and get fewer bookings than allocated
+SCALE_BOOKING_ATTEMPTS = 10
+
+# Demand peaks late morning and after work
+HOUR_WEIGHTS = {
+    9: 2, 10: 4, 11: 6, 12: 5, 13: 3, 14: 3,
+    15: 4, 16: 6, 17: 8, 18: 9, 19: 7, 20: 3,
+}
+
+# By date.weekday(): Thursday is the busiest day, Friday the quietest
+WEEKDAY_WEIGHTS = [5, 5, 6, 9, 2, 8, 6]
+
+# Ratings lean positive
+RATING_WEIGHTS = {1: 3, 2: 4, 3: 10, 4: 33, 5: 50}
+
+SERVICE_NAMES = {
+    'hair': ['کوتاهی مو', 'رنگ مو', 'براشینگ', 'کراتین', 'هایلایت'],
+    'nails': ['مانیکور', 'پدیکور', 'کاشت ناخن', 'ژلیش'],
+    'makeup': ['آرایش عروس', 'آرایش مجلسی', 'میکاپ روزانه'],
+    'haircut': ['کوتاهی مردانه', 'فید', 'کوتاهی کودک'],
+    'shaving': ['اصلاح', 'اصلاح و فرم ریش', 'شیو'],
+    'massage': ['ماساژ سوئدی', 'ماساژ ریلکسی', 'ماساژ سنگ داغ'],
+}
+
+# Customer ids, loaded once per worker process
+_customer_ids = None
+
+
+def get_customer_ids():
+    global _customer_ids
+    if _customer_ids is None:
+        _customer_ids = list(
+            User.objects.filter(
+                phone_number__startswith=SCALE_CUSTOMER_PREFIX
+            ).values_list('id', flat=True)
+        )
+    return _customer_ids
+
+
+def zipf_weights(count, rng, exponent=1.1):
+    """Skewed popularity weights in random order: a few items get most of the traffic"""
+    weights = [1 / (rank + 1) ** exponent for rank in range(count)]
+    rng.shuffle(weights)
+    return weights
+
+
+def allocate(total, weights):
+    """Split a total proportionally to weights, keeping the sum exact"""
+    scale = total / sum(weights)
+    counts = [int(weight * scale) for weight in weights]
+    for index in range(total - sum(counts)):
+        counts[index % len(counts)] += 1
+    return counts
+
+
+def generate_bookings(work, seed, batch_size):
+    """
+    Worker: create bookings and their reviews for a list of
+    (business_id, count) pairs. Runs in its own process and connection.
+
+    Bookings fall within business hours and the staff member's schedule
+    and don't overlap on a staff member; a booking that finds no such
+    slot in SCALE_BOOKING_ATTEMPTS draws is skipped.
+    """
+    connections.close_all()
+    rng = random.Random(seed)
+    customer_ids = get_customer_ids()
+    business_ids = [business_id for business_id, _ in work]
+
+    staff = {}
+    for staff_id, business_id in Staff.objects.filter(
+        business_id__in=business_ids
+    ).values_list('id', 'business_id'):
+        staff.setdefault(business_id, []).append(staff_id)
+
+    hours = {}
+    for business_id, opens_at, closes_at, closed_days in Business.objects.filter(
+        id__in=business_ids
+    ).values_list('id', 'opens_at', 'closes_at', 'closed_days'):
+        hours[business_id] = (to_interval(opens_at, closes_at), set(closed_days))
+
+    # Staff without a schedule work business hours
+    schedules = {}
+    for staff_id, weekday, start_time, end_time, is_available in StaffSchedule.objects.filter(
+        staff__business_id__in=business_ids
+    ).values_list('staff_id', 'weekday', 'start_time', 'end_time', 'is_available'):
+        schedule = schedules.setdefault(staff_id, {})
+        if is_available:
+            schedule[weekday] = to_interval(start_time, end_time)
+
+    # Staff-day minute bitmaps, from earlier runs and then each drawn booking
+    occupied = {}
+    for staff_id, date, start_time, end_time in Booking.objects.filter(
+        business_id__in=business_ids, staff__isnull=False
+    ).values_list('staff_id', 'date', 'time', 'end_time'):
+        occupied[(staff_id, date)] = (
+            occupied.get((staff_id, date), 0) | interval_mask(*to_interval(start_time, end_time))
+        )
+
+    services = {}
+    for service_id, business_id, price, final, duration in Service.objects.filter(
+        business_id__in=business_ids
+    ).values_list('id', 'business_id', 'price', 'discounted_price', 'duration_minutes'):
+        services.setdefault(business_id, []).append((service_id, price, final or price, duration))
+
+    today = timezone.now().date()
+    dates = [today + timedelta(days=offset) for offset in range(-SCALE_PAST_DAYS, SCALE_FUTURE_DAYS + 1)]
+    date_weights = [WEEKDAY_WEIGHTS[date.weekday()] for date in dates]
+    day_hours = list(HOUR_WEIGHTS)
+    hour_weights = list(HOUR_WEIGHTS.values())
+    ratings = list(RATING_WEIGHTS)
+    rating_weights = list(RATING_WEIGHTS.values())
+
+    def pick_slot(business_id, duration):
+        """Draw (date, staff_id, start minutes) for a free slot, or None"""
+        (opens, closes), closed_days = hours[business_id]
+
+        for _ in range(SCALE_BOOKING_ATTEMPTS):
+            date = rng.choices(dates, date_weights)[0]
+            staff_id = rng.choice(staff[business_id])
+            weekday = local_weekday(date)
+            if weekday in closed_days:
+                continue
+
+            schedule = schedules.get(staff_id)
+            window = schedule.get(weekday) if schedule is not None else (opens, closes)
+            if window is None:
+                continue
+            start = rng.choices(day_hours, hour_weights)[0] * 60 + rng.choice([0, 15, 30, 45])
+            end = start + duration
+            if start < max(opens, window[0]) or end > min(closes, window[1]):
+                continue
+
+            mask = interval_mask(start, end)
+            if occupied.get((staff_id, date), 0) & mask:
+                continue
+            occupied[(staff_id, date)] = occupied.get((staff_id, date), 0) | mask
+            return date, staff_id, start
+
+        return None
+
+    def rows():
+        for business_id, count in work:
+            business_services = services[business_id]
+            service_weights = zipf_weights(len(business_services), rng)
+            picked_services = rng.choices(business_services, service_weights, k=count)
+
+            for service_id, price, final, duration in picked_services:
+                slot = pick_slot(business_id, duration)
+                if slot is None:
+                    continue
+                date, staff_id, start_minutes = slot
+                start = datetime.combine(date, time()) + timedelta(minutes=start_minutes)
+                end = start + timedelta(minutes=duration)
+
+                if date < today:
+                    status = rng.choices(['completed', 'cancelled', 'no_show'], [85, 10, 5])[0]
+                else:
+                    status = rng.choices(['confirmed', 'pending'], [80, 20])[0]
+
+                yield Booking(
+                    customer_id=rng.choice(customer_ids),
+                    business_id=business_id,
+                    service_id=service_id,
+                    staff_id=staff_id,
+                    date=date,
+                    time=start.time(),
+                    end_time=end.time(),
+                    duration_minutes=duration,
+                    service_price=price,
+                    final_price=final,
+                    discount_amount=price - final,
+                    status=status,
+                    is_cancelled=status == 'cancelled',
+                )
+
+    created = reviewed = 0
+    batch = []
+    for booking in rows():
+        batch.append(booking)
+        if len(batch) >= batch_size:
+            reviewed += create_batch(batch, rng, ratings, rating_weights)
+            created += len(batch)
+            batch = []
+    if batch:
+        reviewed += create_batch(batch, rng, ratings, rating_weights)
+        created += len(batch)
+
+    return created, reviewed
+
+
+def create_batch(bookings, rng, ratings, rating_weights):
+    """Insert a batch of bookings and review about a third of the completed ones"""
+    bookings = Booking.objects.bulk_create(bookings)
+
+    reviews = []
+    for booking in bookings:
+        if booking.status != 'completed' or rng.random() > 0.3:
+            continue
+        rating = rng.choices(ratings, rating_weights)[0]
+        reviews.append(Review(
+            customer_id=booking.customer_id,
+            business_id=booking.business_id,
+            booking_id=booking.id,
+            rating=rating,
+            service_quality=max(1, min(5, rating + rng.randint(-1, 1))),
+            cleanliness=max(1, min(5, rating + rng.randint(-1, 1))),
+            staff_behavior=max(1, min(5, rating + rng.randint(-1, 1))),
+            value_for_money=max(1, min(5, rating + rng.randint(-1, 1))),
+            comment='بسیار راضی بودم' if rating >= 4 else 'می‌توانست بهتر باشد',
+            is_approved=rng.random() < 0.95,
+            is_verified=True,
+        ))
+    Review.objects.bulk_create(reviews)
+
+    return len(reviews)
+
+
+def recompute_counters():
+    """Recompute denormalized counters and price ranges in one UPDATE per table"""
+    def subquery(queryset, field, aggregate, default=None):
+        expression = Subquery(
+            queryset.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(value=aggregate)
+            .values('value')
+        )
+        return expression if default is None else Coalesce(expression, Value(default))
+
+    active_services = Service.objects.filter(is_active=True)
+    # Like Booking.complete(), only completed bookings count
+    completed = Booking.objects.filter(status='completed')
+    Business.objects.update(
+        total_bookings=subquery(completed, 'business', Count('id'), 0),
+        min_service_price=subquery(active_services, 'business', Min('price')),
+        max_service_price=subquery(active_services, 'business', Max('price')),
+        active_services_count=subquery(active_services, 'business', Count('id'), 0),
+    )
+    Service.objects.update(
+        total_bookings=subquery(completed, 'service', Count('id'), 0),
+    )
+    # Review counts and ratings, through the running review stats
+    recompute_review_stats()
+
 
 class Command(BaseCommand):
     help = 'Generate fake data for testing'
@@ -26,6 +301,32 @@ class Command(BaseCommand):
             action='store_true',
             help='Clear existing data before generating',
         )
+        parser.add_argument(
+            '--scale',
+            type=float,
+            help=(
+                f'Bulk mode: generate {SCALE_CUSTOMERS} customers, {SCALE_BUSINESSES} '
+                f'businesses and {SCALE_BOOKINGS} bookings per 1.0 of scale'
+            ),
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Worker processes for bulk mode bookings (default: CPU count)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows per bulk insert in bulk mode',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed for bulk mode',
+        )
 
     def handle(self, *args, **options):
         if options['clear']:
@@ -42,6 +343,10 @@ class Command(BaseCommand):
             User.objects.filter(is_superuser=False).delete()
             self.stdout.write(self.style.SUCCESS('✅ Data cleared'))
 
+        if options['scale']:
+            self.generate_at_scale(options)
+            return
+
         self.stdout.write(self.style.SUCCESS('🚀 Starting fake data generation...'))
 
         # Create users
@@ -71,6 +376,234 @@ class Command(BaseCommand):
         self.stdout.write(self.style.SUCCESS('='*60))
         self.print_summary()
 
+    def generate_at_scale(self, options):
+        scale = options['scale']
+        batch_size = options['batch_size']
+        rng = random.Random(options['seed'])
+        
+        self.stdout.write(self.style.SUCCESS(f'🚀 Generating data at scale {scale}...'))
+        
+        # Reference data is small; reuse the regular fixtures
+        self.create_categories()
+        self.create_locations()
+        self.create_service_categories()
+        
+        customers = self.bulk_create_customers(int(SCALE_CUSTOMERS * scale), batch_size)
+        business_ids = self.bulk_create_businesses(int(SCALE_BUSINESSES * scale), batch_size, rng)
+        self.bulk_create_staff_and_services(business_ids, batch_size, rng)
+        
+        if not customers or not business_ids:
+            self.stdout.write(self.style.WARNING('⚠️  Scale too small, nothing to book'))
+            return
+        
+        # Popular salons get most of the bookings
+        counts = allocate(int(SCALE_BOOKINGS * scale), zipf_weights(len(business_ids), rng))
+        work = []
+        items = []
+        size = 0
+        for business_id, count in zip(business_ids, counts):
+            items.append((business_id, count))
+            size += count
+            if size >= SCALE_WORK_SIZE:
+                work.append(items)
+                items = []
+                size = 0
+        if items:
+            work.append(items)
+        
+        self.stdout.write(f'\n📅 Creating {sum(counts)} bookings in {len(work)} work items...')
+        
+        bookings = reviews = 0
+        seeds = [rng.randrange(2 ** 32) for _ in work]
+        if options['workers'] <= 1:
+            for items, seed in zip(work, seeds):
+                created, reviewed = generate_bookings(items, seed, batch_size)
+                bookings += created
+                reviews += reviewed
+        else:
+            # Forked workers must not share the parent's connection
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+                futures = [
+                    executor.submit(generate_bookings, items, seed, batch_size)
+                    for items, seed in zip(work, seeds)
+                ]
+                for future in as_completed(futures):
+                    created, reviewed = future.result()
+                    bookings += created
+                    reviews += reviewed
+                    self.stdout.write(f'   {bookings} bookings, {reviews} reviews')
+        
+        self.stdout.write(self.style.SUCCESS(f'✅ Created {bookings} bookings and {reviews} reviews'))
+        
+        self.stdout.write('\n🔢 Recomputing counters, occupancy, search index and ranking...')
+        recompute_counters()
+        rebuild_occupancy(business_ids=business_ids)
+        update_normalized_fields('businesses.Business', Business.objects.filter(pk__in=business_ids))
+        update_normalized_fields('services.Service', Service.objects.filter(business_id__in=business_ids))
+        update_search_vectors(business_ids)
+        update_all_ranking_scores()
+        
+        self.stdout.write(self.style.SUCCESS('\n' + '='*60))
+        self.stdout.write(self.style.SUCCESS('🎉 Bulk data generation completed!'))
+        self.stdout.write(self.style.SUCCESS('='*60))
+
+    def bulk_create_customers(self, count, batch_size):
+        self.stdout.write(f'\n👥 Creating {count} customers...')
+        
+        # Hash once; every generated customer shares the password
+        password = make_password('customer123')
+        first_names = ['علی', 'سارا', 'رضا', 'مریم', 'حسین', 'زهرا', 'محمد', 'فاطمه', 'امیر', 'نگار']
+        last_names = ['احمدی', 'محمدی', 'کریمی', 'رضایی', 'نوری', 'حسینی', 'صادقی', 'کاظمی']
+        
+        for start in range(0, count, batch_size):
+            User.objects.bulk_create(
+                [
+                    User(
+                        phone_number=f'{SCALE_CUSTOMER_PREFIX}{index:07d}',
+                        password=password,
+                        first_name=first_names[index % len(first_names)],
+                        last_name=last_names[index % len(last_names)],
+                        gender='female' if index % 3 else 'male',
+                        user_type='customer',
+                        is_verified=True,
+                    )
+                    for index in range(start, min(start + batch_size, count))
+                ],
+                ignore_conflicts=True,
+            )
+        
+        customers = get_customer_ids()
+        self.stdout.write(self.style.SUCCESS(f'✅ {len(customers)} customers'))
+        return customers
+
+    def bulk_create_businesses(self, count, batch_size, rng):
+        self.stdout.write(f'\n🏢 Creating {count} businesses...')
+        
+        password = make_password('owner123')
+        User.objects.bulk_create(
+            [
+                User(
+                    phone_number=f'{SCALE_OWNER_PREFIX}{index:07d}',
+                    password=password,
+                    user_type='business_owner',
+                    is_verified=True,
+                )
+                for index in range(count)
+            ],
+            batch_size=batch_size,
+            ignore_conflicts=True,
+        )
+        owners = dict(
+            User.objects.filter(
+                phone_number__startswith=SCALE_OWNER_PREFIX
+            ).values_list('phone_number', 'id')
+        )
+        
+        genders = {'mens-salon': 'male', 'womens-salon': 'female'}
+        businesses = []
+        for index in range(count):
+            category = rng.choice(self.categories)
+            area = rng.choice(self.tehran_areas)
+            # Around Tehran
+            latitude = round(rng.uniform(35.60, 35.80), 6)
+            longitude = round(rng.uniform(51.20, 51.60), 6)
+            businesses.append(Business(
+                owner_id=owners[f'{SCALE_OWNER_PREFIX}{index:07d}'],
+                name=f'{category.name} {index + 1}',
+                slug=f'scale-{index}',
+                description=f'بهترین خدمات {category.name}',
+                category=category,
+                gender_target=genders.get(category.slug, 'unisex'),
+                city=self.tehran,
+                area=area,
+                address=f'تهران، {area.name}',
+                latitude=latitude,
+                longitude=longitude,
+                geohash=encode_geohash(latitude, longitude),
+                phone=f'021{rng.randint(10000000, 99999999)}',
+                opens_at=time(9, 0),
+                closes_at=time(21, 0),
+                closed_days=[6] if rng.random() < 0.7 else [],
+                status='approved' if rng.random() < 0.95 else 'pending',
+                is_featured=rng.random() < 0.02,
+                auto_confirm_booking=rng.random() < 0.5,
+            ))
+        Business.objects.bulk_create(businesses, batch_size=batch_size, ignore_conflicts=True)
+        
+        business_ids = list(
+            Business.objects.filter(slug__startswith='scale-').order_by('id').values_list('id', flat=True)
+        )
+        self.stdout.write(self.style.SUCCESS(f'✅ {len(business_ids)} businesses'))
+        return business_ids
+
+    def bulk_create_staff_and_services(self, business_ids, batch_size, rng):
+        self.stdout.write('\n💇 Creating staff and services...')
+        
+        # Skip businesses that already have staff from an earlier run
+        staffed = set(
+            Staff.objects.filter(business_id__in=business_ids).values_list('business_id', flat=True)
+        )
+        pending = [business_id for business_id in business_ids if business_id not in staffed]
+        businesses = Business.objects.filter(id__in=pending).select_related('category')
+        service_cats = {}
+        for service_cat in self.service_cats:
+            service_cats.setdefault(service_cat.category_id, []).append(service_cat)
+        fallback = self.service_cats
+        
+        staff = []
+        services = []
+        for business in businesses:
+            for index in range(rng.randint(2, 6)):
+                staff.append(Staff(
+                    business=business,
+                    name=f'کارشناس {index + 1}',
+                    gender=rng.choice(['male', 'female']),
+                    experience_years=rng.randint(1, 15),
+                ))
+            for service_cat in rng.sample(
+                service_cats.get(business.category_id, fallback),
+                k=min(3, len(service_cats.get(business.category_id, fallback))),
+            ):
+                for name in SERVICE_NAMES[service_cat.slug]:
+                    price = rng.randrange(100000, 2000000, 10000)
+                    services.append(Service(
+                        business=business,
+                        service_category=service_cat,
+                        name=name,
+                        price=price,
+                        discounted_price=price * 9 // 10 if rng.random() < 0.2 else None,
+                        duration_minutes=rng.choice([20, 30, 45, 60, 90, 120]),
+                        gender_target=business.gender_target,
+                        is_popular=rng.random() < 0.2,
+                    ))
+        
+        staff = Staff.objects.bulk_create(staff, batch_size=batch_size)
+        services = Service.objects.bulk_create(services, batch_size=batch_size)
+        
+        StaffSchedule.objects.bulk_create(
+            [
+                StaffSchedule(staff=member, weekday=weekday, start_time=time(9, 0), end_time=time(21, 0))
+                for member in staff
+                for weekday in range(6)
+            ],
+            batch_size=batch_size,
+        )
+        
+        staff_by_business = {}
+        for member in staff:
+            staff_by_business.setdefault(member.business_id, []).append(member)
+        ServiceStaff.objects.bulk_create(
+            [
+                ServiceStaff(service=service, staff=member)
+                for service in services
+                for member in staff_by_business[service.business_id]
+            ],
+            batch_size=batch_size,
+        )
+        
+        self.stdout.write(self.style.SUCCESS(f'✅ Created {len(staff)} staff and {len(services)} services'))
+
     def create_users(self):
         self.stdout.write('\n👥 Creating users...')
         
@@ -0,0 +1,529 @@
+"""
+Availability Engine
+
+Computes bookable time slots in memory from booking occupancy bitmaps,
+blocked time slots and staff calendars (StaffSchedule, StaffLeave,
+ServiceStaff), so the number of queries does not depend on the number of
+candidate slots, days, staff members or (for earliest-slot search)
+businesses. Customer-facing slot lists go through the availability
+cache; booking validation always computes fresh.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from businesses.models import Business, Staff, StaffSchedule, StaffLeave
+from services.models import Service, ServiceStaff
+from .models import DailyOccupancy, TimeSlot
+from .availability_cache import (
+    CLOSED_DAY,
+    PRECOMPUTED_TIMEOUT,
+    get_cached_days,
+    get_entry_keys,
+    store_days,
+)
+from .occupancy import (
+    MINUTES_PER_DAY,
+    from_bytes,
+    interval_mask,
+    load_occupancy,
+    to_interval,
+    to_minutes,
+)
+
+
+WHOLE_DAY = interval_mask(0, MINUTES_PER_DAY)
+EARLIEST_SLOT_DAYS = 7
+
+
+def format_minutes(minutes):
+    """Format minutes since midnight as HH:MM"""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def local_weekday(date):
+    """Weekday in the Iranian week used by closed_days and StaffSchedule (Saturday = 0)"""
+    return (date.weekday() + 2) % 7
+
+
+def get_slot_starts(business, service):
+    """Candidate slot starts (in minutes) that fit within business hours"""
+    opens_at = to_minutes(business.opens_at)
+    closes_at = to_minutes(business.closes_at)
+
+    return [
+        start
+        for start in range(opens_at, closes_at, business.slot_duration_minutes)
+        if start + service.duration_minutes <= closes_at
+    ]
+
+
+def get_qualified_staff(business, service, staff=None):
+    """
+    Get the bookable staff who can perform a service.
+
+    Staff linked to the service through ServiceStaff are qualified; a
+    service without any links can be performed by every bookable staff
+    member. Returns None for a business without any staff, which is
+    booked against business hours; a business whose staff can't take
+    the service gets an empty list. With `staff` only that member is
+    checked, giving [staff] or an empty list.
+    """
+    staff_members = [staff] if staff else list(Staff.objects.filter(business=business))
+    if not staff_members:
+        return None
+
+    staff_members = [
+        member for member in staff_members
+        if member.is_active and member.can_accept_bookings
+    ]
+    linked = set(
+        ServiceStaff.objects.filter(service=service).values_list('staff_id', flat=True)
+    )
+
+    if linked:
+        staff_members = [member for member in staff_members if member.id in linked]
+
+    return staff_members
+
+
+def get_occupancy(business, start_date, end_date, staff_ids=None):
+    """
+    Load booking bitmaps and blocked time slots for a date window.
+
+    Returns a dict mapping (staff_id, date) to an occupancy int (bit n =
+    minute n). Rows without a staff member are keyed under None and apply
+    to everyone. When `staff_ids` is None everything is keyed under None,
+    which gives the business-wide view. Uses one query for bitmaps and
+    one for blocks, whatever the window size.
+    """
+    occupancy = load_occupancy(business, start_date, end_date, staff_ids)
+
+    blocks = TimeSlot.objects.filter(
+        business=business,
+        date__gte=start_date,
+        date__lte=end_date,
+        is_available=False,
+    )
+    if staff_ids is not None:
+        blocks = blocks.filter(Q(staff_id__in=staff_ids) | Q(staff__isnull=True))
+
+    for staff_id, date, start, end in blocks.values_list('staff_id', 'date', 'start_time', 'end_time'):
+        key = staff_id if staff_ids is not None else None
+        occupancy[(key, date)] |= interval_mask(*to_interval(start, end))
+
+    return occupancy
+
+
+def get_staff_calendars(staff_ids, start_date, end_date):
+    """
+    Load weekly schedules and leaves for a set of staff members.
+
+    Returns (schedules, leaves): schedules maps staff_id to
+    {weekday: StaffSchedule}, leaves maps staff_id to a list of
+    (start_date, end_date) pairs overlapping the window.
+    """
+    schedules = defaultdict(dict)
+    for schedule in StaffSchedule.objects.filter(staff_id__in=staff_ids):
+        schedules[schedule.staff_id][schedule.weekday] = schedule
+
+    leaves = defaultdict(list)
+    for staff_id, leave_start, leave_end in StaffLeave.objects.filter(
+        staff_id__in=staff_ids,
+        start_date__lte=end_date,
+        end_date__gte=start_date,
+    ).values_list('staff_id', 'start_date', 'end_date'):
+        leaves[staff_id].append((leave_start, leave_end))
+
+    return schedules, leaves
+
+
+def get_off_mask(schedule, leaves, date):
+    """
+    Bit mask of the minutes in which a staff member is not working.
+
+    Staff on leave, or with a schedule that has no available entry for the
+    weekday, are off all day. Staff without any schedule follow business
+    hours.
+    """
+    if any(leave_start <= date <= leave_end for leave_start, leave_end in leaves):
+        return WHOLE_DAY
+
+    if not schedule:
+        return 0
+
+    entry = schedule.get(local_weekday(date))
+    if entry is None or not entry.is_available:
+        return WHOLE_DAY
+
+    start, end = to_interval(entry.start_time, entry.end_time)
+    return WHOLE_DAY & ~interval_mask(start, end)
+
+
+def free_slots(starts, duration, occupied):
+    """
+    Mark every candidate slot as free or taken with bitwise tests.
+
+    A slot [start, start + duration) is free if none of its minutes is set
+    in `occupied`. Returns one boolean per start.
+    """
+    slot_mask = interval_mask(0, duration)
+    return [not (occupied >> start) & slot_mask for start in starts]
+
+
+def get_range_availability(business, service, start_date, end_date, staff=None, starts=None):
+    """
+    Compute availability for every day in [start_date, end_date].
+
+    Returns a list of (date, slots) pairs, where slots is a list of
+    (start_minutes, free_staff) tuples and free_staff lists the staff
+    members who can take the slot. When no staff is chosen the qualified
+    staff are unioned, and a chosen staff member who isn't qualified has
+    no free slots; businesses without staff fall back to business
+    hours, with free_staff being [None] for free slots, while a business
+    with no qualified staff has no free slots. Closed days have no
+    slots. `starts` overrides the slot grid.
+    """
+    if starts is None:
+        starts = get_slot_starts(business, service)
+
+    staff_members = get_qualified_staff(business, service, staff)
+
+    if staff_members is not None:
+        staff_ids = [member.id for member in staff_members]
+        occupancy = get_occupancy(business, start_date, end_date, staff_ids)
+        schedules, leaves = get_staff_calendars(staff_ids, start_date, end_date)
+    else:
+        staff_members = [None]
+        occupancy = get_occupancy(business, start_date, end_date)
+        schedules, leaves = {}, {}
+
+    return list(iter_range_availability(
+        business, service.duration_minutes, starts, staff_members,
+        occupancy, schedules, leaves, start_date, end_date,
+    ))
+
+
+def iter_range_availability(business, duration, starts, staff_members, occupancy,
+                            schedules, leaves, start_date, end_date):
+    """
+    Yield (date, slots) for every day in [start_date, end_date] from
+    preloaded data; see get_range_availability() for the shapes.
+    """
+    date = start_date
+    while date <= end_date:
+        slots = []
+        if local_weekday(date) not in business.closed_days:
+            shared = occupancy.get((None, date), 0)
+            free_by_staff = []
+            for member in staff_members:
+                occupied = shared
+                if member is not None:
+                    occupied |= occupancy.get((member.id, date), 0)
+                    occupied |= get_off_mask(
+                        schedules.get(member.id), leaves.get(member.id, []), date
+                    )
+                free_by_staff.append((member, free_slots(starts, duration, occupied)))
+
+            for index, start in enumerate(starts):
+                free_staff = [member for member, free in free_by_staff if free[index]]
+                slots.append((start, free_staff))
+
+        yield date, slots
+        date += timedelta(days=1)
+
+
+def get_grid(business, service):
+    """Parameters that determine a business/service slot grid"""
+    return (
+        to_minutes(business.opens_at),
+        to_minutes(business.closes_at),
+        business.slot_duration_minutes,
+        service.duration_minutes,
+    )
+
+
+def pack_slots(slots):
+    """Pack a day's (start, free_staff) slots into a cache entry"""
+    if not slots:
+        return CLOSED_DAY
+
+    packed = 0
+    for index, (_, free_staff) in enumerate(slots):
+        if free_staff:
+            packed |= 1 << index
+    return packed
+
+
+def unpack_slots(starts, packed):
+    """Expand a cache entry back into the slot list served to clients"""
+    if packed == CLOSED_DAY:
+        return []
+
+    return [
+        {'time': format_minutes(start), 'available': bool(packed >> index & 1)}
+        for index, start in enumerate(starts)
+    ]
+
+
+def get_cached_range_slots(business, service, start_date, end_date, staff=None):
+    """
+    Get formatted slot lists for every day in [start_date, end_date].
+
+    Days found in the availability cache (including precomputed ones) are
+    served from it; the rest are computed in one pass and stored.
+    """
+    starts = get_slot_starts(business, service)
+    dates = [
+        start_date + timedelta(days=offset)
+        for offset in range((end_date - start_date).days + 1)
+    ]
+    days, keys = get_cached_days(
+        business.id, service.id, staff.id if staff else None, get_grid(business, service), dates
+    )
+
+    missing = [date for date in dates if date not in days]
+    if missing:
+        fresh = {}
+        for date, slots in get_range_availability(
+            business, service, missing[0], missing[-1], staff, starts=starts
+        ):
+            if date not in days:
+                days[date] = pack_slots(slots)
+                fresh[keys[date]] = days[date]
+        store_days(fresh)
+
+    return [(date, unpack_slots(starts, days[date])) for date in dates]
+
+
+def get_day_slots(business, service, date, staff=None):
+    """Get the slot list for a single day"""
+    _, slots = get_cached_range_slots(business, service, date, date, staff)[0]
+    return slots
+
+
+def get_availability_calendar(business, service, start_date, end_date, staff=None, counts_only=False):
+    """Get per-day slot lists (or free slot counts) for a date window"""
+    days = []
+    for date, slots in get_cached_range_slots(business, service, start_date, end_date, staff):
+        day = {'date': date.isoformat()}
+        if counts_only:
+            day['available_count'] = sum(1 for slot in slots if slot['available'])
+        else:
+            day['slots'] = slots
+        days.append(day)
+
+    return days
+
+
+def get_free_staff(business, service, date, time, staff=None):
+    """
+    Get the staff members who can take a booking starting at `time`.
+
+    The booking must fit within business hours. Returns an empty list
+    when the slot is taken, and [None] for a free slot at a business
+    that does not manage staff.
+    """
+    start = to_minutes(time)
+    closes_at = to_minutes(business.closes_at)
+    if start < to_minutes(business.opens_at) or start + service.duration_minutes > closes_at:
+        return []
+
+    _, slots = get_range_availability(business, service, date, date, staff, starts=[start])[0]
+    if not slots:
+        return []
+
+    _, free_staff = slots[0]
+    return free_staff
+
+
+def get_alternative_slots(business, service, date, time, staff=None, limit=3):
+    """
+    Free slots on the same day, nearest to the requested time first. The
+    requested time itself was just refused, so it is never offered even
+    if the cached slots still show it free.
+    """
+    requested = to_minutes(time)
+
+    def distance(slot_time):
+        hours, minutes = map(int, slot_time.split(':'))
+        return abs(hours * 60 + minutes - requested)
+
+    free = [
+        slot['time'] for slot in get_day_slots(business, service, date, staff)
+        if slot['available'] and slot['time'] != format_minutes(requested)
+    ]
+    return sorted(free, key=distance)[:limit]
+
+
+def precompute_business(business, start_date, end_date):
+    """
+    Precompute "any staff" availability of every active service.
+
+    Writes the compact entries the slots endpoints read, with a longer
+    lifetime than on-demand entries. Returns the number of days stored.
+    """
+    stored = 0
+    dates = [
+        start_date + timedelta(days=offset)
+        for offset in range((end_date - start_date).days + 1)
+    ]
+
+    for service in business.services.filter(is_active=True):
+        starts = get_slot_starts(business, service)
+        keys = get_entry_keys(business.id, service.id, None, get_grid(business, service), dates)
+        entries = {
+            keys[date]: pack_slots(slots)
+            for date, slots in get_range_availability(
+                business, service, start_date, end_date, starts=starts
+            )
+        }
+        store_days(entries, PRECOMPUTED_TIMEOUT)
+        stored += len(entries)
+
+    return stored
+
+
+def get_earliest_slots(businesses, start, end, service_category=None):
+    """
+    Find the earliest free slot of each business between two datetimes.
+
+    Uses the shortest active service of each business (within
+    `service_category` if given), since a slot that fits a longer service
+    also fits it. Services, staff, links, schedules, leaves, bitmaps and
+    blocks are loaded for all businesses at once, so the number of
+    queries does not depend on the number of businesses.
+
+    Returns {business_id: {'date', 'time', 'service'}} for every business
+    with a free slot in the window.
+    """
+    businesses = {business.id: business for business in businesses}
+    if not businesses:
+        return {}
+
+    start = timezone.localtime(start)
+    end = timezone.localtime(end)
+    start_date, end_date = start.date(), end.date()
+    start_minutes, end_minutes = to_minutes(start), to_minutes(end)
+
+    # Shortest bookable service per business
+    services = Service.objects.filter(business_id__in=businesses, is_active=True)
+    if service_category:
+        services = services.filter(service_category_id=service_category)
+
+    shortest = {}
+    for service in services.order_by('duration_minutes', 'id'):
+        shortest.setdefault(service.business_id, service)
+
+    # Qualified staff per business; None for businesses without staff,
+    # as in get_qualified_staff()
+    staff_by_business = defaultdict(list)
+    has_staff = set()
+    for member in Staff.objects.filter(business_id__in=shortest):
+        has_staff.add(member.business_id)
+        if member.is_active and member.can_accept_bookings:
+            staff_by_business[member.business_id].append(member)
+
+    linked = defaultdict(set)
+    for service_id, staff_id in ServiceStaff.objects.filter(
+        service__in=shortest.values()
+    ).values_list('service_id', 'staff_id'):
+        linked[service_id].add(staff_id)
+
+    qualified = {}
+    for business_id, service in shortest.items():
+        if business_id not in has_staff:
+            qualified[business_id] = None
+            continue
+        members = staff_by_business[business_id]
+        if linked[service.id]:
+            members = [member for member in members if member.id in linked[service.id]]
+        qualified[business_id] = members
+
+    schedules, leaves = get_staff_calendars(
+        [member.id for members in qualified.values() if members for member in members],
+        start_date,
+        end_date,
+    )
+
+    # Bitmaps and blocks, keyed as in get_occupancy()
+    occupancy = defaultdict(lambda: defaultdict(int))
+    for business_id, staff_id, date, bitmap in DailyOccupancy.objects.filter(
+        business_id__in=shortest,
+        date__gte=start_date,
+        date__lte=end_date,
+    ).values_list('business_id', 'staff_id', 'date', 'bitmap'):
+        key = staff_id if qualified[business_id] is not None else None
+        occupancy[business_id][(key, date)] |= from_bytes(bitmap)
+
+    for business_id, staff_id, date, block_start, block_end in TimeSlot.objects.filter(
+        business_id__in=shortest,
+        date__gte=start_date,
+        date__lte=end_date,
+        is_available=False,
+    ).values_list('business_id', 'staff_id', 'date', 'start_time', 'end_time'):
+        key = staff_id if qualified[business_id] is not None else None
+        occupancy[business_id][(key, date)] |= interval_mask(*to_interval(block_start, block_end))
+
+    earliest = {}
+    for business_id, service in shortest.items():
+        business = businesses[business_id]
+        last_date = min(
+            end_date,
+            timezone.localdate() + timedelta(days=business.booking_advance_days),
+        )
+
+        for date, slots in iter_range_availability(
+            business,
+            service.duration_minutes,
+            get_slot_starts(business, service),
+            [None] if qualified[business_id] is None else qualified[business_id],
+            occupancy[business_id],
+            schedules,
+            leaves,
+            start_date,
+            last_date,
+        ):
+            first = next(
+                (
+                    slot_start for slot_start, free_staff in slots
+                    if free_staff
+                    and (date > start_date or slot_start >= start_minutes)
+                    and (date < end_date or slot_start <= end_minutes)
+                ),
+                None,
+            )
+            if first is not None:
+                earliest[business_id] = {
+                    'date': date.isoformat(),
+                    'time': format_minutes(first),
+                    'service': service.id,
+                }
+                break
+
+    return earliest
+
+
+def get_bookable_business_ids():
+    """Ids of businesses that accept online bookings"""
+    return list(
+        Business.objects.filter(
+            is_active=True,
+            status='approved',
+            allow_online_booking=True,
+        ).order_by('id').values_list('id', flat=True)
+    )
+
+
+def precompute_businesses(business_ids):
+    """Precompute each business's whole booking horizon, starting today"""
+    today = timezone.localdate()
+    stored = 0
+
+    for business in Business.objects.filter(id__in=business_ids):
+        end_date = today + timedelta(days=business.booking_advance_days)
+        stored += precompute_business(business, today, end_date)
+
+    return stored
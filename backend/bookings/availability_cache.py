@@ -0,0 +1,230 @@
+"""
+Availability Cache
+
+Caches computed day slots per business, service, staff and date. Entries
+are addressed through version counters, so a change only has to bump the
+counters for the (business, date) and staff it touches instead of
+finding and deleting every cached service/staff combination.
+
+Entries are compact: an int with bit i set when slot i of the day's grid
+is free, or CLOSED_DAY. The grid (opening hours, slot step and service
+duration) is part of the key, so changing business hours never serves
+entries built for the old grid.
+
+Version scopes for a (business, date):
+    shared  - bumped by bookings and blocks without a staff member
+    any     - bumped by every change; used by "any staff" entries
+    <id>    - bumped by changes for that staff member
+
+Every entry also carries the business's calendar version, bumped when
+its staff, schedules, leaves, service staff links or opening days
+change, since those apply to every date.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+AVAILABILITY_CACHE_TIMEOUT = 5 * 60
+PRECOMPUTED_TIMEOUT = 2 * 60 * 60
+CLOSED_DAY = -1
+VERSION_TIMEOUT = 7 * 24 * 60 * 60
+
+HITS_KEY = 'availability:stats:hits'
+MISSES_KEY = 'availability:stats:misses'
+INVALIDATIONS_KEY = 'availability:stats:invalidations'
+
+# Business fields that change every day's slots
+CALENDAR_FIELDS = {'opens_at', 'closes_at', 'closed_days', 'slot_duration_minutes'}
+
+
+def _version_key(business_id, date, scope):
+    return f'availability:version:{business_id}:{date.isoformat()}:{scope}'
+
+
+def _calendar_key(business_id):
+    return f'availability:version:{business_id}:calendar'
+
+
+def _scope(staff_id):
+    return 'any' if staff_id is None else staff_id
+
+
+def _incr(key, delta=1):
+    """Increment a counter, creating it when missing"""
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, delta, None)
+
+
+def _bump_version(key):
+    """Increment a version, starting from the clock like _get_versions()"""
+    cache.add(key, time.time_ns(), VERSION_TIMEOUT)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), VERSION_TIMEOUT)
+
+
+def _get_versions(business_id, dates, staff_id):
+    """
+    Get (shared, scope, calendar) versions for each date in one round trip.
+
+    Missing versions are initialised from the clock, so a counter that
+    was evicted never comes back with a value an old entry was stored
+    under.
+    """
+    calendar_key = _calendar_key(business_id)
+    keys = {}
+    for date in dates:
+        keys[date] = (
+            _version_key(business_id, date, 'shared'),
+            _version_key(business_id, date, _scope(staff_id)),
+        )
+
+    found = cache.get_many([calendar_key, *(key for pair in keys.values() for key in pair)])
+
+    missing = {}
+    for key in [calendar_key, *(key for pair in keys.values() for key in pair)]:
+        if key not in found:
+            missing[key] = time.time_ns()
+
+    if missing:
+        for key, value in missing.items():
+            cache.add(key, value, VERSION_TIMEOUT)
+        found.update(cache.get_many(list(missing)))
+
+    calendar_version = found.get(calendar_key, 0)
+    return {
+        date: (found.get(shared_key, 0), found.get(scope_key, 0), calendar_version)
+        for date, (shared_key, scope_key) in keys.items()
+    }
+
+
+def _entry_key(business_id, service_id, staff_id, grid, date, versions):
+    shared_version, scope_version, calendar_version = versions
+    return (
+        f'availability:slots:{business_id}:{service_id}:{_scope(staff_id)}:'
+        f'{"-".join(map(str, grid))}:{date.isoformat()}:'
+        f'{shared_version}:{scope_version}:{calendar_version}'
+    )
+
+
+def get_entry_keys(business_id, service_id, staff_id, grid, dates):
+    """Map every date to the key its entry is stored under"""
+    versions = _get_versions(business_id, dates, staff_id)
+    return {
+        date: _entry_key(business_id, service_id, staff_id, grid, date, versions[date])
+        for date in dates
+    }
+
+
+def get_cached_days(business_id, service_id, staff_id, grid, dates):
+    """
+    Look up cached day entries for a set of dates.
+
+    `grid` is a tuple describing the slot grid. Returns (cached, keys):
+    cached maps date to its entry for every hit, keys maps every date to
+    the entry key to store misses under.
+    """
+    keys = get_entry_keys(business_id, service_id, staff_id, grid, dates)
+
+    found = cache.get_many(list(keys.values()))
+    cached = {date: found[key] for date, key in keys.items() if key in found}
+
+    hits = len(cached)
+    if hits:
+        _incr(HITS_KEY, hits)
+    if len(dates) - hits:
+        _incr(MISSES_KEY, len(dates) - hits)
+
+    return cached, keys
+
+
+def store_days(entries, timeout=AVAILABILITY_CACHE_TIMEOUT):
+    """Store computed day entries, given as {entry_key: entry}"""
+    if entries:
+        cache.set_many(entries, timeout)
+
+
+def invalidate_availability(business_id, date, staff_id=None):
+    """
+    Invalidate cached availability for a business day.
+
+    A staff member's change invalidates their own entries and the
+    "any staff" entries; a change without staff invalidates every entry
+    for the day. Runs after the surrounding transaction commits, so a
+    concurrent reader cannot re-cache the old state. With
+    AVAILABILITY_PRECOMPUTE enabled the day is then recomputed in the
+    background.
+    """
+    if staff_id is None:
+        scopes = ['shared']
+    else:
+        scopes = [staff_id, 'any']
+
+    def bump():
+        for scope in scopes:
+            _bump_version(_version_key(business_id, date, scope))
+        _incr(INVALIDATIONS_KEY)
+
+        if settings.AVAILABILITY_PRECOMPUTE:
+            from .tasks import refresh_availability_day
+            try:
+                refresh_availability_day.delay(business_id, date.isoformat())
+            except Exception:
+                # The entry is recomputed on the next request anyway
+                logger.exception('Could not queue availability refresh')
+
+    transaction.on_commit(bump)
+
+
+def invalidate_calendar(business_id):
+    """
+    Invalidate all cached availability of a business, after the
+    surrounding transaction commits; for changes to its staff, their
+    schedules, leaves and services, or its opening days, and for
+    occupancy repaired by a rebuild. With
+    AVAILABILITY_PRECOMPUTE enabled the horizon is then recomputed in
+    the background.
+    """
+    def bump():
+        _bump_version(_calendar_key(business_id))
+        _incr(INVALIDATIONS_KEY)
+
+        if settings.AVAILABILITY_PRECOMPUTE:
+            from .tasks import precompute_availability_chunk
+            try:
+                precompute_availability_chunk.delay([business_id])
+            except Exception:
+                logger.exception('Could not queue availability refresh')
+
+    transaction.on_commit(bump)
+
+
+def get_cache_stats():
+    """Get availability cache hit/miss counters"""
+    counters = cache.get_many([HITS_KEY, MISSES_KEY, INVALIDATIONS_KEY])
+    hits = counters.get(HITS_KEY, 0)
+    misses = counters.get(MISSES_KEY, 0)
+    lookups = hits + misses
+
+    return {
+        'hits': hits,
+        'misses': misses,
+        'invalidations': counters.get(INVALIDATIONS_KEY, 0),
+        'hit_rate': round(hits / lookups, 4) if lookups else None,
+    }
+
+
+def reset_cache_stats():
+    """Reset availability cache hit/miss counters"""
+    cache.delete_many([HITS_KEY, MISSES_KEY, INVALIDATIONS_KEY])
@@ -0,0 +1,385 @@
+"""
+Booking Benchmarks
+
+Seeds a synthetic dataset and measures latency, query count and peak
+allocations of the booking and search hot paths through the full
+request stack. Results are compared against a stored JSON baseline so
+regressions show up before deploy.
+
+Meant to run inside a throwaway test database and a local cache (see
+the `benchmark` management command); seeding writes tens of thousands
+of rows and every scenario starts by clearing the cache.
+
+business_list and business_detail are answered from the listing and
+rendered response caches after the first request, and available_slots
+from the availability cache, so their warm figures measure cache hits;
+the *_uncached variants clear the cache before every request to
+measure the full path.
+"""
+import json
+import random
+import statistics
+import time as clock
+import tracemalloc
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from businesses.models import Area, Business, Category, City, Staff, StaffSchedule
+from reviews.models import Review
+from services.models import Service, ServiceCategory, ServiceStaff
+
+from .availability import get_day_slots
+from .models import Booking
+from .occupancy import rebuild_occupancy
+
+User = get_user_model()
+
+
+# name: (businesses, staff per business, services per business,
+#        bookings per business, customers)
+DATASET_SIZES = {
+    'small': (10, 3, 5, 50, 50),
+    'medium': (100, 4, 8, 200, 500),
+    'large': (500, 5, 10, 400, 2000),
+}
+
+BATCH_SIZE = 1000
+BOOKING_WINDOW_DAYS = 30
+DURATIONS = [20, 30, 45, 60, 90]
+
+
+def seed_dataset(size, seed=0):
+    """
+    Bulk-insert a dataset of the given size and return the fixtures the
+    scenarios need. Occupancy bitmaps are rebuilt in one pass afterwards
+    since bulk_create bypasses Booking.save().
+    """
+    business_count, staff_count, service_count, booking_count, customer_count = DATASET_SIZES[size]
+    rng = random.Random(seed)
+    today = timezone.now().date()
+
+    category = Category.objects.create(name='Benchmark', slug='benchmark')
+    service_category = ServiceCategory.objects.create(
+        category=category, name='Benchmark', slug='benchmark'
+    )
+    city = City.objects.create(name='Benchmark', slug='benchmark', province='Benchmark')
+    areas = [
+        Area.objects.create(city=city, name=f'Area {i}', slug=f'area-{i}')
+        for i in range(10)
+    ]
+
+    customers = User.objects.bulk_create(
+        [
+            User(phone_number=f'0910{i:07d}', user_type='customer', password='!')
+            for i in range(customer_count)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    owners = User.objects.bulk_create(
+        [
+            User(phone_number=f'0930{i:07d}', user_type='business_owner', password='!')
+            for i in range(business_count)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    businesses = Business.objects.bulk_create(
+        [
+            Business(
+                owner=owner,
+                name=f'Benchmark Business {i}',
+                slug=f'benchmark-{i}',
+                description='Benchmark business',
+                category=category,
+                city=city,
+                area=rng.choice(areas),
+                address='Benchmark address',
+                phone='02100000000',
+                opens_at=time(9, 0),
+                closes_at=time(21, 0),
+                status='approved',
+                average_rating=round(rng.uniform(3, 5), 2),
+            )
+            for i, owner in enumerate(owners)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    staff = Staff.objects.bulk_create(
+        [
+            Staff(business=business, name=f'Staff {i}', gender='female')
+            for business in businesses
+            for i in range(staff_count)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    StaffSchedule.objects.bulk_create(
+        [
+            StaffSchedule(
+                staff=member,
+                weekday=weekday,
+                start_time=time(9, 0),
+                end_time=time(21, 0),
+            )
+            for member in staff
+            for weekday in range(6)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    services = Service.objects.bulk_create(
+        [
+            Service(
+                business=business,
+                service_category=service_category,
+                name=f'Service {i}',
+                price=rng.randrange(50000, 1000000, 10000),
+                duration_minutes=rng.choice(DURATIONS),
+            )
+            for business in businesses
+            for i in range(service_count)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    staff_by_business = {}
+    for member in staff:
+        staff_by_business.setdefault(member.business_id, []).append(member)
+    services_by_business = {}
+    for service in services:
+        services_by_business.setdefault(service.business_id, []).append(service)
+
+    ServiceStaff.objects.bulk_create(
+        [
+            ServiceStaff(service=service, staff=member)
+            for service in services
+            for member in staff_by_business[service.business_id]
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    bookings = []
+    for business in businesses:
+        for _ in range(booking_count):
+            service = rng.choice(services_by_business[business.id])
+            date = today + timedelta(days=rng.randint(-BOOKING_WINDOW_DAYS, BOOKING_WINDOW_DAYS))
+            start = datetime.combine(date, time(rng.randint(9, 19), rng.choice([0, 30])))
+            end = start + timedelta(minutes=service.duration_minutes)
+            past = date < today
+            bookings.append(Booking(
+                customer=rng.choice(customers),
+                business=business,
+                service=service,
+                staff=rng.choice(staff_by_business[business.id]),
+                date=date,
+                time=start.time(),
+                end_time=end.time(),
+                duration_minutes=service.duration_minutes,
+                service_price=service.price,
+                final_price=service.price,
+                status='completed' if past else rng.choice(['pending', 'confirmed']),
+            ))
+    bookings = Booking.objects.bulk_create(bookings, batch_size=BATCH_SIZE)
+
+    Review.objects.bulk_create(
+        [
+            Review(
+                customer=booking.customer,
+                business=booking.business,
+                booking=booking,
+                rating=rng.randint(1, 5),
+                comment='Benchmark review',
+                is_approved=True,
+                is_verified=True,
+            )
+            for booking in bookings
+            if booking.status == 'completed' and rng.random() < 0.3
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    rebuild_occupancy()
+
+    business = businesses[0]
+    return {
+        'business': business,
+        'service': services_by_business[business.id][0],
+        'customer': customers[0],
+        'owner': owners[0],
+        'date': today + timedelta(days=1),
+    }
+
+
+def get_scenarios(fixtures):
+    """
+    Map scenario names to (user, callable) pairs. Each callable issues
+    one request with the given client and returns the response.
+    """
+    business = fixtures['business']
+    service = fixtures['service']
+    date = fixtures['date']
+
+    # Free slots for booking creation, one per iteration, spread over
+    # the following days so earlier iterations don't exhaust them
+    free_slots = []
+    for offset in range(7):
+        day = date + timedelta(days=offset)
+        free_slots.extend(
+            (day, slot['time'])
+            for slot in get_day_slots(business, service, day)
+            if slot['available']
+        )
+    free_slots = iter(free_slots)
+
+    def create_booking(client):
+        day, slot_time = next(free_slots)
+        return client.post('/api/bookings/', {
+            'business': business.id,
+            'service': service.id,
+            'date': day.isoformat(),
+            'time': slot_time,
+        }, format='json')
+
+    def uncached(request):
+        def run(client):
+            cache.clear()
+            return request(client)
+        return run
+
+    def available_slots(client):
+        return client.get(
+            f'/api/businesses/{business.id}/available-slots/',
+            {'service': service.id, 'date': date.isoformat()},
+        )
+
+    def business_list(client):
+        return client.get('/api/businesses/')
+
+    def business_detail(client):
+        return client.get(f'/api/businesses/{business.id}/')
+
+    return {
+        'available_slots': (None, available_slots),
+        'available_slots_uncached': (None, uncached(available_slots)),
+        'booking_create': (fixtures['customer'], create_booking),
+        'business_list': (None, business_list),
+        'business_list_uncached': (None, uncached(business_list)),
+        'business_detail': (None, business_detail),
+        'business_detail_uncached': (None, uncached(business_detail)),
+        'partner_dashboard_stats': (fixtures['owner'], lambda client: client.get(
+            '/api/partner/dashboard/stats/'
+        )),
+    }
+
+
+def measure(request, client, iterations):
+    """
+    Run a request repeatedly and collect timing, query and allocation
+    figures. The first (cold cache) run is reported separately.
+    """
+    cache.clear()
+    # With DEBUG on, seeding fills the bounded query log, which would
+    # leave nothing for CaptureQueriesContext to slice
+    reset_queries()
+
+    start = clock.perf_counter()
+    with CaptureQueriesContext(connection) as queries:
+        response = request(client)
+    cold_ms = (clock.perf_counter() - start) * 1000
+    # The captured slice is read from the connection's log, which the
+    # next request resets
+    query_count = len(queries)
+
+    if response.status_code >= 400:
+        raise RuntimeError(f'Request failed with {response.status_code}: {response.content[:200]!r}')
+
+    timings = []
+    for _ in range(iterations):
+        start = clock.perf_counter()
+        request(client)
+        timings.append((clock.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    request(client)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings.sort()
+    return {
+        'cold_ms': round(cold_ms, 2),
+        'median_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+        'queries': query_count,
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(size, iterations=20, scenarios=None, seed=0):
+    """Seed a dataset and measure every scenario; returns {scenario: result}"""
+    fixtures = seed_dataset(size, seed=seed)
+
+    results = {}
+    for name, (user, request) in get_scenarios(fixtures).items():
+        if scenarios and name not in scenarios:
+            continue
+
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+
+        results[name] = measure(request, client, iterations)
+
+    return results
+
+
+def load_baseline(path):
+    """Load a stored baseline, or an empty one when none exists yet"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, results):
+    """Merge results into the stored baseline"""
+    baseline = load_baseline(path)
+    baseline.update(results)
+
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def compare(results, baseline, threshold=0.2):
+    """
+    Compare results with a baseline.
+
+    Returns (rows, regressions). A scenario regresses when its median
+    latency grows by more than `threshold` or it issues more queries.
+    """
+    rows = []
+    regressions = []
+
+    for size, scenarios in results.items():
+        for name, result in scenarios.items():
+            previous = baseline.get(size, {}).get(name)
+            row = {'size': size, 'scenario': name, **result, 'change': None}
+
+            if previous:
+                row['change'] = (result['median_ms'] - previous['median_ms']) / previous['median_ms']
+                row['baseline_ms'] = previous['median_ms']
+                row['baseline_queries'] = previous['queries']
+
+                if row['change'] > threshold or result['queries'] > previous['queries']:
+                    regressions.append(row)
+
+            rows.append(row)
+
+    return rows, regressions
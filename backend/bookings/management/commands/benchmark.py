@@ -0,0 +1,148 @@
+"""
+Django management command to benchmark booking and search hot paths
+Usage: python manage.py benchmark [--size small|medium|large ...] [--save-baseline]
+
+Runs in a separate test database and an in-process cache, so existing
+data and the shared cache are never touched. Point DATABASE_* at a local
+PostgreSQL for numbers comparable to production.
+"""
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+from bookings.benchmarks import (
+    DATASET_SIZES,
+    compare,
+    load_baseline,
+    run_benchmarks,
+    save_baseline,
+)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark booking and search endpoints against a stored baseline'
+
+    # Scenarios clear the cache; keep them off the shared one
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'benchmark',
+        }
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size',
+            action='append',
+            choices=list(DATASET_SIZES),
+            help='Dataset size to run (can be repeated, default: small and medium)',
+        )
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            help='Only run this scenario (can be repeated)',
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=20,
+            help='Warm requests per scenario',
+        )
+        parser.add_argument(
+            '--baseline',
+            default=str(settings.BASE_DIR / 'benchmark_baseline.json'),
+            help='Baseline file to compare against',
+        )
+        parser.add_argument(
+            '--save-baseline',
+            action='store_true',
+            help='Store these results as the new baseline',
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.2,
+            help='Median latency growth that counts as a regression (0.2 = 20%%)',
+        )
+        parser.add_argument(
+            '--fail-on-regression',
+            action='store_true',
+            help='Exit with an error when a scenario regresses',
+        )
+
+    def handle(self, *args, **options):
+        sizes = options['size'] or ['small', 'medium']
+
+        if connection.vendor != 'postgresql':
+            self.stdout.write(self.style.WARNING(
+                f'⚠️  Running on {connection.vendor}; numbers are not comparable to PostgreSQL'
+            ))
+
+        results = {}
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(CACHES=self.CACHES):
+                for size in sizes:
+                    self.stdout.write(f'🔄 Seeding {size} dataset and running benchmarks...')
+                    call_command('flush', interactive=False, verbosity=0)
+                    results[size] = run_benchmarks(
+                        size,
+                        iterations=options['iterations'],
+                        scenarios=options['scenario'],
+                    )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        rows, regressions = compare(
+            results,
+            load_baseline(options['baseline']),
+            threshold=options['threshold'],
+        )
+        self.print_rows(rows)
+
+        if options['save_baseline']:
+            save_baseline(options['baseline'], results)
+            self.stdout.write(self.style.SUCCESS(f'✅ Baseline saved to {options["baseline"]}'))
+
+        if regressions:
+            names = ', '.join(f'{row["size"]}/{row["scenario"]}' for row in regressions)
+            message = f'Regressions: {names}'
+            if options['fail_on_regression']:
+                raise CommandError(message)
+            self.stdout.write(self.style.ERROR(f'❌ {message}'))
+        else:
+            self.stdout.write(self.style.SUCCESS('✅ No regressions'))
+
+    def print_rows(self, rows):
+        self.stdout.write(
+            f'\n{"size":<8} {"scenario":<24} {"cold ms":>9} {"median ms":>10} {"p95 ms":>9} '
+            f'{"queries":>8} {"peak KB":>9} {"vs baseline":>12}'
+        )
+        self.stdout.write('-' * 96)
+
+        for row in rows:
+            if row['change'] is None:
+                change = 'new'
+            else:
+                change = f'{row["change"]:+.1%}'
+                if row['queries'] != row['baseline_queries']:
+                    change += f' ({row["baseline_queries"]}q)'
+
+            self.stdout.write(
+                f'{row["size"]:<8} {row["scenario"]:<24} {row["cold_ms"]:>9} {row["median_ms"]:>10} '
+                f'{row["p95_ms"]:>9} {row["queries"]:>8} {row["peak_kb"]:>9} {change:>12}'
+            )
+
+        self.stdout.write(
+            'business_list, business_detail and available_slots warm figures are cache hits; '
+            'see the *_uncached rows for the full path'
+        )
@@ -0,0 +1,69 @@
+"""
+Django management command to precompute availability
+Usage: python manage.py precompute_availability [--workers N] [--chunk-size N] [--business ID ...]
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from bookings.availability import get_bookable_business_ids, precompute_businesses
+
+
+def precompute_chunk(business_ids):
+    # Each worker process opens its own database connection
+    connections.close_all()
+    return precompute_businesses(business_ids)
+
+
+class Command(BaseCommand):
+    help = 'Precompute availability for every bookable business across its booking horizon'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of worker processes (default: CPU count)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=settings.AVAILABILITY_PRECOMPUTE_CHUNK_SIZE,
+            help='Businesses per work item',
+        )
+        parser.add_argument(
+            '--business',
+            type=int,
+            action='append',
+            help='Only precompute this business (can be repeated)',
+        )
+
+    def handle(self, *args, **options):
+        business_ids = options['business'] or get_bookable_business_ids()
+        chunk_size = max(options['chunk_size'], 1)
+        chunks = [
+            business_ids[index:index + chunk_size]
+            for index in range(0, len(business_ids), chunk_size)
+        ]
+
+        self.stdout.write(
+            f'📅 Precomputing {len(business_ids)} businesses in {len(chunks)} chunks...'
+        )
+
+        stored = 0
+        if options['workers'] <= 1:
+            for chunk in chunks:
+                stored += precompute_businesses(chunk)
+        else:
+            # Forked workers must not share the parent's connection
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+                futures = [executor.submit(precompute_chunk, chunk) for chunk in chunks]
+                for future in as_completed(futures):
+                    stored += future.result()
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Stored {stored} service-days'))
@@ -0,0 +1,52 @@
+"""
+Django management command to rebuild booking occupancy bitmaps
+Usage: python manage.py rebuild_occupancy [--business ID ...] [--from YYYY-MM-DD] [--to YYYY-MM-DD]
+"""
+
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.occupancy import rebuild_occupancy
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Invalid date: {value} (expected YYYY-MM-DD)')
+
+
+class Command(BaseCommand):
+    help = 'Rebuild per-day booking occupancy bitmaps from bookings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--business',
+            type=int,
+            action='append',
+            help='Only rebuild this business (can be repeated)',
+        )
+        parser.add_argument(
+            '--from',
+            dest='start_date',
+            type=parse_date,
+            help='First date to rebuild',
+        )
+        parser.add_argument(
+            '--to',
+            dest='end_date',
+            type=parse_date,
+            help='Last date to rebuild',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('🔄 Rebuilding occupancy bitmaps...')
+
+        count = rebuild_occupancy(
+            business_ids=options['business'],
+            start_date=options['start_date'],
+            end_date=options['end_date'],
+        )
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Rebuilt {count} occupancy rows'))
@@ -0,0 +1,72 @@
+# Generated by Django 5.0.1 on 2026-10-17 14:48
+
+import django.db.models.deletion
+from collections import defaultdict
+from django.db import migrations, models
+
+
+def build_occupancy(apps, schema_editor):
+    """Backfill bitmaps for existing active bookings"""
+    Booking = apps.get_model('bookings', 'Booking')
+    DailyOccupancy = apps.get_model('bookings', 'DailyOccupancy')
+
+    bitmaps = defaultdict(int)
+    for business_id, staff_id, date, start, end in Booking.objects.filter(
+        status__in=['pending', 'confirmed'],
+        is_cancelled=False,
+    ).values_list('business_id', 'staff_id', 'date', 'time', 'end_time').iterator():
+        start = start.hour * 60 + start.minute
+        end = end.hour * 60 + end.minute
+        if end <= start:
+            end = 24 * 60
+        bitmaps[(business_id, staff_id, date)] |= ((1 << (end - start)) - 1) << start
+
+    DailyOccupancy.objects.bulk_create(
+        [
+            DailyOccupancy(
+                business_id=business_id,
+                staff_id=staff_id,
+                date=date,
+                bitmap=occupied.to_bytes(24 * 60 // 8, 'little'),
+            )
+            for (business_id, staff_id, date), occupied in bitmaps.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0001_initial'),
+        ('businesses', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('bitmap', models.BinaryField(default=bytes)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occupancies', to='businesses.business')),
+                ('staff', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='occupancies', to='businesses.staff')),
+            ],
+            options={
+                'verbose_name': 'Daily Occupancy',
+                'verbose_name_plural': 'Daily Occupancies',
+                'db_table': 'daily_occupancy',
+                'indexes': [models.Index(fields=['business', 'date'], name='daily_occup_busines_f5d286_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyoccupancy',
+            constraint=models.UniqueConstraint(condition=models.Q(('staff__isnull', False)), fields=('business', 'staff', 'date'), name='unique_staff_daily_occupancy'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyoccupancy',
+            constraint=models.UniqueConstraint(condition=models.Q(('staff__isnull', True)), fields=('business', 'date'), name='unique_business_daily_occupancy'),
+        ),
+        migrations.RunPython(build_occupancy, migrations.RunPython.noop),
+    ]
@@ -1,13 +1,14 @@
 """
 Booking Models
 """
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 from datetime import timedelta
 from accounts.models import User
 from businesses.models import Business, Staff
 from services.models import Service
+from .availability_cache import invalidate_availability
 
 
 class Booking(models.Model):
@@ -120,6 +121,8 @@ class Booking(models.Model):
         return f"Booking #{self.id} - {self.customer.phone_number} - {self.date} {self.time}"
     
     def save(self, *args, **kwargs):
+        from .occupancy import refresh_occupancy
+        
         # Calculate end time if not set
         if not self.end_time:
             from datetime import datetime, timedelta
@@ -134,7 +137,32 @@ class Booking(models.Model):
             self.final_price = self.service.final_price
             self.discount_amount = self.service_price - self.final_price
         
-        super().save(*args, **kwargs)
+        # Keep occupancy bitmaps and cached availability in step with the
+        # booking, including the day/staff it is moved away from
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                previous = Booking.objects.filter(pk=self.pk).values(
+                    'business_id', 'staff_id', 'date'
+                ).first()
+            
+            super().save(*args, **kwargs)
+            
+            refresh_occupancy(self.business_id, self.staff_id, self.date)
+            invalidate_availability(self.business_id, self.date, self.staff_id)
+            if previous and (previous['staff_id'], previous['date']) != (self.staff_id, self.date):
+                refresh_occupancy(previous['business_id'], previous['staff_id'], previous['date'])
+                invalidate_availability(previous['business_id'], previous['date'], previous['staff_id'])
+    
+    def delete(self, *args, **kwargs):
+        from .occupancy import refresh_occupancy
+        
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            refresh_occupancy(self.business_id, self.staff_id, self.date)
+            invalidate_availability(self.business_id, self.date, self.staff_id)
+        
+        return result
     
     def can_be_cancelled(self):
         """Check if booking can be cancelled"""
@@ -239,3 +267,73 @@ class TimeSlot(models.Model):
     
     def __str__(self):
         return f"{self.business.name} - {self.date} {self.start_time}-{self.end_time}"
+    
+    def save(self, *args, **kwargs):
+        # Invalidate the old date/staff too when a block is moved
+        if self.pk:
+            previous = TimeSlot.objects.filter(pk=self.pk).values('date', 'staff_id').first()
+            if previous:
+                invalidate_availability(self.business_id, previous['date'], previous['staff_id'])
+        
+        super().save(*args, **kwargs)
+        invalidate_availability(self.business_id, self.date, self.staff_id)
+    
+    def delete(self, *args, **kwargs):
+        invalidate_availability(self.business_id, self.date, self.staff_id)
+        return super().delete(*args, **kwargs)
+
+
+class DailyOccupancy(models.Model):
+    """
+    Per-day occupancy bitmap of active bookings (one bit per minute).
+    
+    Bit n is set when minute n of the day is taken by a pending or
+    confirmed booking. Rows are kept per staff member; bookings without
+    staff are tracked in a row with staff=None.
+    """
+    
+    MINUTES = 24 * 60
+    
+    business = models.ForeignKey(
+        Business,
+        on_delete=models.CASCADE,
+        related_name='occupancies'
+    )
+    staff = models.ForeignKey(
+        Staff,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='occupancies'
+    )
+    date = models.DateField()
+    bitmap = models.BinaryField(default=bytes)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'daily_occupancy'
+        verbose_name = 'Daily Occupancy'
+        verbose_name_plural = 'Daily Occupancies'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['business', 'staff', 'date'],
+                condition=models.Q(staff__isnull=False),
+                name='unique_staff_daily_occupancy'
+            ),
+            models.UniqueConstraint(
+                fields=['business', 'date'],
+                condition=models.Q(staff__isnull=True),
+                name='unique_business_daily_occupancy'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['business', 'date']),
+        ]
+    
+    def __str__(self):
+        return f"{self.business.name} - {self.date} - {self.staff.name if self.staff else 'No staff'}"
+    
+    @property
+    def occupied(self):
+        """Bitmap as an int (bit n = minute n)"""
+        return int.from_bytes(self.bitmap, 'little')
@@ -0,0 +1,274 @@
+"""
+Booking Occupancy Bitmaps
+
+Each DailyOccupancy row holds one bit per minute of a day for a business
+and staff member. Overlap checks become bitwise operations on Python
+ints instead of range queries over bookings.
+"""
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from businesses.models import Business
+from .availability_cache import invalidate_calendar
+from .models import Booking, DailyOccupancy
+
+
+ACTIVE_BOOKING_STATUSES = ['pending', 'confirmed']
+MINUTES_PER_DAY = DailyOccupancy.MINUTES
+BITMAP_BYTES = MINUTES_PER_DAY // 8
+REBUILD_BATCH_SIZE = 1000
+
+# SQLSTATE of a lock wait cut short by lock_timeout
+LOCK_NOT_AVAILABLE = '55P03'
+
+
+def to_minutes(value):
+    """Convert a time object to minutes since midnight"""
+    return value.hour * 60 + value.minute
+
+
+def to_interval(start_time, end_time):
+    """Convert a (start, end) time pair to a minute interval"""
+    start = to_minutes(start_time)
+    end = to_minutes(end_time)
+
+    # Bookings ending at or after midnight run to the end of the day
+    if end <= start:
+        end = MINUTES_PER_DAY
+
+    return start, end
+
+
+def interval_mask(start, end):
+    """Bit mask with minutes [start, end) set"""
+    if end <= start:
+        return 0
+    return ((1 << (end - start)) - 1) << start
+
+
+def to_bytes(occupied):
+    """Serialise an occupancy int for DailyOccupancy.bitmap"""
+    return occupied.to_bytes(BITMAP_BYTES, 'little')
+
+
+def from_bytes(bitmap):
+    """Deserialise DailyOccupancy.bitmap to an int"""
+    return int.from_bytes(bytes(bitmap), 'little')
+
+
+def active_bookings():
+    """Bookings that occupy their time"""
+    return Booking.objects.filter(
+        status__in=ACTIVE_BOOKING_STATUSES,
+        is_cancelled=False,
+    )
+
+
+def ensure_occupancy(business_id, staff_ids, date):
+    """
+    Create any missing occupancy rows of a business day in one query.
+
+    Called before a booking transaction, so the booking doesn't insert
+    rows there and wait on the unique index for a concurrent inserter.
+    Existing rows are left out of the insert: ON CONFLICT waits for a
+    transaction holding the conflicting row, which would make this wait
+    unbounded behind any open booking of the day.
+    """
+    existing = set(
+        DailyOccupancy.objects.filter(business_id=business_id, date=date)
+        .filter(Q(staff_id__in=[staff_id for staff_id in staff_ids if staff_id]) | Q(staff__isnull=True))
+        .values_list('staff_id', flat=True)
+    )
+
+    missing = [staff_id for staff_id in staff_ids if staff_id not in existing]
+    if missing:
+        DailyOccupancy.objects.bulk_create(
+            [
+                DailyOccupancy(business_id=business_id, staff_id=staff_id, date=date)
+                for staff_id in missing
+            ],
+            ignore_conflicts=True,
+        )
+
+
+def set_lock_timeout(milliseconds):
+    """Bound row lock waits for the rest of the current transaction"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT set_config('lock_timeout', %s, true)", [f'{milliseconds}ms'])
+
+
+def is_lock_timeout(error):
+    """Whether a database error is a lock wait cut short by set_lock_timeout()"""
+    return getattr(error.__cause__, 'pgcode', None) == LOCK_NOT_AVAILABLE
+
+
+def lock_occupancy(business_id, staff_id, date):
+    """
+    Lock the occupancy row of a business/staff/day, creating it if needed.
+
+    Must be called inside a transaction; the row stays locked until it
+    ends. This is the per staff-day lock that serialises bookings, so a
+    row locked by another transaction is waited for (see
+    set_lock_timeout()).
+    """
+    occupancy, _ = DailyOccupancy.objects.get_or_create(
+        business_id=business_id,
+        staff_id=staff_id,
+        date=date,
+    )
+    return DailyOccupancy.objects.select_for_update().get(pk=occupancy.pk)
+
+
+def share_occupancy(business_id, date):
+    """
+    Take a shared lock on the staff-less occupancy row of a business day,
+    which applies to every staff member, and return it (None if missing).
+    Concurrent staff bookings share it; a staff-less booking or refresh
+    holding it exclusively is waited for.
+    """
+    rows = DailyOccupancy.objects.raw(
+        f'SELECT * FROM {DailyOccupancy._meta.db_table} '
+        'WHERE business_id = %s AND staff_id IS NULL AND date = %s '
+        'FOR SHARE',
+        [business_id, date],
+    )
+    return next(iter(rows), None)
+
+
+def refresh_occupancy(business_id, staff_id, date):
+    """
+    Recompute one business/staff/day bitmap from its bookings.
+
+    The occupancy row is locked before the bookings are read, so
+    concurrent refreshes of the same day serialise and the last one sees
+    every committed booking.
+    """
+    with transaction.atomic():
+        occupancy = lock_occupancy(business_id, staff_id, date)
+
+        occupied = 0
+        for start, end in active_bookings().filter(
+            business_id=business_id,
+            staff_id=staff_id,
+            date=date,
+        ).values_list('time', 'end_time'):
+            occupied |= interval_mask(*to_interval(start, end))
+
+        occupancy.bitmap = to_bytes(occupied)
+        occupancy.save(update_fields=['bitmap', 'updated_at'])
+
+    return occupied
+
+
+def load_occupancy(business, start_date, end_date, staff_ids=None):
+    """
+    Load booking bitmaps for a date window in one query.
+
+    Returns a dict mapping (staff_id, date) to an occupancy int. Rows
+    without staff are keyed under None; when `staff_ids` is None every
+    row is merged under None, which gives the business-wide view.
+    """
+    rows = DailyOccupancy.objects.filter(
+        business=business,
+        date__gte=start_date,
+        date__lte=end_date,
+    )
+
+    if staff_ids is not None:
+        rows = rows.filter(Q(staff_id__in=staff_ids) | Q(staff__isnull=True))
+
+    occupancy = defaultdict(int)
+    for staff_id, date, bitmap in rows.values_list('staff_id', 'date', 'bitmap'):
+        key = staff_id if staff_ids is not None else None
+        occupancy[(key, date)] |= from_bytes(bitmap)
+
+    return occupancy
+
+
+def rebuild_occupancy(business_ids=None, start_date=None, end_date=None):
+    """
+    Rebuild bitmaps from bookings, repairing any drift.
+
+    Each business is rebuilt in its own transaction, so bookings never
+    wait on more than one business's rows. Returns the number of rows
+    written.
+    """
+    if business_ids is None:
+        business_ids = Business.objects.order_by('pk').values_list('pk', flat=True)
+
+    return sum(
+        rebuild_business_occupancy(business_id, start_date, end_date)
+        for business_id in list(business_ids)
+    )
+
+
+def rebuild_business_occupancy(business_id, start_date=None, end_date=None):
+    """
+    Rebuild one business's bitmaps; returns the number of rows written.
+
+    The rows in scope are locked before the bookings are read, as in
+    refresh_occupancy(), so a booking committed meanwhile either is read
+    here or refreshes its row after this commits. Existing rows are
+    overwritten (days without bookings are cleared rather than deleted,
+    which would break a concurrent lock_occupancy()) and missing ones
+    created. Cached availability of the business is invalidated when a
+    bitmap actually changed.
+    """
+    bookings = active_bookings().filter(business_id=business_id)
+    rows = DailyOccupancy.objects.filter(business_id=business_id)
+
+    if start_date:
+        bookings = bookings.filter(date__gte=start_date)
+        rows = rows.filter(date__gte=start_date)
+    if end_date:
+        bookings = bookings.filter(date__lte=end_date)
+        rows = rows.filter(date__lte=end_date)
+
+    with transaction.atomic():
+        existing = {}
+        stored = {}
+        for pk, staff_id, date, bitmap in rows.select_for_update().order_by('pk').values_list(
+            'pk', 'staff_id', 'date', 'bitmap'
+        ):
+            existing[(staff_id, date)] = pk
+            stored[(staff_id, date)] = from_bytes(bitmap)
+
+        bitmaps = defaultdict(int)
+        for staff_id, date, start, end in bookings.values_list(
+            'staff_id', 'date', 'time', 'end_time'
+        ).iterator(chunk_size=REBUILD_BATCH_SIZE):
+            bitmaps[(staff_id, date)] |= interval_mask(*to_interval(start, end))
+
+        now = timezone.now()
+        DailyOccupancy.objects.bulk_update(
+            [
+                DailyOccupancy(pk=pk, bitmap=to_bytes(bitmaps.get(key, 0)), updated_at=now)
+                for key, pk in existing.items()
+            ],
+            ['bitmap', 'updated_at'],
+            batch_size=REBUILD_BATCH_SIZE,
+        )
+
+        # Rows created concurrently were refreshed by their booking
+        DailyOccupancy.objects.bulk_create(
+            [
+                DailyOccupancy(
+                    business_id=business_id,
+                    staff_id=staff_id,
+                    date=date,
+                    bitmap=to_bytes(occupied),
+                )
+                for (staff_id, date), occupied in bitmaps.items()
+                if (staff_id, date) not in existing
+            ],
+            batch_size=REBUILD_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+        if any(stored.get(key, 0) != bitmaps.get(key, 0) for key in stored.keys() | bitmaps.keys()):
+            invalidate_calendar(business_id)
+
+    return len(existing) + len(bitmaps.keys() - existing.keys())
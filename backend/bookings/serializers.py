@@ -1,15 +1,44 @@
 """
 Booking Serializers
 """
-from rest_framework import serializers
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+from django.conf import settings
+from django.db import OperationalError, transaction
 from django.utils import timezone
 from datetime import datetime, timedelta
 from .models import Booking, BookingHistory
+from .availability import get_alternative_slots, get_free_staff
+from .occupancy import (
+    ensure_occupancy,
+    interval_mask,
+    is_lock_timeout,
+    lock_occupancy,
+    set_lock_timeout,
+    share_occupancy,
+    to_interval,
+)
 from businesses.models import Business, Staff
 from services.models import Service
 from accounts.models import User
 
 
+class SlotUnavailable(APIException):
+    """The slot was taken by a concurrent booking"""
+    
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'This time slot is not available.'
+    default_code = 'slot_unavailable'
+
+
+class BookingBusy(APIException):
+    """The staff day stayed locked by other bookings past the lock timeout"""
+    
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many bookings for this day right now, please try again.'
+    default_code = 'booking_busy'
+
+
 class BookingCustomerSerializer(serializers.ModelSerializer):
     """Customer info in booking"""
     
@@ -167,36 +196,68 @@ class BookingCreateSerializer(serializers.Serializer):
             datetime.combine(attrs['date'], attrs['time'])
         )
         
-        # Check for overlapping bookings
-        end_time = (
-            datetime.combine(attrs['date'], attrs['time']) +
-            timedelta(minutes=service.duration_minutes)
-        ).time()
-        
-        overlapping = Booking.objects.filter(
-            business=business,
-            date=attrs['date'],
-            status__in=['pending', 'confirmed'],
-            is_cancelled=False
-        ).filter(
-            models.Q(time__lt=end_time, end_time__gt=attrs['time'])
+        # Check that a qualified staff member is free for the whole service
+        free_staff = get_free_staff(
+            business,
+            service,
+            attrs['date'],
+            attrs['time'],
+            attrs['staff_obj']
         )
         
-        if attrs.get('staff_obj'):
-            overlapping = overlapping.filter(staff=attrs['staff_obj'])
-        
-        if overlapping.exists():
+        if not free_staff:
             raise serializers.ValidationError({
-                'time': 'This time slot is not available.'
+                'time': 'This time slot is not available.',
+                'alternatives': get_alternative_slots(
+                    business, service, attrs['date'], attrs['time'], attrs['staff_obj']
+                )
             })
         
+        # Candidates in id order, so concurrent requests lock staff days
+        # in the same order
+        attrs['free_staff'] = sorted(
+            free_staff,
+            key=lambda member: member.id if member else 0
+        )
+        
         return attrs
     
+    def reserve_staff(self, validated_data, end_time):
+        """
+        Lock the day of each free staff member and return the first one
+        whose occupancy still has room for the booking.
+        
+        The lock is held until the booking is committed. A staff day
+        locked by a concurrent request is waited for, up to
+        BOOKING_LOCK_TIMEOUT_MS, so bookings for different times of the
+        same day both go through; SlotUnavailable is raised only when
+        every candidate's bitmap overlaps the booking.
+        """
+        business = validated_data['business_obj']
+        date = validated_data['date']
+        mask = interval_mask(*to_interval(validated_data['time'], end_time))
+        
+        set_lock_timeout(settings.BOOKING_LOCK_TIMEOUT_MS)
+        
+        # Bookings without staff block everyone; a business without
+        # staff books against that row alone
+        shared_occupied = 0
+        if validated_data['free_staff'] != [None]:
+            shared = share_occupancy(business.id, date)
+            if shared is not None:
+                shared_occupied = shared.occupied
+        
+        for staff in validated_data['free_staff']:
+            occupancy = lock_occupancy(business.id, staff.id if staff else None, date)
+            if not (occupancy.occupied | shared_occupied) & mask:
+                return staff
+        
+        raise SlotUnavailable()
+    
     def create(self, validated_data):
         """Create booking"""
         business = validated_data['business_obj']
         service = validated_data['service_obj']
-        staff = validated_data.get('staff_obj')
         
         # Calculate end time
         start_datetime = datetime.combine(
@@ -205,6 +266,40 @@ class BookingCreateSerializer(serializers.Serializer):
         )
         end_datetime = start_datetime + timedelta(minutes=service.duration_minutes)
         
+        ensure_occupancy(
+            business.id,
+            {None, *(staff.id for staff in validated_data['free_staff'] if staff)},
+            validated_data['date'],
+        )
+        
+        try:
+            with transaction.atomic():
+                staff = self.reserve_staff(validated_data, end_datetime.time())
+                booking = self.create_booking(validated_data, staff, end_datetime.time())
+        except OperationalError as error:
+            if not is_lock_timeout(error):
+                raise
+            raise BookingBusy()
+        except SlotUnavailable:
+            # Locks are released by now
+            raise SlotUnavailable({
+                'time': 'This time slot is no longer available.',
+                'alternatives': get_alternative_slots(
+                    business,
+                    service,
+                    validated_data['date'],
+                    validated_data['time'],
+                    validated_data['staff_obj']
+                )
+            })
+        
+        return booking
+    
+    def create_booking(self, validated_data, staff, end_time):
+        """Insert the booking and its history entry"""
+        business = validated_data['business_obj']
+        service = validated_data['service_obj']
+        
         # Create booking
         booking = Booking.objects.create(
             customer=self.context['request'].user,
@@ -213,7 +308,7 @@ class BookingCreateSerializer(serializers.Serializer):
             staff=staff,
             date=validated_data['date'],
             time=validated_data['time'],
-            end_time=end_datetime.time(),
+            end_time=end_time,
             duration_minutes=service.duration_minutes,
             service_price=service.price,
             final_price=service.final_price,
@@ -304,6 +399,3 @@ class BookingStatusUpdateSerializer(serializers.Serializer):
         )
         
         return booking
-
-
-from django.db import models
@@ -0,0 +1,44 @@
+"""
+Booking Tasks
+"""
+from datetime import datetime
+
+from celery import group, shared_task
+from django.conf import settings
+
+from businesses.models import Business
+from .availability import (
+    get_bookable_business_ids,
+    precompute_business,
+    precompute_businesses,
+)
+
+
+@shared_task(ignore_result=True)
+def precompute_availability_chunk(business_ids):
+    """Precompute availability for a chunk of businesses"""
+    return precompute_businesses(business_ids)
+
+
+@shared_task(ignore_result=True)
+def precompute_availability():
+    """Precompute availability for every bookable business, in parallel chunks"""
+    business_ids = get_bookable_business_ids()
+    chunk_size = settings.AVAILABILITY_PRECOMPUTE_CHUNK_SIZE
+
+    group(
+        precompute_availability_chunk.s(business_ids[index:index + chunk_size])
+        for index in range(0, len(business_ids), chunk_size)
+    ).apply_async()
+
+
+@shared_task(ignore_result=True)
+def refresh_availability_day(business_id, date_str):
+    """Recompute one business day after a booking or block changed it"""
+    try:
+        business = Business.objects.get(id=business_id)
+    except Business.DoesNotExist:
+        return
+
+    date = datetime.strptime(date_str, '%Y-%m-%d').date()
+    precompute_business(business, date, date)
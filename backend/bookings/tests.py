@@ -0,0 +1,332 @@
+import threading
+from datetime import time, timedelta
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from businesses.models import Staff
+from businesses.testing import LOCAL_CACHES, create_business, create_user
+from services.models import Service, ServiceStaff
+from .availability import get_day_slots
+from .models import Booking, DailyOccupancy
+from .occupancy import ensure_occupancy, from_bytes, interval_mask, rebuild_occupancy
+from .serializers import BookingBusy, BookingCreateSerializer, SlotUnavailable
+
+class BookingTestData:
+    """A business open 09:00-21:00 every day with two staff and a one-hour service"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = create_business()
+        cls.customer = create_user('09120000002')
+        cls.service = Service.objects.create(
+            business=cls.business,
+            name='کوتاهی مو',
+            price=500000,
+            duration_minutes=60,
+        )
+        cls.staff_a, cls.staff_b = [
+            Staff.objects.create(business=cls.business, name=f'Staff {index}', gender='female')
+            for index in range(2)
+        ]
+
+        # Far enough ahead to be cancellable
+        cls.date = timezone.now().date() + timedelta(days=7)
+
+    def setUp(self):
+        cache.clear()
+
+    def add_booking(self, start, staff=None, date=None):
+        return Booking.objects.create(
+            customer=self.customer,
+            business=self.business,
+            service=self.service,
+            staff=staff,
+            date=date or self.date,
+            time=start,
+            end_time=time(start.hour + 1, start.minute),
+            duration_minutes=60,
+        )
+
+    def get_serializer(self, start, staff=None):
+        request = APIRequestFactory().post('/api/bookings/')
+        request.user = self.customer
+
+        return BookingCreateSerializer(
+            data={
+                'business': self.business.id,
+                'service': self.service.id,
+                'staff': staff.id if staff else None,
+                'date': self.date.isoformat(),
+                'time': start.strftime('%H:%M'),
+            },
+            context={'request': request},
+        )
+
+    def book(self, start, staff=None):
+        serializer = self.get_serializer(start, staff)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        return serializer.save()
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class OccupancyRefreshTests(BookingTestData, TestCase):
+    """Booking saves must keep the occupancy bitmaps equal to their bookings"""
+
+    def get_occupied(self, staff, date=None):
+        occupancy = DailyOccupancy.objects.filter(
+            business=self.business, staff=staff, date=date or self.date
+        ).first()
+        return from_bytes(occupancy.bitmap) if occupancy else 0
+
+    def assertRebuildKeeps(self):
+        """A full rebuild must find nothing to repair"""
+        before = dict(DailyOccupancy.objects.values_list('pk', 'bitmap'))
+        rebuild_occupancy([self.business.id])
+        after = dict(DailyOccupancy.objects.values_list('pk', 'bitmap'))
+
+        self.assertEqual(
+            {pk: from_bytes(bitmap) for pk, bitmap in after.items()},
+            {pk: from_bytes(before.get(pk, b'')) for pk in after},
+        )
+
+    def test_create(self):
+        self.add_booking(time(10), self.staff_a)
+        self.add_booking(time(14, 30), self.staff_a)
+        self.add_booking(time(12))
+
+        self.assertEqual(
+            self.get_occupied(self.staff_a),
+            interval_mask(600, 660) | interval_mask(870, 930),
+        )
+        self.assertEqual(self.get_occupied(self.staff_b), 0)
+        self.assertEqual(self.get_occupied(None), interval_mask(720, 780))
+        self.assertRebuildKeeps()
+
+    def test_cancel(self):
+        booking = self.add_booking(time(10), self.staff_a)
+        self.add_booking(time(16), self.staff_a)
+
+        booking.cancel()
+
+        self.assertEqual(self.get_occupied(self.staff_a), interval_mask(960, 1020))
+        self.assertRebuildKeeps()
+
+    def test_reschedule_time(self):
+        booking = self.add_booking(time(10), self.staff_a)
+
+        booking.time = time(11, 30)
+        booking.end_time = time(12, 30)
+        booking.save()
+
+        self.assertEqual(self.get_occupied(self.staff_a), interval_mask(690, 750))
+        self.assertRebuildKeeps()
+
+    def test_reschedule_to_other_staff_and_day(self):
+        booking = self.add_booking(time(10), self.staff_a)
+        next_day = self.date + timedelta(days=1)
+
+        booking.staff = self.staff_b
+        booking.date = next_day
+        booking.save()
+
+        self.assertEqual(self.get_occupied(self.staff_a), 0)
+        self.assertEqual(self.get_occupied(self.staff_b), 0)
+        self.assertEqual(self.get_occupied(self.staff_b, next_day), interval_mask(600, 660))
+        self.assertRebuildKeeps()
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class AvailabilityInvalidationTests(BookingTestData, TestCase):
+    """Cached slots must follow every booking change once it commits"""
+
+    def get_free_times(self, staff, date=None):
+        return {
+            slot['time']
+            for slot in get_day_slots(self.business, self.service, date or self.date, staff)
+            if slot['available']
+        }
+
+    def test_status_change(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = self.add_booking(time(10), self.staff_a)
+            booking.status = 'confirmed'
+            booking.save()
+        self.assertNotIn('10:00', self.get_free_times(self.staff_a))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.complete()
+
+        self.assertIn('10:00', self.get_free_times(self.staff_a))
+
+    def test_reschedule(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = self.add_booking(time(10), self.staff_a)
+        self.assertNotIn('10:00', self.get_free_times(self.staff_a))
+        self.assertIn('14:00', self.get_free_times(self.staff_b))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.staff = self.staff_b
+            booking.time = time(14)
+            booking.end_time = time(15)
+            booking.save()
+
+        self.assertIn('10:00', self.get_free_times(self.staff_a))
+        self.assertNotIn('14:00', self.get_free_times(self.staff_b))
+
+    def test_rebuild_repairs_cached_slots(self):
+        self.add_booking(time(10), self.staff_a)
+        DailyOccupancy.objects.filter(staff=self.staff_a).update(bitmap=b'')
+        self.assertIn('10:00', self.get_free_times(self.staff_a))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            rebuild_occupancy([self.business.id])
+
+        self.assertNotIn('10:00', self.get_free_times(self.staff_a))
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class BookingCreateSerializerTests(BookingTestData, TestCase):
+    """Booking creation must reject overlaps and assign a free qualified staff member"""
+
+    def test_assigns_staff_in_id_order(self):
+        first = self.book(time(10))
+        second = self.book(time(10))
+
+        self.assertEqual(first.staff, self.staff_a)
+        self.assertEqual(second.staff, self.staff_b)
+
+    def test_rejects_slot_when_every_staff_member_is_taken(self):
+        self.book(time(10))
+        self.book(time(10, 30))
+
+        serializer = self.get_serializer(time(10))
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('time', serializer.errors)
+        self.assertNotIn('10:00', serializer.errors['alternatives'])
+        self.assertIn('11:00', serializer.errors['alternatives'])
+
+    def test_rejects_overlap_with_chosen_staff(self):
+        self.book(time(10), self.staff_a)
+
+        self.assertFalse(self.get_serializer(time(10, 30), self.staff_a).is_valid())
+        self.assertFalse(self.get_serializer(time(9, 30), self.staff_a).is_valid())
+        self.assertEqual(self.book(time(11), self.staff_a).staff, self.staff_a)
+        self.assertEqual(self.book(time(10, 30), self.staff_b).staff, self.staff_b)
+
+    def test_only_qualified_staff_are_assigned(self):
+        ServiceStaff.objects.create(service=self.service, staff=self.staff_b)
+
+        self.assertEqual(self.book(time(10)).staff, self.staff_b)
+        self.assertFalse(self.get_serializer(time(10)).is_valid())
+
+        # Chosen explicitly, an unqualified member is still refused
+        serializer = self.get_serializer(time(14), self.staff_a)
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(serializer.errors['alternatives'], [])
+
+    def test_booking_without_staff_blocks_everyone(self):
+        self.add_booking(time(10))
+
+        self.assertFalse(self.get_serializer(time(10)).is_valid())
+        self.assertFalse(self.get_serializer(time(10), self.staff_b).is_valid())
+
+    def test_slot_taken_after_validation(self):
+        serializer = self.get_serializer(time(10), self.staff_a)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+
+        # Committed by a concurrent request in the meantime
+        self.add_booking(time(10, 30), self.staff_a)
+
+        with self.assertRaises(SlotUnavailable) as raised:
+            serializer.save()
+        self.assertIn('alternatives', raised.exception.detail)
+        self.assertEqual(
+            Booking.objects.filter(business=self.business, staff=self.staff_a).count(), 1
+        )
+
+    def test_other_staff_taken_after_validation(self):
+        serializer = self.get_serializer(time(10))
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+
+        self.add_booking(time(10), self.staff_a)
+
+        self.assertEqual(serializer.save().staff, self.staff_b)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ConcurrentBookingTests(BookingTestData, TransactionTestCase):
+    """A request waits for a staff day locked by another booking instead of failing"""
+
+    def setUp(self):
+        self.setUpTestData()
+        super().setUp()
+
+        # Committed up front, as the request does before its transaction
+        ensure_occupancy(
+            self.business.id, {None, self.staff_a.id, self.staff_b.id}, self.date
+        )
+
+    def book_in_thread(self, start, staff=None):
+        """Book from another connection; returns the thread and its outcome"""
+        outcome = {}
+
+        def run():
+            try:
+                serializer = self.get_serializer(start, staff)
+                if serializer.is_valid():
+                    outcome['booking'] = serializer.save()
+                else:
+                    outcome['errors'] = serializer.errors
+            except Exception as error:
+                outcome['error'] = error
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        return thread, outcome
+
+    def book_while_locked(self, first, second, staff=None):
+        """Book `second` while the transaction that booked `first` is still open"""
+        with transaction.atomic():
+            self.book(first, staff)
+            thread, outcome = self.book_in_thread(second, staff)
+
+            # The second request waits on the staff day
+            thread.join(0.5)
+            self.assertTrue(thread.is_alive())
+
+        thread.join()
+        return outcome
+
+    def test_non_overlapping_bookings_for_one_staff_member(self):
+        outcome = self.book_while_locked(time(10), time(14), self.staff_a)
+
+        self.assertEqual(outcome['booking'].staff, self.staff_a)
+        self.assertEqual(outcome['booking'].time, time(14))
+
+    def test_non_overlapping_bookings_without_staff(self):
+        Staff.objects.filter(business=self.business).delete()
+
+        outcome = self.book_while_locked(time(10), time(14))
+
+        self.assertIsNone(outcome['booking'].staff)
+
+    def test_overlapping_booking_is_refused_after_waiting(self):
+        outcome = self.book_while_locked(time(10), time(10, 30), self.staff_a)
+
+        self.assertIsInstance(outcome['error'], SlotUnavailable)
+        self.assertNotIn('10:30', outcome['error'].detail['alternatives'])
+
+    @override_settings(BOOKING_LOCK_TIMEOUT_MS=100)
+    def test_lock_wait_is_bounded(self):
+        with transaction.atomic():
+            self.book(time(10), self.staff_a)
+            thread, outcome = self.book_in_thread(time(14), self.staff_a)
+            thread.join()
+
+        self.assertIsInstance(outcome['error'], BookingBusy)
@@ -7,7 +7,8 @@ from .views import (
     BookingDetailView,
     BookingCreateView,
     cancel_booking,
-    rate_booking
+    rate_booking,
+    availability_cache_stats
 )
 
 app_name = 'bookings'
@@ -19,4 +20,7 @@ urlpatterns = [
     path('<int:pk>/', BookingDetailView.as_view(), name='booking_detail'),
     path('<int:pk>/cancel/', cancel_booking, name='cancel_booking'),
     path('<int:pk>/rate/', rate_booking, name='rate_booking'),
+    
+    # Monitoring
+    path('availability-cache-stats/', availability_cache_stats, name='availability_cache_stats'),
 ]
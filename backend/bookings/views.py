@@ -2,11 +2,12 @@
 Booking Views
 """
 from rest_framework import generics, permissions, status
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
 from .models import Booking
+from .availability_cache import get_cache_stats
 from .serializers import (
     BookingListSerializer,
     BookingDetailSerializer,
@@ -39,6 +40,16 @@ class BookingCreateView(generics.CreateAPIView):
     """Create new booking"""
     serializer_class = BookingCreateSerializer
     
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        booking = self.perform_create(serializer)
+        
+        return Response(
+            BookingDetailSerializer(booking, context={'request': request}).data,
+            status=status.HTTP_201_CREATED
+        )
+    
     def perform_create(self, serializer):
         booking = serializer.save()
         
@@ -112,3 +123,10 @@ def rate_booking(request, pk):
         }, status=status.HTTP_201_CREATED)
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def availability_cache_stats(request):
+    """Get availability cache hit/miss counters"""
+    return Response(get_cache_stats())
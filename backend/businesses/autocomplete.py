@@ -0,0 +1,169 @@
+"""
+Search Autocomplete
+
+Suggestions for the search box come from an in-memory prefix index of
+business, service, category and area names, kept per process. Each
+normalized name is indexed from the start of every word, so 'آز' suggests
+'سالن آزاده'. The index is a sorted array searched with bisect; top
+suggestions for one and two letter prefixes, which match most of the
+array, are precomputed.
+
+The index is rebuilt when the listing cache generations move on (any
+business, service or reference data change), at most once per
+REBUILD_INTERVAL; requests keep using the old index meanwhile.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from django.db.models import Count, Q
+
+from .listing_cache import get_generations
+from .normalization import normalize_text
+
+SCOPES = ('businesses', 'reference')
+
+REBUILD_INTERVAL = 30
+TOP_PREFIX_LENGTH = 2
+
+DEFAULT_LIMIT = 5
+MAX_LIMIT = 10
+
+# Businesses shown in search results
+VISIBLE = {'is_active': True, 'status': 'approved', 'allow_online_booking': True}
+
+_index = None
+_lock = threading.Lock()
+
+
+def _visible_count(relation):
+    """Count of visible businesses through a relation"""
+    return Count(relation, filter=Q(**{f'{relation}__{field}': value for field, value in VISIBLE.items()}))
+
+
+def _word_keys(label):
+    """Normalized label from the start of each of its words"""
+    words = normalize_text(label).split(' ')
+    return {' '.join(words[i:]) for i in range(len(words)) if words[i]}
+
+
+class PrefixIndex:
+    """Sorted array of name keys for one kind of suggestion"""
+
+    def __init__(self, suggestions):
+        # suggestions: [(suggestion dict, weight)], best first on ties
+        self.suggestions = [suggestion for suggestion, _ in suggestions]
+        self.weights = [weight for _, weight in suggestions]
+
+        entries = sorted(
+            (key, position)
+            for position, (suggestion, _) in enumerate(suggestions)
+            for key in _word_keys(suggestion['label'])
+        )
+        self.keys = [key for key, _ in entries]
+        self.positions = [position for _, position in entries]
+
+        self.top = {}
+        for length in range(1, TOP_PREFIX_LENGTH + 1):
+            matches = {}
+            for key, position in entries:
+                if len(key) >= length:
+                    matches.setdefault(key[:length], set()).add(position)
+            for prefix, positions in matches.items():
+                self.top[prefix] = self._best(positions, MAX_LIMIT)
+
+    def _best(self, positions, limit):
+        return sorted(positions, key=lambda position: (-self.weights[position], position))[:limit]
+
+    def search(self, prefix, limit):
+        if len(prefix) <= TOP_PREFIX_LENGTH:
+            positions = self.top.get(prefix, [])[:limit]
+        else:
+            start = bisect_left(self.keys, prefix)
+            end = bisect_left(self.keys, prefix + '\uffff', start)
+            positions = self._best(set(self.positions[start:end]), limit)
+
+        return [self.suggestions[position] for position in positions]
+
+
+class AutocompleteIndex:
+    """Prefix indexes for every kind of suggestion, built from the database"""
+
+    def __init__(self, generation):
+        from services.models import Service
+        from .models import Area, Business, Category
+
+        self.generation = generation
+        self.checked_at = time.monotonic()
+
+        businesses = Business.objects.filter(**VISIBLE)
+
+        self.indexes = {
+            'businesses': PrefixIndex([
+                ({'id': business_id, 'label': name}, total_bookings)
+                for business_id, name, total_bookings in businesses
+                .order_by('-average_rating', 'id')
+                .values_list('id', 'name', 'total_bookings')
+            ]),
+            'services': PrefixIndex([
+                ({'label': name}, count)
+                for name, count in Service.objects.filter(
+                    is_active=True, business__in=businesses
+                ).order_by('name').values_list('name').annotate(count=Count('business', distinct=True))
+            ]),
+            'categories': PrefixIndex([
+                ({'id': category_id, 'label': name}, count)
+                for category_id, name, count in Category.objects.filter(is_active=True)
+                .annotate(count=_visible_count('businesses'))
+                .order_by('order', 'name')
+                .values_list('id', 'name', 'count')
+            ]),
+            'areas': PrefixIndex([
+                ({'id': area_id, 'label': name, 'city': city}, count)
+                for area_id, name, city, count in Area.objects.filter(is_active=True, city__is_active=True)
+                .annotate(count=_visible_count('business'))
+                .order_by('name')
+                .values_list('id', 'name', 'city__name', 'count')
+            ]),
+        }
+
+    def search(self, text, limit=DEFAULT_LIMIT):
+        prefix = normalize_text(text)
+        if not prefix:
+            return {kind: [] for kind in self.indexes}
+
+        return {kind: index.search(prefix, limit) for kind, index in self.indexes.items()}
+
+
+def get_index():
+    """
+    The process's autocomplete index, rebuilt first when data changed.
+    Only one thread rebuilds; the others keep using the current index.
+    """
+    global _index
+
+    index = _index
+    if index is not None:
+        if time.monotonic() - index.checked_at < REBUILD_INTERVAL:
+            return index
+        generation = tuple(get_generations(SCOPES))
+        if index.generation == generation:
+            index.checked_at = time.monotonic()
+            return index
+    else:
+        generation = tuple(get_generations(SCOPES))
+
+    # Wait for the first build, never for a rebuild
+    if _lock.acquire(blocking=index is None):
+        try:
+            if _index is index:
+                _index = AutocompleteIndex(generation)
+        finally:
+            _lock.release()
+
+    return _index or index
+
+
+def autocomplete(text, limit=DEFAULT_LIMIT):
+    """Suggestions for a partially typed search, grouped by kind"""
+    return get_index().search(text, min(limit, MAX_LIMIT))
@@ -0,0 +1,98 @@
+"""
+Business Search Facets
+
+Counts per category, city, area, gender target and rating for a
+filtered business queryset, computed in a single GROUPING SETS query
+over the same filters as the result page.
+"""
+from django.core.exceptions import EmptyResultSet
+from django.db import connection
+from django.db.models.functions import Floor
+
+# Columns selected from the filtered queryset, in order
+FACET_COLUMNS = [
+    'category_id', 'category_name',
+    'city_id', 'city_name',
+    'area_id', 'area_name',
+    'gender_target', 'rating',
+]
+
+# GROUPING() bitmask of the row for each facet: the grouped column's bit
+# is 0, those of the other four are 1
+GROUPING_MASKS = {
+    0b01111: 'category',
+    0b10111: 'city',
+    0b11011: 'area',
+    0b11101: 'gender_target',
+    0b11110: 'rating',
+}
+
+MIN_RATINGS = [4, 3, 2, 1]
+
+
+def get_facets(queryset):
+    """Facet counts for every business matching `queryset`"""
+    rows = queryset.order_by().values(
+        'category_id', 'category__name',
+        'city_id', 'city__name',
+        'area_id', 'area__name',
+        'gender_target',
+        rating=Floor('average_rating'),
+    )
+    try:
+        sql, params = rows.query.sql_with_params()
+    except EmptyResultSet:
+        sql = None
+
+    results = []
+    if sql is not None:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT {', '.join(FACET_COLUMNS)},
+                       GROUPING(category_id, city_id, area_id, gender_target, rating),
+                       COUNT(*)
+                FROM ({sql}) AS filtered({', '.join(FACET_COLUMNS)})
+                GROUP BY GROUPING SETS (
+                    (category_id, category_name),
+                    (city_id, city_name),
+                    (area_id, area_name),
+                    (gender_target),
+                    (rating)
+                )
+                """,
+                params,
+            )
+            results = cursor.fetchall()
+
+    facets = {'category': [], 'city': [], 'area': [], 'gender_target': []}
+    rating_counts = {}
+
+    for (category_id, category_name, city_id, city_name, area_id, area_name,
+         gender_target, rating, grouping, count) in results:
+        facet = GROUPING_MASKS[grouping]
+
+        if facet == 'category' and category_id is not None:
+            facets['category'].append({'id': category_id, 'name': category_name, 'count': count})
+        elif facet == 'city' and city_id is not None:
+            facets['city'].append({'id': city_id, 'name': city_name, 'count': count})
+        elif facet == 'area' and area_id is not None:
+            facets['area'].append({'id': area_id, 'name': area_name, 'count': count})
+        elif facet == 'gender_target':
+            facets['gender_target'].append({'value': gender_target, 'count': count})
+        elif facet == 'rating' and rating is not None:
+            rating_counts[int(rating)] = count
+
+    for values in facets.values():
+        values.sort(key=lambda value: -value['count'])
+
+    # Buckets match the min_rating filter: "4+" counts ratings of 4 and up
+    facets['rating'] = [
+        {
+            'min_rating': min_rating,
+            'count': sum(count for rating, count in rating_counts.items() if rating >= min_rating),
+        }
+        for min_rating in MIN_RATINGS
+    ]
+
+    return facets
@@ -0,0 +1,150 @@
+"""
+Business Geo Search
+
+Businesses store a geohash of their coordinates. A "near me" query
+expands the search circle to a bounding box, covers it with a handful
+of geohash prefixes (an index range scan each), and refines the
+candidates with the exact haversine distance computed in SQL.
+"""
+import math
+
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import ASin, Cast, Cos, Power, Radians, Sin, Sqrt
+
+EARTH_RADIUS_KM = 6371.0
+
+GEOHASH_PRECISION = 7
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Most geohash prefixes used to cover a search box
+MAX_COVER_CELLS = 16
+
+DEFAULT_RADIUS_KM = 10
+MAX_RADIUS_KM = 50
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Encode coordinates as a geohash string"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    latitude = float(latitude)
+    longitude = float(longitude)
+
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_range[0] + lng_range[1]) / 2
+            if longitude >= mid:
+                value = value * 2 + 1
+                lng_range[0] = mid
+            else:
+                value = value * 2
+                lng_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                value = value * 2 + 1
+                lat_range[0] = mid
+            else:
+                value = value * 2
+                lat_range[1] = mid
+
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits = 0
+            value = 0
+
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(lat, lng) size in degrees of a geohash cell"""
+    lng_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """(min_lat, max_lat, min_lng, max_lng) enclosing a circle"""
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    # Longitude degrees shrink towards the poles
+    lng_delta = lat_delta / max(math.cos(math.radians(latitude)), 0.01)
+
+    return (
+        max(latitude - lat_delta, -90.0),
+        min(latitude + lat_delta, 90.0),
+        max(longitude - lng_delta, -180.0),
+        min(longitude + lng_delta, 180.0),
+    )
+
+
+def covering_geohashes(box):
+    """
+    Geohash prefixes whose cells together cover a bounding box, using
+    the longest prefix that needs at most MAX_COVER_CELLS cells.
+    """
+    min_lat, max_lat, min_lng, max_lng = box
+
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lat_size, lng_size = cell_size(precision)
+        rows = math.floor(max_lat / lat_size) - math.floor(min_lat / lat_size) + 1
+        columns = math.floor(max_lng / lng_size) - math.floor(min_lng / lng_size) + 1
+        if rows * columns > MAX_COVER_CELLS:
+            continue
+
+        cells = set()
+        for row in range(rows):
+            latitude = min(min_lat + row * lat_size, max_lat)
+            for column in range(columns):
+                longitude = min(min_lng + column * lng_size, max_lng)
+                cells.add(encode_geohash(latitude, longitude, precision))
+        # Far edges may fall in a cell the stepping skipped
+        for latitude in (min_lat, max_lat):
+            for longitude in (min_lng, max_lng):
+                cells.add(encode_geohash(latitude, longitude, precision))
+        return sorted(cells)
+
+    return []
+
+
+def haversine(latitude, longitude):
+    """Expression for the distance in km from a point to a business"""
+    business_lat = Radians(Cast(F('latitude'), FloatField()))
+    business_lng = Radians(Cast(F('longitude'), FloatField()))
+    lat = math.radians(latitude)
+    lng = math.radians(longitude)
+
+    a = (
+        Power(Sin((business_lat - lat) / 2), 2)
+        + math.cos(lat) * Cos(business_lat) * Power(Sin((business_lng - lng) / 2), 2)
+    )
+    return 2 * EARTH_RADIUS_KM * ASin(Sqrt(a))
+
+
+def filter_nearby(queryset, latitude, longitude, radius_km=DEFAULT_RADIUS_KM):
+    """
+    Businesses within radius_km of a point, annotated with `distance`
+    in km. Does not order the queryset.
+    """
+    radius_km = min(radius_km, MAX_RADIUS_KM)
+    box = bounding_box(latitude, longitude, radius_km)
+    min_lat, max_lat, min_lng, max_lng = box
+
+    cells = Q()
+    for prefix in covering_geohashes(box):
+        cells |= Q(geohash__startswith=prefix)
+
+    return queryset.filter(
+        cells,
+        latitude__gte=min_lat,
+        latitude__lte=max_lat,
+        longitude__gte=min_lng,
+        longitude__lte=max_lng,
+    ).annotate(
+        distance=haversine(latitude, longitude)
+    ).filter(distance__lte=radius_km)
@@ -0,0 +1,152 @@
+"""
+Listing Response Cache
+
+Caches public listing responses (businesses, categories, cities, areas)
+keyed by the path and a canonical form of the query parameters, so
+`?city=1&category=2` and `?category=2&city=1&q=` share an entry.
+
+Entries are fresh for a short TTL and then served stale for a while
+longer. Only one request at a time recomputes an expired or missing
+entry (single flight); the others get the stale copy, or wait briefly
+for the recomputed one, instead of all hitting the database.
+
+Entries are addressed through generation counters per scope, bumped
+after a transaction that changes the underlying data commits:
+    businesses - business rows, services and their stats
+    reference  - categories, cities and areas
+"""
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+LISTING_CACHE_TIMEOUT = 60
+LISTING_STALE_TIMEOUT = 5 * 60
+REFRESH_LOCK_TIMEOUT = 10
+MISS_WAIT_SECONDS = 2
+MISS_WAIT_STEP = 0.05
+GENERATION_TIMEOUT = 7 * 24 * 60 * 60
+
+# Business fields updated on every booking; changes to only these don't
+# invalidate listings and show up within LISTING_CACHE_TIMEOUT instead
+VOLATILE_BUSINESS_FIELDS = {'total_bookings'}
+
+
+def _generation_key(scope):
+    return f'listing:generation:{scope}'
+
+
+def get_generations(scopes):
+    """Current generation of each scope, in order"""
+    keys = [_generation_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+
+    for key in keys:
+        if key not in found:
+            # Start from the clock, like availability versions, so an
+            # evicted counter never reuses an old value
+            cache.add(key, time.time_ns(), GENERATION_TIMEOUT)
+    if len(found) < len(keys):
+        found = cache.get_many(keys)
+
+    return [found.get(key, 0) for key in keys]
+
+
+def invalidate_listings(*scopes):
+    """Invalidate cached listings of the given scopes once the transaction commits"""
+    def bump():
+        for scope in scopes:
+            key = _generation_key(scope)
+            cache.add(key, time.time_ns(), GENERATION_TIMEOUT)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, time.time_ns(), GENERATION_TIMEOUT)
+
+    transaction.on_commit(bump)
+
+
+def normalize_params(query_params):
+    """
+    Canonical query string: keys sorted and parameters with only blank
+    values dropped. Values are kept as sent, in order, since the views
+    parse each parameter their own way and read the last of repeated
+    values; rewriting them could give two different requests one entry.
+    """
+    parts = []
+    for key in sorted(query_params):
+        values = query_params.getlist(key)
+        if any(values):
+            parts.extend((key, value) for value in values)
+
+    return urlencode(parts)
+
+
+def get_cache_key(request, scopes):
+    """Cache key of a listing request under the current generations"""
+    generations = ':'.join(map(str, get_generations(scopes)))
+    digest = hashlib.sha1(
+        f'{request.get_host()}{request.path}?{normalize_params(request.query_params)}'.encode()
+    ).hexdigest()
+
+    return f'listing:response:{generations}:{digest}'
+
+
+def get_cached_response(key, compute):
+    """
+    Get response data for a key, computing it at most once at a time.
+
+    Returns (data, state), where state is HIT, STALE or MISS.
+    """
+    entry = cache.get(key)
+    now = time.time()
+
+    if entry is not None and entry['fresh_until'] > now:
+        return entry['data'], 'HIT'
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, REFRESH_LOCK_TIMEOUT):
+        try:
+            data = compute()
+            cache.set(
+                key,
+                {'data': data, 'fresh_until': time.time() + LISTING_CACHE_TIMEOUT},
+                LISTING_CACHE_TIMEOUT + LISTING_STALE_TIMEOUT,
+            )
+        finally:
+            cache.delete(lock_key)
+        return data, 'MISS'
+
+    # Someone else is refreshing: serve the stale copy if there is one,
+    # otherwise wait for theirs
+    if entry is not None:
+        return entry['data'], 'STALE'
+
+    deadline = now + MISS_WAIT_SECONDS
+    while time.time() < deadline:
+        time.sleep(MISS_WAIT_STEP)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry['data'], 'HIT'
+
+    return compute(), 'MISS'
+
+
+class CachedListMixin:
+    """Serve GET from the listing cache; set `cache_scopes` on the view"""
+
+    cache_scopes = ('businesses',)
+
+    def get(self, request, *args, **kwargs):
+        def compute():
+            response = super(CachedListMixin, self).get(request, *args, **kwargs)
+            return response.data
+
+        data, state = get_cached_response(get_cache_key(request, self.cache_scopes), compute)
+
+        response = Response(data)
+        response['X-Cache'] = state
+        return response
@@ -0,0 +1,60 @@
+"""
+Django management command to report rendered business cache memory use
+Usage: python manage.py rendered_cache_stats [--business ID ...] [--top N]
+"""
+
+from django.core.management.base import BaseCommand
+
+from businesses.models import Business
+from businesses.rendered_cache import get_rendered_sizes
+
+CHUNK_SIZE = 500
+
+
+def format_bytes(size):
+    if size < 1024:
+        return f'{size} B'
+    return f'{size / 1024:.1f} KB'
+
+
+class Command(BaseCommand):
+    help = 'Report bytes of rendered detail/services JSON cached per business'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--business',
+            type=int,
+            action='append',
+            help='Only report this business (can be repeated)',
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=20,
+            help='Number of largest businesses to list (default: 20)',
+        )
+
+    def handle(self, *args, **options):
+        business_ids = options['business'] or list(
+            Business.objects.order_by('id').values_list('id', flat=True)
+        )
+
+        sizes = {}
+        for index in range(0, len(business_ids), CHUNK_SIZE):
+            sizes.update(get_rendered_sizes(business_ids[index:index + CHUNK_SIZE]))
+
+        totals = {business_id: sum(variants.values()) for business_id, variants in sizes.items()}
+        total = sum(totals.values())
+
+        self.stdout.write(f'📦 Rendered cache: {len(sizes)} of {len(business_ids)} businesses cached')
+        for business_id, size in sorted(totals.items(), key=lambda item: -item[1])[:options['top']]:
+            variants = ', '.join(
+                f'{variant} {format_bytes(variant_size)}'
+                for variant, variant_size in sorted(sizes[business_id].items())
+            )
+            self.stdout.write(f'   #{business_id}: {format_bytes(size)} ({variants})')
+
+        average = total // len(sizes) if sizes else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Total {format_bytes(total)}, {format_bytes(average)} per cached business'
+        ))
@@ -0,0 +1,32 @@
+"""
+Django management command to recompute business ranking scores
+Usage: python manage.py update_ranking_scores [--business ID ...]
+"""
+
+from django.core.management.base import BaseCommand
+
+from businesses.listing_cache import invalidate_listings
+from businesses.ranking import update_all_ranking_scores, update_ranking_scores
+
+
+class Command(BaseCommand):
+    help = 'Recompute business rating and ranking scores'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--business',
+            type=int,
+            action='append',
+            help='Only update this business (can be repeated)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('🔄 Updating ranking scores...')
+
+        if options['business']:
+            count = update_ranking_scores(options['business'])
+            invalidate_listings('businesses')
+        else:
+            count = update_all_ranking_scores()
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Updated {count} businesses'))
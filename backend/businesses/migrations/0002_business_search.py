@@ -0,0 +1,75 @@
+# Generated by Django 5.0.1 on 2026-10-17 14:58
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Coalesce
+
+
+def build_search_vectors(apps, schema_editor):
+    """
+    Backfill search vectors for existing businesses. A frozen copy of
+    the vector at this migration, over the raw name columns.
+    """
+    Business = apps.get_model('businesses', 'Business')
+    Category = apps.get_model('businesses', 'Category')
+    Area = apps.get_model('businesses', 'Area')
+    Service = apps.get_model('services', 'Service')
+
+    def related_name(model, field):
+        return Coalesce(
+            Subquery(model.objects.filter(pk=OuterRef(field)).order_by().values('name')[:1]),
+            Value(''),
+        )
+
+    service_names = Coalesce(
+        Subquery(
+            Service.objects.filter(business=OuterRef('pk'), is_active=True)
+            .order_by()
+            .values('business')
+            .annotate(names=StringAgg('name', delimiter=' '))
+            .values('names')
+        ),
+        Value(''),
+        output_field=TextField(),
+    )
+
+    Business.objects.update(search_vector=(
+        SearchVector('name', weight='A', config='simple')
+        + SearchVector(related_name(Category, 'category_id'), weight='B', config='simple')
+        + SearchVector(service_names, weight='B', config='simple')
+        + SearchVector(related_name(Area, 'area_id'), weight='C', config='simple')
+        + SearchVector('description', weight='D', config='simple')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0001_initial'),
+        ('services', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='business',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='business',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='businesses_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='business',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='businesses_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.RunPython(build_search_vectors, migrations.RunPython.noop),
+    ]
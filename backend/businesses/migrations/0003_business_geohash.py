@@ -0,0 +1,33 @@
+# Generated by Django 5.0.1 on 2026-10-17 15:01
+
+from django.db import migrations, models
+
+
+def build_geohashes(apps, schema_editor):
+    """Backfill geohashes for businesses with coordinates"""
+    from businesses.geo import encode_geohash
+
+    Business = apps.get_model('businesses', 'Business')
+    businesses = list(
+        Business.objects.filter(latitude__isnull=False, longitude__isnull=False)
+        .only('latitude', 'longitude')
+    )
+    for business in businesses:
+        business.geohash = encode_geohash(business.latitude, business.longitude)
+    Business.objects.bulk_update(businesses, ['geohash'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0002_business_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12),
+        ),
+        migrations.RunPython(build_geohashes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.0.1 on 2026-10-17 15:02
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def build_service_stats(apps, schema_editor):
+    """Backfill price range and service count from active services"""
+    Business = apps.get_model('businesses', 'Business')
+    Service = apps.get_model('services', 'Service')
+
+    def aggregate(expression):
+        return Subquery(
+            Service.objects.filter(business=OuterRef('pk'), is_active=True)
+            .order_by()
+            .values('business')
+            .annotate(value=expression)
+            .values('value')
+        )
+
+    Business.objects.update(
+        min_service_price=aggregate(Min('price')),
+        max_service_price=aggregate(Max('price')),
+        active_services_count=Coalesce(aggregate(Count('id')), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0003_business_geohash'),
+        ('services', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='active_services_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='business',
+            name='max_service_price',
+            field=models.DecimalField(blank=True, decimal_places=0, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='business',
+            name='min_service_price',
+            field=models.DecimalField(blank=True, decimal_places=0, max_digits=10, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='business',
+            index=models.Index(fields=['min_service_price'], name='businesses_min_ser_3ba463_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='business',
+            index=models.Index(fields=['max_service_price'], name='businesses_max_ser_827d4e_idx'),
+        ),
+        migrations.RunPython(build_service_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,126 @@
+# Generated by Django 5.0.1 on 2026-10-17 15:09
+
+import django.contrib.postgres.indexes
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+from django.db.models import F, Func, OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Coalesce
+
+# Frozen copy of businesses.normalization at this migration
+REPLACED = {
+    'ي': 'ی',
+    'ى': 'ی',
+    'ك': 'ک',
+    'ة': 'ه',
+    'ۀ': 'ه',
+    'أ': 'ا',
+    'إ': 'ا',
+    '۰': '0', '۱': '1', '۲': '2', '۳': '3', '۴': '4',
+    '۵': '5', '۶': '6', '۷': '7', '۸': '8', '۹': '9',
+    '٠': '0', '١': '1', '٢': '2', '٣': '3', '٤': '4',
+    '٥': '5', '٦': '6', '٧': '7', '٨': '8', '٩': '9',
+    '\u200c': ' ',  # zero width non-joiner
+    '\xa0': ' ',  # no-break space
+}
+REMOVED = ''.join(chr(code) for code in range(0x064B, 0x0653)) + '\u0670\u0640\u200d\u200e\u200f'
+
+
+class Normalized(Func):
+    function = 'TRANSLATE'
+    template = "LOWER(BTRIM(REGEXP_REPLACE(%(function)s(%(expressions)s), '\\s+', ' ', 'g')))"
+    output_field = TextField()
+
+    def __init__(self, expression, **extra):
+        super().__init__(
+            expression,
+            Value(''.join(REPLACED) + REMOVED),
+            Value(''.join(REPLACED.values())),
+            **extra,
+        )
+
+
+def normalize_names(apps, schema_editor):
+    """
+    Backfill normalized columns and rebuild search vectors from them,
+    with a frozen copy of the vector at this migration
+    """
+    Business = apps.get_model('businesses', 'Business')
+    Category = apps.get_model('businesses', 'Category')
+    Area = apps.get_model('businesses', 'Area')
+    Service = apps.get_model('services', 'Service')
+
+    Category.objects.update(name_normalized=Normalized(F('name')))
+    Area.objects.update(name_normalized=Normalized(F('name')))
+    Business.objects.update(
+        name_normalized=Normalized(F('name')),
+        description_normalized=Normalized(F('description')),
+    )
+
+    def related_name(model, field):
+        return Coalesce(
+            Subquery(model.objects.filter(pk=OuterRef(field)).order_by().values('name_normalized')[:1]),
+            Value(''),
+        )
+
+    service_names = Coalesce(
+        Subquery(
+            Service.objects.filter(business=OuterRef('pk'), is_active=True)
+            .order_by()
+            .values('business')
+            .annotate(names=StringAgg('name_normalized', delimiter=' '))
+            .values('names')
+        ),
+        Value(''),
+        output_field=TextField(),
+    )
+
+    Business.objects.update(search_vector=(
+        SearchVector('name_normalized', weight='A', config='simple')
+        + SearchVector(related_name(Category, 'category_id'), weight='B', config='simple')
+        + SearchVector(service_names, weight='B', config='simple')
+        + SearchVector(related_name(Area, 'area_id'), weight='C', config='simple')
+        + SearchVector('description_normalized', weight='D', config='simple')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0004_business_service_stats'),
+        ('services', '0002_service_name_normalized'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='business',
+            name='businesses_name_trgm_idx',
+        ),
+        migrations.AddField(
+            model_name='area',
+            name='name_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='business',
+            name='description_normalized',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='business',
+            name='name_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='name_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=100),
+        ),
+        migrations.RunPython(normalize_names, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='business',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name_normalized'], name='businesses_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.0.1 on 2026-10-17 15:11
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import DurationField, ExpressionWrapper, F, FloatField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, Extract, Ln, Power
+from django.utils import timezone
+
+# Frozen copy of businesses.ranking as of this migration
+PRIOR_REVIEWS = 10
+PRIOR_RATING = 4.0
+BOOKING_WINDOW_DAYS = 180
+BOOKING_HALF_LIFE_DAYS = 30
+BOOKINGS_WEIGHT = 0.25
+
+
+def build_ranking_scores(apps, schema_editor):
+    """Backfill rating and ranking scores"""
+    Business = apps.get_model('businesses', 'Business')
+    Booking = apps.get_model('bookings', 'Booking')
+
+    now = timezone.now()
+    age_days = Extract(
+        ExpressionWrapper(Value(now) - F('created_at'), output_field=DurationField()),
+        'epoch',
+    ) / (24 * 60 * 60)
+    recent_bookings = Coalesce(
+        Subquery(
+            Booking.objects.filter(
+                business=OuterRef('pk'),
+                created_at__gte=now - timedelta(days=BOOKING_WINDOW_DAYS),
+            )
+            .exclude(status='cancelled')
+            .order_by()
+            .values('business')
+            .annotate(weight=Sum(Power(0.5, age_days / BOOKING_HALF_LIFE_DAYS)))
+            .values('weight')
+        ),
+        Value(0.0),
+        output_field=FloatField(),
+    )
+
+    rating_score = (
+        (PRIOR_REVIEWS * PRIOR_RATING + F('total_reviews') * Cast('average_rating', FloatField()))
+        / (PRIOR_REVIEWS + F('total_reviews'))
+    )
+
+    Business.objects.update(
+        rating_score=rating_score,
+        ranking_score=rating_score + BOOKINGS_WEIGHT * Ln(1 + recent_bookings),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0001_initial'),
+        ('businesses', '0005_normalized_names'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='ranking_score',
+            field=models.FloatField(default=0.0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='business',
+            name='rating_score',
+            field=models.FloatField(default=0.0, editable=False),
+        ),
+        migrations.RunPython(build_ranking_scores, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='business',
+            index=models.Index(condition=models.Q(('allow_online_booking', True), ('is_active', True), ('status', 'approved')), fields=['-is_featured', '-ranking_score', 'id'], name='businesses_default_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='business',
+            index=models.Index(condition=models.Q(('allow_online_booking', True), ('is_active', True), ('status', 'approved')), fields=['-ranking_score', 'id'], name='businesses_ranking_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='business',
+            index=models.Index(condition=models.Q(('allow_online_booking', True), ('is_active', True), ('status', 'approved')), fields=['-rating_score', 'id'], name='businesses_rating_idx'),
+        ),
+    ]
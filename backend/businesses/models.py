@@ -1,16 +1,23 @@
 """
 Business Models
 """
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 from accounts.models import User
+from bookings.availability_cache import CALENDAR_FIELDS, invalidate_calendar
+from .listing_cache import VOLATILE_BUSINESS_FIELDS, invalidate_listings
+from .normalization import set_normalized_fields
+from .rendered_cache import invalidate_business
 
 
 class Category(models.Model):
     """Business Category Model"""
     
     name = models.CharField(max_length=100)
+    name_normalized = models.CharField(max_length=100, blank=True, db_index=True, editable=False)
     name_en = models.CharField(max_length=100, blank=True)
     slug = models.SlugField(max_length=100, unique=True)
     description = models.TextField(blank=True)
@@ -27,6 +34,22 @@ class Category(models.Model):
     
     def __str__(self):
         return self.name
+    
+    def save(self, *args, **kwargs):
+        from .search import update_search_vectors
+        
+        set_normalized_fields(self, ['name'], kwargs)
+        super().save(*args, **kwargs)
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'name' in update_fields:
+            update_search_vectors(self.businesses.values('pk'))
+        invalidate_listings('reference', 'businesses')
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        invalidate_listings('reference', 'businesses')
+        return result
 
 
 class City(models.Model):
@@ -46,6 +69,15 @@ class City(models.Model):
     
     def __str__(self):
         return self.name
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        invalidate_listings('reference', 'businesses')
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        invalidate_listings('reference', 'businesses')
+        return result
 
 
 class Area(models.Model):
@@ -53,6 +85,7 @@ class Area(models.Model):
     
     city = models.ForeignKey(City, on_delete=models.CASCADE, related_name='areas')
     name = models.CharField(max_length=100)
+    name_normalized = models.CharField(max_length=100, blank=True, db_index=True, editable=False)
     name_en = models.CharField(max_length=100, blank=True)
     slug = models.SlugField(max_length=100)
     is_active = models.BooleanField(default=True)
@@ -65,6 +98,22 @@ class Area(models.Model):
     
     def __str__(self):
         return f"{self.city.name} - {self.name}"
+    
+    def save(self, *args, **kwargs):
+        from .search import update_search_vectors
+        
+        set_normalized_fields(self, ['name'], kwargs)
+        super().save(*args, **kwargs)
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'name' in update_fields:
+            update_search_vectors(self.business_set.values('pk'))
+        invalidate_listings('reference', 'businesses')
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        invalidate_listings('reference', 'businesses')
+        return result
 
 
 class Business(models.Model):
@@ -94,6 +143,9 @@ class Business(models.Model):
     name = models.CharField(max_length=200)
     slug = models.SlugField(max_length=200, unique=True)
     description = models.TextField()
+    # Normalized copies for search (see businesses.normalization)
+    name_normalized = models.CharField(max_length=200, blank=True, editable=False)
+    description_normalized = models.TextField(blank=True, editable=False)
     category = models.ForeignKey(
         Category,
         on_delete=models.SET_NULL,
@@ -114,6 +166,7 @@ class Business(models.Model):
     address = models.TextField()
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    geohash = models.CharField(max_length=12, blank=True, db_index=True, editable=False)
     
     # Contact
     phone = models.CharField(max_length=11)
@@ -141,6 +194,9 @@ class Business(models.Model):
     # Stats
     total_bookings = models.IntegerField(default=0)
     total_reviews = models.IntegerField(default=0)
+    min_service_price = models.DecimalField(max_digits=10, decimal_places=0, null=True, blank=True)
+    max_service_price = models.DecimalField(max_digits=10, decimal_places=0, null=True, blank=True)
+    active_services_count = models.IntegerField(default=0)
     average_rating = models.DecimalField(
         max_digits=3,
         decimal_places=2,
@@ -148,6 +204,10 @@ class Business(models.Model):
         validators=[MinValueValidator(0), MaxValueValidator(5)]
     )
     
+    # Ranking (maintained by businesses.ranking)
+    rating_score = models.FloatField(default=0.0, editable=False)
+    ranking_score = models.FloatField(default=0.0, editable=False)
+    
     # Status
     status = models.CharField(
         max_length=20,
@@ -162,6 +222,9 @@ class Business(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     approved_at = models.DateTimeField(null=True, blank=True)
     
+    # Search (maintained by businesses.search)
+    search_vector = SearchVectorField(null=True, editable=False)
+    
     class Meta:
         db_table = 'businesses'
         verbose_name = 'Business'
@@ -172,26 +235,94 @@ class Business(models.Model):
             models.Index(fields=['city', 'area']),
             models.Index(fields=['category']),
             models.Index(fields=['-average_rating']),
+            models.Index(fields=['min_service_price']),
+            models.Index(fields=['max_service_price']),
+            GinIndex(fields=['search_vector'], name='businesses_search_idx'),
+            GinIndex(fields=['name_normalized'], name='businesses_name_trgm_idx', opclasses=['gin_trgm_ops']),
+            # Default, "popular" and "rating" listings of visible businesses
+            models.Index(
+                fields=['-is_featured', '-ranking_score', 'id'],
+                condition=models.Q(is_active=True, status='approved', allow_online_booking=True),
+                name='businesses_default_rank_idx',
+            ),
+            models.Index(
+                fields=['-ranking_score', 'id'],
+                condition=models.Q(is_active=True, status='approved', allow_online_booking=True),
+                name='businesses_ranking_idx',
+            ),
+            models.Index(
+                fields=['-rating_score', 'id'],
+                condition=models.Q(is_active=True, status='approved', allow_online_booking=True),
+                name='businesses_rating_idx',
+            ),
         ]
     
     def __str__(self):
         return self.name
     
+    def save(self, *args, **kwargs):
+        from .geo import encode_geohash
+        from .ranking import RANKING_FIELDS, update_ranking_scores
+        from .search import SEARCH_FIELDS, update_search_vectors
+        
+        set_normalized_fields(self, ['name', 'description'], kwargs)
+        
+        # Keep the geohash in step with the coordinates
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = encode_geohash(self.latitude, self.longitude)
+        else:
+            self.geohash = ''
+        if kwargs.get('update_fields') and {'latitude', 'longitude'} & set(kwargs['update_fields']):
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'geohash'}
+        
+        super().save(*args, **kwargs)
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or SEARCH_FIELDS & set(update_fields):
+            update_search_vectors([self.pk])
+        if update_fields is None or RANKING_FIELDS & set(update_fields):
+            update_ranking_scores([self.pk])
+        if update_fields is None or set(update_fields) - VOLATILE_BUSINESS_FIELDS:
+            invalidate_listings('businesses')
+        if update_fields is None or CALENDAR_FIELDS & set(update_fields):
+            invalidate_calendar(self.pk)
+        invalidate_business(self.pk)
+    
+    def delete(self, *args, **kwargs):
+        business_id = self.pk
+        result = super().delete(*args, **kwargs)
+        invalidate_listings('businesses')
+        invalidate_business(business_id)
+        return result
+    
     def update_stats(self):
-        """Update business statistics"""
-        from reviews.models import Review
+        """Update review count and average rating from the running review stats"""
+        from reviews.models import ReviewStats
         
-        reviews = Review.objects.filter(business=self, is_approved=True)
-        self.total_reviews = reviews.count()
+        stats = ReviewStats.objects.filter(business=self).first()
+        self.total_reviews = stats.rating_count if stats else 0
         
         if self.total_reviews > 0:
-            self.average_rating = reviews.aggregate(
-                models.Avg('rating')
-            )['rating__avg']
+            self.average_rating = round(stats.get_average('rating'), 2)
         else:
             self.average_rating = 0.0
         
         self.save(update_fields=['total_reviews', 'average_rating'])
+    
+    def update_service_stats(self):
+        """Update price range and count of active services"""
+        from services.models import Service
+        
+        stats = Service.objects.filter(business=self, is_active=True).aggregate(
+            min_price=models.Min('price'),
+            max_price=models.Max('price'),
+            count=models.Count('id')
+        )
+        self.min_service_price = stats['min_price']
+        self.max_service_price = stats['max_price']
+        self.active_services_count = stats['count']
+        
+        self.save(update_fields=['min_service_price', 'max_service_price', 'active_services_count'])
 
 
 class BusinessImage(models.Model):
@@ -213,6 +344,18 @@ class BusinessImage(models.Model):
     
     def __str__(self):
         return f"{self.business.name} - Image {self.id}"
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Images have no timestamp of their own; the page ETag sees the business
+        Business.objects.filter(pk=self.business_id).update(updated_at=timezone.now())
+        invalidate_business(self.business_id)
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        Business.objects.filter(pk=self.business_id).update(updated_at=timezone.now())
+        invalidate_business(self.business_id)
+        return result
 
 
 class Staff(models.Model):
@@ -265,6 +408,17 @@ class Staff(models.Model):
     
     def __str__(self):
         return f"{self.business.name} - {self.name}"
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        invalidate_business(self.business_id)
+        invalidate_calendar(self.business_id)
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        invalidate_business(self.business_id)
+        invalidate_calendar(self.business_id)
+        return result
 
 
 class StaffSchedule(models.Model):
@@ -297,6 +451,20 @@ class StaffSchedule(models.Model):
     
     def __str__(self):
         return f"{self.staff.name} - {self.get_weekday_display()}"
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Schedules have no timestamp of their own; the page ETag sees the staff member
+        Staff.objects.filter(pk=self.staff_id).update(updated_at=timezone.now())
+        invalidate_business(self.staff.business_id)
+        invalidate_calendar(self.staff.business_id)
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        Staff.objects.filter(pk=self.staff_id).update(updated_at=timezone.now())
+        invalidate_business(self.staff.business_id)
+        invalidate_calendar(self.staff.business_id)
+        return result
 
 
 class StaffLeave(models.Model):
@@ -318,3 +486,12 @@ class StaffLeave(models.Model):
     
     def __str__(self):
         return f"{self.staff.name} - {self.start_date} to {self.end_date}"
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        invalidate_calendar(self.staff.business_id)
+    
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        invalidate_calendar(self.staff.business_id)
+        return result
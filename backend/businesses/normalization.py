@@ -0,0 +1,88 @@
+"""
+Persian Text Normalization
+
+Users type Arabic ي/ك for Persian ی/ک, Persian or Arabic digits, and
+ZWNJ, spaces or nothing between word parts. Searchable names keep a
+normalized shadow column (<field>_normalized) and queries are
+normalized the same way, so equal text compares equal in the index.
+
+normalize_text() is used on save and for queries; Normalized() is the
+same transformation in SQL for set-based backfills.
+"""
+from django.apps import apps as global_apps
+from django.db.models import F, Func, TextField, Value
+
+# Characters replaced one for one
+REPLACED = {
+    'ي': 'ی',
+    'ى': 'ی',
+    'ك': 'ک',
+    'ة': 'ه',
+    'ۀ': 'ه',
+    'أ': 'ا',
+    'إ': 'ا',
+    '۰': '0', '۱': '1', '۲': '2', '۳': '3', '۴': '4',
+    '۵': '5', '۶': '6', '۷': '7', '۸': '8', '۹': '9',
+    '٠': '0', '١': '1', '٢': '2', '٣': '3', '٤': '4',
+    '٥': '5', '٦': '6', '٧': '7', '٨': '8', '٩': '9',
+    '\u200c': ' ',  # zero width non-joiner
+    '\xa0': ' ',  # no-break space
+}
+
+# Characters dropped: diacritics, tatweel and direction marks
+REMOVED = ''.join(chr(code) for code in range(0x064B, 0x0653)) + '\u0670\u0640\u200d\u200e\u200f'
+
+SOURCE_CHARACTERS = ''.join(REPLACED) + REMOVED
+TARGET_CHARACTERS = ''.join(REPLACED.values())
+
+TRANSLATION = str.maketrans(''.join(REPLACED), TARGET_CHARACTERS, REMOVED)
+
+# Model label: fields with a normalized shadow column
+NORMALIZED_FIELDS = {
+    'businesses.Category': ['name'],
+    'businesses.Area': ['name'],
+    'businesses.Business': ['name', 'description'],
+    'services.Service': ['name'],
+}
+
+
+def normalize_text(text):
+    """Normalized form of text: Persian letters, ASCII digits, single spaces, lowercase"""
+    return ' '.join(text.translate(TRANSLATION).lower().split())
+
+
+class Normalized(Func):
+    """SQL equivalent of normalize_text() for a text expression"""
+
+    function = 'TRANSLATE'
+    template = "LOWER(BTRIM(REGEXP_REPLACE(%(function)s(%(expressions)s), '\\s+', ' ', 'g')))"
+    output_field = TextField()
+
+    def __init__(self, expression, **extra):
+        super().__init__(expression, Value(SOURCE_CHARACTERS), Value(TARGET_CHARACTERS), **extra)
+
+
+def set_normalized_fields(instance, fields, save_kwargs):
+    """
+    Fill the normalized columns of `fields` on an instance about to be
+    saved, adding them to update_fields when the source is in there.
+    """
+    for field in fields:
+        setattr(instance, f'{field}_normalized', normalize_text(getattr(instance, field) or ''))
+
+    update_fields = save_kwargs.get('update_fields')
+    if update_fields:
+        changed = set(fields) & set(update_fields)
+        if changed:
+            save_kwargs['update_fields'] = {*update_fields, *(f'{field}_normalized' for field in changed)}
+
+
+def update_normalized_fields(model_label, queryset=None, apps=global_apps):
+    """Recompute a model's normalized columns in a single UPDATE; returns rows updated"""
+    if queryset is None:
+        queryset = apps.get_model(model_label).objects.all()
+
+    return queryset.update(**{
+        f'{field}_normalized': Normalized(F(field))
+        for field in NORMALIZED_FIELDS[model_label]
+    })
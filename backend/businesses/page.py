@@ -0,0 +1,112 @@
+"""
+Business Page
+
+Everything a salon page shows (detail, services, bookable staff, the
+first page of reviews) in one response, with an ETag computed in a
+single query from the business row and the latest modification of each
+child table. A repeat visit with a matching If-None-Match gets a 304
+without loading or serializing anything.
+"""
+import hashlib
+
+from django.db.models import Count, Max, OuterRef, Prefetch, Subquery, Sum, TextField, Value
+from django.db.models.functions import Cast, Coalesce, Concat
+from rest_framework.settings import api_settings
+
+from reviews.models import Review
+from services.models import Service
+from .listing_cache import get_generations
+from .rendered_cache import get_versions
+from .models import Business, Staff
+
+def get_detail_queryset():
+    """
+    Visible businesses with the whole detail graph in four queries:
+    business with its relations and review stats, images, staff and
+    staff schedules.
+    """
+    return Business.objects.filter(
+        is_active=True, status='approved'
+    ).select_related(
+        'category', 'city', 'area__city', 'review_stats'
+    ).prefetch_related(
+        'images',
+        Prefetch('staff_members', queryset=Staff.objects.prefetch_related('schedules')),
+    )
+
+
+def _state(queryset, *aggregates):
+    """Subquery summarising a business's child rows as text"""
+    parts = []
+    for aggregate in aggregates:
+        parts.extend([Cast(aggregate, TextField()), Value('/', output_field=TextField())])
+
+    return Coalesce(
+        Subquery(
+            queryset.filter(business=OuterRef('pk'))
+            .order_by()
+            .values('business')
+            .annotate(state=Concat(*parts[:-1], output_field=TextField()))
+            .values('state')
+        ),
+        Value(''),
+        output_field=TextField(),
+    )
+
+
+def get_page_etag(business_id):
+    """
+    ETag of a business page, or None when the business isn't visible.
+
+    Counts catch deleted children; images and schedules touch their
+    parent's updated_at when they change. Category, city and area names
+    are covered by the 'reference' listing generation, and changes made
+    without the save hooks (such as a review stats recompute) by the
+    business's rendered cache version.
+    """
+    state = Business.objects.filter(
+        pk=business_id, is_active=True, status='approved'
+    ).annotate(
+        services_state=_state(Service.objects.all(), Max('updated_at'), Count('id')),
+        staff_state=_state(Staff.objects.all(), Max('updated_at'), Count('id')),
+        reviews_state=_state(
+            Review.objects.filter(is_approved=True),
+            Max('updated_at'), Count('id'), Sum('helpful_count'),
+        ),
+    ).values_list(
+        'updated_at', 'total_bookings', 'average_rating', 'total_reviews',
+        'services_state', 'staff_state', 'reviews_state',
+    ).first()
+
+    if state is None:
+        return None
+
+    reference = get_generations(('reference',))[0]
+    version = get_versions([business_id])[business_id]
+
+    return hashlib.sha1(repr((state, reference, version)).encode()).hexdigest()
+
+
+def get_page_data(business):
+    """
+    Services, bookable staff and the first page of reviews of a business,
+    the same page BusinessReviewsView serves first.
+    """
+    services = Service.objects.filter(
+        business=business, is_active=True
+    ).select_related('service_category').order_by('-is_popular', 'order', 'name')
+
+    # Already prefetched with the detail
+    staff = [
+        member for member in business.staff_members.all()
+        if member.is_active and member.can_accept_bookings
+    ]
+
+    reviews = list(
+        Review.objects.filter(business=business, is_approved=True)
+        .select_related('customer')
+        .prefetch_related('images')
+        .order_by('-created_at')[:api_settings.PAGE_SIZE]
+    )
+
+    return services, staff, reviews
@@ -0,0 +1,237 @@
+"""
+Business Pagination
+"""
+import base64
+import json
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import F, OrderBy, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over whatever ordering the queryset has.
+
+    The cursor holds the ordering values of the last row on the page and
+    the next page is fetched with a row comparison against them, so deep
+    pages cost the same as the first and rows don't shift between pages
+    when businesses are added. The primary key is appended to the
+    ordering as a tie-break, which keeps pages stable under orderings
+    with many ties such as -is_featured. Nulls are placed as PostgreSQL
+    places them unless the ordering says otherwise: last ascending, first
+    descending.
+
+    A view can drop rows that can't be filtered in SQL by defining
+    get_row_filter(), returning a function from a list of rows to the
+    rows to keep (or None). Rows are then scanned in batches of
+    scan_batch_size until the page is full, at most max_scan_batches
+    per request; a page cut short by the limit still links to the rest.
+    """
+
+    page_size = 20
+    max_page_size = 50
+    scan_batch_size = 50
+    max_scan_batches = 5
+    page_size_query_params = ['page_size', 'limit']
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+
+        queryset = queryset.order_by(*[
+            OrderBy(
+                F(field),
+                descending=descending,
+                nulls_last=(nulls_last and descending) or None,
+                nulls_first=not (nulls_last or descending) or None,
+            )
+            for field, descending, nulls_last in self.ordering
+        ])
+
+        cursor = self.decode_cursor(request, queryset.model)
+        if cursor is not None:
+            queryset = queryset.filter(self.after(cursor))
+
+        row_filter = view.get_row_filter() if hasattr(view, 'get_row_filter') else None
+        if row_filter is not None:
+            return self.scan(queryset, row_filter)
+
+        # One extra row tells whether there is a next page
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        self.last_row = self.page[-1] if self.page else None
+
+        return self.page
+
+    def scan(self, queryset, row_filter):
+        """Fill a page from batches of rows passing `row_filter`"""
+        results = []
+        batch_queryset = queryset
+
+        for _ in range(self.max_scan_batches):
+            batch = list(batch_queryset[:self.scan_batch_size])
+            results.extend(row_filter(batch))
+
+            if len(results) > self.page_size:
+                self.has_next = True
+                self.page = results[:self.page_size]
+                self.last_row = self.page[-1]
+                return self.page
+
+            if len(batch) < self.scan_batch_size:
+                # Nothing left to scan
+                self.has_next = False
+                self.page = results
+                self.last_row = None
+                return self.page
+
+            batch_queryset = queryset.filter(self.after(self.get_values(batch[-1])))
+
+        # Scan limit reached: continue after the last row looked at
+        self.has_next = True
+        self.page = results
+        self.last_row = batch[-1]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        for param in self.page_size_query_params:
+            try:
+                size = int(request.query_params[param])
+            except (KeyError, ValueError):
+                continue
+            if size > 0:
+                return min(size, self.max_page_size)
+
+        return self.page_size
+
+    def get_ordering(self, queryset):
+        """
+        Normalise the ordering to (field, descending, nulls_last) with a
+        pk tie-break; nulls_last is where nulls actually sort
+        """
+        ordering = []
+        for item in queryset.query.order_by or queryset.model._meta.ordering:
+            if isinstance(item, str):
+                descending = item.startswith('-')
+                ordering.append((item.lstrip('-'), descending, not descending))
+            elif isinstance(item, OrderBy) and isinstance(item.expression, F):
+                if item.nulls_last or item.nulls_first:
+                    nulls_last = bool(item.nulls_last)
+                else:
+                    nulls_last = not item.descending
+                ordering.append((item.expression.name, item.descending, nulls_last))
+            else:
+                raise ValueError(f'Unsupported ordering for keyset pagination: {item!r}')
+
+        if not any(field in ('id', 'pk') for field, _, _ in ordering):
+            ordering.append(('id', False, True))
+
+        return ordering
+
+    def after(self, cursor):
+        """
+        Rows after the cursor: for ordering keys k1..kn, those greater on
+        k1, or equal on k1 and greater on k2, and so on.
+        """
+        condition = Q(pk__in=[])
+        equal = Q()
+
+        for (field, descending, nulls_last), value in zip(self.ordering, cursor):
+            if value is None:
+                # Only other nulls follow nulls sorted last; every value
+                # follows nulls sorted first
+                greater = Q(pk__in=[]) if nulls_last else Q(**{f'{field}__isnull': False})
+                same = Q(**{f'{field}__isnull': True})
+            else:
+                greater = Q(**{f'{field}__{"lt" if descending else "gt"}': value})
+                if nulls_last:
+                    greater |= Q(**{f'{field}__isnull': True})
+                same = Q(**{field: value})
+
+            condition |= equal & greater
+            equal &= same
+
+        return condition
+
+    def get_values(self, obj):
+        """Ordering values of a row, as after() takes them"""
+        return [getattr(obj, field) for field, _, _ in self.ordering]
+
+    def encode_cursor(self, obj):
+        values = []
+        for value in self.get_values(obj):
+            if isinstance(value, Decimal):
+                value = str(value)
+            elif hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            values.append(value)
+
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        # A cursor from another ordering, or edited, must not reach the query
+        try:
+            return [
+                self.to_python(model, field, value)
+                for (field, _, _), value in zip(self.ordering, values)
+            ]
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def to_python(self, model, field, value):
+        """Convert a cursor value to its ordering field's type"""
+        if value is None:
+            return None
+
+        try:
+            model_field = model._meta.pk if field == 'pk' else model._meta.get_field(field)
+        except FieldDoesNotExist:
+            # Annotations such as relevance and distance are numbers
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(value)
+            return value
+
+        return model_field.to_python(value)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.last_row))
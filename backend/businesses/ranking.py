@@ -0,0 +1,125 @@
+"""
+Business Ranking
+
+Businesses carry two precomputed scores, so the default, "popular" and
+"rating" listings read the top of a partial index instead of sorting:
+
+    rating_score  - Bayesian average rating: the business's reviews plus
+                    PRIOR_REVIEWS reviews at the site-wide mean, so one
+                    5-star review doesn't outrank a hundred 4.8s
+    ranking_score - rating_score plus a log bonus for recent bookings,
+                    each weighted down by half every BOOKING_HALF_LIFE_DAYS
+
+Scores are recomputed for all businesses periodically (see
+businesses.tasks) and for a single business when its rating changes.
+"""
+from datetime import timedelta
+
+from django.apps import apps as global_apps
+from django.core.cache import cache
+from django.db.models import (
+    DurationField,
+    ExpressionWrapper,
+    F,
+    FloatField,
+    OuterRef,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Cast, Coalesce, Extract, Ln, Power
+from django.utils import timezone
+
+from .listing_cache import invalidate_listings
+
+PRIOR_REVIEWS = 10
+DEFAULT_PRIOR_RATING = 4.0
+PRIOR_RATING_KEY = 'ranking:prior_rating'
+PRIOR_RATING_TIMEOUT = 24 * 60 * 60
+
+BOOKING_WINDOW_DAYS = 180
+BOOKING_HALF_LIFE_DAYS = 30
+BOOKINGS_WEIGHT = 0.25
+
+# Business fields the scores depend on
+RANKING_FIELDS = {'average_rating', 'total_reviews'}
+
+
+def compute_prior_rating(apps=global_apps):
+    """Mean rating over every review on the site, cached for the score updates"""
+    Business = apps.get_model('businesses', 'Business')
+
+    totals = Business.objects.filter(total_reviews__gt=0).aggregate(
+        rating=Sum(F('average_rating') * F('total_reviews'), output_field=FloatField()),
+        reviews=Sum('total_reviews'),
+    )
+    prior = totals['rating'] / totals['reviews'] if totals['reviews'] else DEFAULT_PRIOR_RATING
+
+    cache.set(PRIOR_RATING_KEY, prior, PRIOR_RATING_TIMEOUT)
+    return prior
+
+
+def get_prior_rating():
+    prior = cache.get(PRIOR_RATING_KEY)
+    if prior is None:
+        prior = compute_prior_rating()
+    return prior
+
+
+def get_recent_bookings(apps=global_apps):
+    """Subquery: the business's bookings in the window, halved per half-life of age"""
+    Booking = apps.get_model('bookings', 'Booking')
+
+    now = timezone.now()
+    age_days = Extract(
+        ExpressionWrapper(Value(now) - F('created_at'), output_field=DurationField()),
+        'epoch',
+    ) / (24 * 60 * 60)
+
+    return Coalesce(
+        Subquery(
+            Booking.objects.filter(
+                business=OuterRef('pk'),
+                created_at__gte=now - timedelta(days=BOOKING_WINDOW_DAYS),
+            )
+            .exclude(status='cancelled')
+            .order_by()
+            .values('business')
+            .annotate(weight=Sum(Power(0.5, age_days / BOOKING_HALF_LIFE_DAYS)))
+            .values('weight')
+        ),
+        Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+def update_ranking_scores(business_ids=None, prior_rating=None, apps=global_apps):
+    """
+    Recompute scores in a single UPDATE; returns rows updated. Migrations
+    pass their historical `apps`.
+    """
+    Business = apps.get_model('businesses', 'Business')
+
+    if prior_rating is None:
+        prior_rating = get_prior_rating()
+
+    rating_score = (
+        (PRIOR_REVIEWS * prior_rating + F('total_reviews') * Cast('average_rating', FloatField()))
+        / (PRIOR_REVIEWS + F('total_reviews'))
+    )
+
+    businesses = Business.objects.all()
+    if business_ids is not None:
+        businesses = businesses.filter(pk__in=business_ids)
+
+    return businesses.update(
+        rating_score=rating_score,
+        ranking_score=rating_score + BOOKINGS_WEIGHT * Ln(1 + get_recent_bookings(apps)),
+    )
+
+
+def update_all_ranking_scores():
+    """Recompute the prior and every business's scores, then refresh listings"""
+    updated = update_ranking_scores(prior_rating=compute_prior_rating())
+    invalidate_listings('businesses')
+    return updated
@@ -0,0 +1,129 @@
+"""
+Rendered Business Cache
+
+Caches the rendered JSON bytes of a business's detail and services
+responses, so hits skip the ORM, the serializers and rendering.
+
+Entries are addressed through a version per business, initialised from
+the clock like availability versions. It is bumped after a commit that
+saves or deletes the business or one of its images, staff members,
+staff schedules, services or service staff assignments, and by a review
+stats recompute that changes the business's stats. The reference
+data generation (category, city and area names) is part of the key too.
+
+Each business also keeps a small index of the entries stored under its
+current version and their sizes, for get_rendered_sizes().
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+
+from .listing_cache import get_generations
+
+RENDERED_CACHE_TIMEOUT = 60 * 60
+VERSION_TIMEOUT = 7 * 24 * 60 * 60
+
+
+def _version_key(business_id):
+    return f'business:rendered:version:{business_id}'
+
+
+def _index_key(business_id, version):
+    return f'business:rendered:index:{business_id}:{version}'
+
+
+def get_versions(business_ids):
+    """Current version of each business, initialised when missing"""
+    keys = {business_id: _version_key(business_id) for business_id in business_ids}
+    found = cache.get_many(list(keys.values()))
+
+    missing = [key for key in keys.values() if key not in found]
+    if missing:
+        for key in missing:
+            cache.add(key, time.time_ns(), VERSION_TIMEOUT)
+        found.update(cache.get_many(missing))
+
+    return {business_id: found.get(key, 0) for business_id, key in keys.items()}
+
+
+def invalidate_business(business_id):
+    """Invalidate a business's rendered responses once the transaction commits"""
+    def bump():
+        key = _version_key(business_id)
+        cache.add(key, time.time_ns(), VERSION_TIMEOUT)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), VERSION_TIMEOUT)
+
+    transaction.on_commit(bump)
+
+
+def _store(business_id, version, variant, key, content):
+    cache.set(key, content, RENDERED_CACHE_TIMEOUT)
+
+    index_key = _index_key(business_id, version)
+    index = cache.get(index_key) or {}
+    index[variant] = len(content)
+    cache.set(index_key, index, RENDERED_CACHE_TIMEOUT)
+
+
+def get_rendered_sizes(business_ids):
+    """
+    Bytes cached per business under its current version, as
+    {business_id: {variant: bytes}}; businesses with nothing cached are
+    left out.
+    """
+    versions = get_versions(business_ids)
+    keys = {business_id: _index_key(business_id, version) for business_id, version in versions.items()}
+    found = cache.get_many(list(keys.values()))
+
+    return {business_id: found[key] for business_id, key in keys.items() if found.get(key)}
+
+
+class RenderedCacheMixin:
+    """
+    Serve GET as cached JSON bytes. Set `rendered_cache_kind` and
+    `business_lookup_kwarg`; query parameters in `rendered_cache_params`
+    are part of the key, requests with any other parameter bypass the
+    cache.
+    """
+
+    rendered_cache_kind = None
+    business_lookup_kwarg = 'business_id'
+    rendered_cache_params = ()
+
+    def get(self, request, *args, **kwargs):
+        if set(request.query_params) - set(self.rendered_cache_params):
+            return super().get(request, *args, **kwargs)
+
+        business_id = self.kwargs[self.business_lookup_kwarg]
+        version = get_versions([business_id])[business_id]
+        reference = get_generations(('reference',))[0]
+
+        variant = self.rendered_cache_kind
+        for param in self.rendered_cache_params:
+            value = request.query_params.get(param)
+            if value:
+                variant += f':{param}={value}'
+
+        # Pagination links are absolute
+        key = f'business:rendered:{business_id}:{version}:{reference}:{request.get_host()}:{variant}'
+        content = cache.get(key)
+        state = 'HIT'
+
+        if content is None:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+            content = JSONRenderer().render(response.data)
+            _store(business_id, version, variant, key, content)
+            state = 'MISS'
+
+        response = HttpResponse(content, content_type='application/json')
+        response['X-Cache'] = state
+        return response
@@ -0,0 +1,124 @@
+"""
+Business Search
+
+Businesses carry a precomputed `search_vector` built from their name,
+category, area, active service names and description, kept in a GIN
+index. A trigram index on the name catches typos and partial words the
+vector misses. Both are maintained by Business.save() and Service.save().
+
+Everything is built from the normalized shadow columns and queries are
+normalized the same way (see businesses.normalization).
+"""
+import re
+
+from django.apps import apps as global_apps
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramSimilarity,
+)
+from django.db.models import F, FloatField, OuterRef, Q, Subquery, TextField, Value
+from django.db.models.functions import Cast, Coalesce, Greatest
+
+from .normalization import normalize_text
+
+# Persian has no stemming dictionary; 'simple' lowercases and splits words
+SEARCH_CONFIG = 'simple'
+
+# Fields that feed the search vector
+SEARCH_FIELDS = {'name', 'description', 'category', 'category_id', 'area', 'area_id'}
+
+
+def _related_name(model, field):
+    """Subquery selecting the related row's normalized name for the outer business"""
+    return Coalesce(
+        Subquery(model.objects.filter(pk=OuterRef(field)).order_by().values('name_normalized')[:1]),
+        Value(''),
+    )
+
+
+def get_search_vector(apps=global_apps):
+    """
+    Weighted search vector expression for Business rows. Migrations pass
+    their historical `apps`.
+    """
+    Service = apps.get_model('services', 'Service')
+    Category = apps.get_model('businesses', 'Category')
+    Area = apps.get_model('businesses', 'Area')
+
+    service_names = Coalesce(
+        Subquery(
+            Service.objects.filter(business=OuterRef('pk'), is_active=True)
+            .order_by()
+            .values('business')
+            .annotate(names=StringAgg('name_normalized', delimiter=' '))
+            .values('names')
+        ),
+        Value(''),
+        output_field=TextField(),
+    )
+
+    return (
+        SearchVector('name_normalized', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(_related_name(Category, 'category_id'), weight='B', config=SEARCH_CONFIG)
+        + SearchVector(service_names, weight='B', config=SEARCH_CONFIG)
+        + SearchVector(_related_name(Area, 'area_id'), weight='C', config=SEARCH_CONFIG)
+        + SearchVector('description_normalized', weight='D', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(business_ids=None, apps=global_apps):
+    """Recompute search vectors in a single UPDATE; returns rows updated"""
+    Business = apps.get_model('businesses', 'Business')
+
+    businesses = Business.objects.all()
+    if business_ids is not None:
+        businesses = businesses.filter(pk__in=business_ids)
+
+    return businesses.update(search_vector=get_search_vector(apps))
+
+
+def get_search_query(text):
+    """
+    Prefix query matching every word, so results narrow as the user
+    types: 'سالن آز' matches 'سالن آزاده'. Returns None when the text
+    has no searchable words.
+    """
+    words = re.findall(r'\w+', normalize_text(text))
+    if not words:
+        return None
+
+    return SearchQuery(
+        ' & '.join(f'{word}:*' for word in words),
+        config=SEARCH_CONFIG,
+        search_type='raw',
+    )
+
+
+def search_businesses(queryset, text):
+    """
+    Filter businesses matching `text` and annotate a `relevance` score.
+
+    Matches come from the search vector or, for typos, name trigram
+    similarity; both are index-backed.
+    """
+    text = normalize_text(text)
+    query = get_search_query(text)
+    if query is None:
+        return queryset.none().annotate(relevance=Value(0.0, output_field=FloatField()))
+
+    return queryset.filter(
+        Q(search_vector=query) | Q(name_normalized__trigram_similar=text)
+    ).annotate(
+        # Double precision, so the score survives a round trip through a
+        # pagination cursor unchanged
+        relevance=Cast(
+            Greatest(
+                SearchRank(F('search_vector'), query),
+                TrigramSimilarity('name_normalized', text),
+            ),
+            FloatField(),
+        )
+    )
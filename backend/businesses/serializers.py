@@ -5,6 +5,7 @@ from rest_framework import serializers
 from .models import Business, BusinessImage, Staff, StaffSchedule, Category, City, Area
 from services.models import Service
 from reviews.models import Review
+from reviews.stats import get_review_summary
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -72,6 +73,7 @@ class BusinessListSerializer(serializers.ModelSerializer):
     city = CitySerializer(read_only=True)
     area = AreaSerializer(read_only=True)
     distance = serializers.SerializerMethodField()
+    earliest_slot = serializers.SerializerMethodField()
     
     class Meta:
         model = Business
@@ -80,14 +82,18 @@ class BusinessListSerializer(serializers.ModelSerializer):
             'category', 'city', 'area', 'address',
             'gender_target', 'average_rating', 'total_reviews',
             'total_bookings', 'is_featured', 'opens_at',
-            'closes_at', 'distance'
+            'closes_at', 'min_service_price', 'max_service_price',
+            'distance', 'earliest_slot'
         ]
     
     def get_distance(self, obj):
-        """Calculate distance from user location (if provided)"""
-        # This would calculate distance based on user's location
-        # For now, return None
-        return None
+        """Distance in km from the searched location (if provided)"""
+        distance = getattr(obj, 'distance', None)
+        return round(distance, 2) if distance is not None else None
+    
+    def get_earliest_slot(self, obj):
+        """Earliest free slot, computed in bulk by the list view"""
+        return self.context.get('earliest_slots', {}).get(obj.id)
 
 
 class BusinessDetailSerializer(serializers.ModelSerializer):
@@ -98,6 +104,7 @@ class BusinessDetailSerializer(serializers.ModelSerializer):
     area = AreaSerializer(read_only=True)
     images = BusinessImageSerializer(many=True, read_only=True)
     staff_members = StaffSerializer(many=True, read_only=True)
+    review_summary = serializers.SerializerMethodField()
     
     class Meta:
         model = Business
@@ -109,8 +116,13 @@ class BusinessDetailSerializer(serializers.ModelSerializer):
             'average_rating', 'total_reviews', 'total_bookings',
             'is_featured', 'allow_online_booking', 'auto_confirm_booking',
             'booking_advance_days', 'cancellation_deadline_hours',
-            'slot_duration_minutes', 'images', 'staff_members', 'created_at'
+            'slot_duration_minutes', 'images', 'staff_members', 'review_summary',
+            'created_at'
         ]
+    
+    def get_review_summary(self, obj):
+        # Selected with the business (see businesses.page)
+        return get_review_summary(getattr(obj, 'review_stats', None))
 
 
 class BusinessCreateSerializer(serializers.ModelSerializer):
@@ -0,0 +1,12 @@
+"""
+Business Tasks
+"""
+from celery import shared_task
+
+from .ranking import update_all_ranking_scores
+
+
+@shared_task(ignore_result=True)
+def update_ranking_scores():
+    """Recompute ranking scores for every business"""
+    return update_all_ranking_scores()
@@ -0,0 +1,46 @@
+"""
+Test Helpers
+
+Fixtures shared by the app test modules.
+"""
+from accounts.models import User
+from .models import Business, Category, City
+
+# Saves bump cached listings, pages and availability; keep them off the
+# shared Redis
+LOCAL_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tests',
+    }
+}
+
+
+def create_user(phone_number='09120000001', **fields):
+    return User.objects.create_user(phone_number=phone_number, password='test-pass', **fields)
+
+
+def create_business(owner=None, category=None, city=None, **fields):
+    """
+    Create an approved business in Tehran, with a new owner, category and
+    city unless given. Opening hours are reloaded as times rather than
+    their string defaults.
+    """
+    if owner is None:
+        owner = create_user()
+    if category is None:
+        category = Category.objects.create(name='آرایشگاه زنانه', slug='women-salon')
+    if city is None:
+        city = City.objects.create(name='تهران', slug='tehran', province='تهران')
+
+    fields = {
+        'name': 'سالن آزمایشی',
+        'slug': 'test-salon',
+        'address': 'تهران',
+        'phone': '09120000001',
+        'status': 'approved',
+        **fields,
+    }
+    business = Business.objects.create(owner=owner, category=category, city=city, **fields)
+    business.refresh_from_db()
+    return business
@@ -0,0 +1,862 @@
+import base64
+import json
+import math
+from datetime import time, timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.db.models import F, Value
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from bookings.models import Booking
+from services.models import Service
+from . import autocomplete
+from .autocomplete import PrefixIndex
+from .facets import get_facets
+from .geo import EARTH_RADIUS_KM, bounding_box, covering_geohashes, encode_geohash, filter_nearby
+from .listing_cache import normalize_params
+from .models import Area, Business, BusinessImage, Category, City, Staff, StaffSchedule
+from .normalization import Normalized, normalize_text
+from .pagination import KeysetPagination
+from .ranking import BOOKINGS_WEIGHT, PRIOR_RATING_KEY, PRIOR_REVIEWS, update_ranking_scores
+from .search import search_businesses
+from .testing import LOCAL_CACHES, create_business, create_user
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class BusinessDetailQueryCountTests(TestCase):
+    """The detail page must not issue queries per staff member or image"""
+
+    # Business with category/city/area, images, staff, schedules
+    DETAIL_QUERIES = 4
+
+    @classmethod
+    def setUpTestData(cls):
+        city = City.objects.create(name='تهران', slug='tehran', province='تهران')
+        area = Area.objects.create(city=city, name='ونک', slug='vanak')
+
+        cls.business = create_business(
+            city=city,
+            area=area,
+            description='سالن زیبایی',
+            address='تهران، ونک',
+        )
+
+    def setUp(self):
+        # Pin the query plan, not the rendered cache
+        cache.clear()
+
+    def add_staff(self, count):
+        for index in range(count):
+            staff = Staff.objects.create(
+                business=self.business,
+                name=f'Staff {index}',
+                gender='female',
+            )
+            for weekday in range(6):
+                StaffSchedule.objects.create(
+                    staff=staff,
+                    weekday=weekday,
+                    start_time=time(9),
+                    end_time=time(18),
+                )
+
+    def add_images(self, count):
+        for index in range(count):
+            BusinessImage.objects.create(
+                business=self.business,
+                image=f'businesses/gallery/{index}.jpg',
+                order=index,
+            )
+
+    def get_detail(self):
+        return self.client.get(reverse('businesses:business_detail', args=[self.business.id]))
+
+    def test_query_count_with_one_staff_member(self):
+        self.add_staff(1)
+        self.add_images(1)
+
+        with self.assertNumQueries(self.DETAIL_QUERIES):
+            response = self.get_detail()
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_query_count_does_not_grow_with_staff(self):
+        self.add_staff(10)
+        self.add_images(3)
+
+        with self.assertNumQueries(self.DETAIL_QUERIES):
+            response = self.get_detail()
+
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(len(data['staff_members']), 10)
+        self.assertEqual(len(data['staff_members'][0]['schedules']), 6)
+        self.assertEqual(len(data['images']), 3)
+        self.assertEqual(data['area']['city']['name'], 'تهران')
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class BusinessListKeysetTests(TestCase):
+    """Following next links must visit every business once, in order"""
+
+    # Minimum/maximum service price per business; None has no services
+    PRICES = [
+        (100, 300), (100, 500), (None, None), (200, 200), (100, 300),
+        (None, None), (300, 900), (200, 500), (None, None), (100, 300),
+        (200, 200), (300, 900),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        first = create_business(name='سالن 0', slug='salon-0')
+        cls.category = first.category
+
+        cls.businesses = [first] + [
+            create_business(
+                owner=first.owner,
+                category=first.category,
+                city=first.city,
+                name=f'سالن {index}',
+                slug=f'salon-{index}',
+            )
+            for index in range(1, len(cls.PRICES))
+        ]
+        for index, (business, (min_price, max_price)) in enumerate(zip(cls.businesses, cls.PRICES)):
+            # Denormalized columns, set directly; every score ties
+            Business.objects.filter(pk=business.pk).update(
+                min_service_price=min_price,
+                max_service_price=max_price,
+                is_featured=index % 4 == 0,
+            )
+            business.refresh_from_db()
+
+    def setUp(self):
+        cache.clear()
+
+    def get_list(self, **params):
+        return self.client.get(
+            reverse('businesses:business_list'), {'category': self.category.id, **params}
+        )
+
+    def get_ids(self, page_size, **params):
+        """Ids of every page, following next links"""
+        response = self.get_list(page_size=page_size, **params)
+        ids = []
+        while True:
+            self.assertEqual(response.status_code, 200)
+            data = json.loads(response.content)
+            self.assertLessEqual(len(data['results']), page_size)
+            ids.extend(business['id'] for business in data['results'])
+            if not data['next']:
+                return ids
+            response = self.client.get(data['next'])
+
+    def assertPages(self, expected, **params):
+        for page_size in (1, 2, 3, 5, 50):
+            with self.subTest(page_size=page_size):
+                self.assertEqual(self.get_ids(page_size, **params), expected)
+
+    def test_default_order_with_ties(self):
+        expected = [
+            business.id for business in sorted(
+                self.businesses, key=lambda business: (not business.is_featured, business.id)
+            )
+        ]
+        self.assertPages(expected)
+
+    def test_price_low_with_nulls_last(self):
+        expected = [
+            business.id for business in sorted(
+                self.businesses,
+                key=lambda business: (
+                    business.min_service_price is None,
+                    business.min_service_price or 0,
+                    business.id,
+                ),
+            )
+        ]
+        self.assertPages(expected, sort='price_low')
+
+    def test_price_high_with_nulls_last(self):
+        expected = [
+            business.id for business in sorted(
+                self.businesses,
+                key=lambda business: (
+                    business.max_service_price is None,
+                    -(business.max_service_price or 0),
+                    business.id,
+                ),
+            )
+        ]
+        self.assertPages(expected, sort='price_high')
+
+    def get_paginated_ids(self, page_size, *ordering):
+        """Ids of every page of the businesses in `ordering`, paginated directly"""
+        queryset = Business.objects.filter(category=self.category).order_by(*ordering)
+        params = {'page_size': page_size}
+        ids = []
+        while True:
+            pagination = KeysetPagination()
+            request = Request(APIRequestFactory().get('/', params))
+            ids.extend(business.id for business in pagination.paginate_queryset(queryset, request))
+            if not pagination.has_next:
+                return ids
+            params['cursor'] = pagination.encode_cursor(pagination.last_row)
+
+    def test_default_nulls_placement(self):
+        # PostgreSQL sorts nulls last ascending and first descending
+        for field, ordering, nulls_first, sign in (
+            ('min_service_price', 'min_service_price', False, 1),
+            ('max_service_price', '-max_service_price', True, -1),
+            ('max_service_price', F('max_service_price').desc(), True, -1),
+            ('min_service_price', F('min_service_price').asc(nulls_first=True), True, 1),
+        ):
+            expected = [
+                business.id for business in sorted(
+                    self.businesses,
+                    key=lambda business: (
+                        (getattr(business, field) is None) != nulls_first,
+                        sign * (getattr(business, field) or 0),
+                        business.id,
+                    ),
+                )
+            ]
+            for page_size in (1, 2, 3, 5, 50):
+                with self.subTest(ordering=ordering, page_size=page_size):
+                    self.assertEqual(self.get_paginated_ids(page_size, ordering), expected)
+
+    def test_pages_do_not_shift_when_businesses_are_added(self):
+        data = json.loads(self.get_list(sort='price_low', page_size=4).content)
+        first_page = [business['id'] for business in data['results']]
+
+        # Sorts before the cursor
+        added = create_business(
+            owner=self.businesses[0].owner,
+            category=self.category,
+            city=self.businesses[0].city,
+            name='سالن جدید',
+            slug='new-salon',
+        )
+        Business.objects.filter(pk=added.pk).update(min_service_price=50, max_service_price=50)
+
+        ids = first_page
+        while data['next']:
+            data = json.loads(self.client.get(data['next']).content)
+            ids.extend(business['id'] for business in data['results'])
+
+        self.assertNotIn(added.id, ids)
+        self.assertEqual(sorted(ids), sorted(business.id for business in self.businesses))
+
+    def test_rejects_cursor_not_matching_ordering(self):
+        for values in (['cheap', 1], [100], [100, 'x'], {'id': 1}):
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+            with self.subTest(values=values):
+                response = self.get_list(sort='price_low', cursor=cursor)
+                self.assertEqual(response.status_code, 404)
+
+        cursor = base64.urlsafe_b64encode(json.dumps([None, 1]).encode()).decode()
+        self.assertEqual(self.get_list(sort='price_low', cursor=cursor).status_code, 200)
+
+
+class ListingCacheKeyTests(SimpleTestCase):
+    """Only requests the views treat alike may share a cache entry"""
+
+    def assertSameKey(self, first, second):
+        self.assertEqual(normalize_params(QueryDict(first)), normalize_params(QueryDict(second)))
+
+    def assertDifferentKey(self, first, second):
+        self.assertNotEqual(normalize_params(QueryDict(first)), normalize_params(QueryDict(second)))
+
+    def test_order_and_blank_params_ignored(self):
+        self.assertSameKey('city=1&category=2', 'category=2&city=1&q=')
+
+    def test_values_kept_as_sent(self):
+        self.assertDifferentKey('min_price=1.0', 'min_price=1')
+        self.assertDifferentKey('q=a  b', 'q=a b')
+
+    def test_repeated_values_keep_their_order(self):
+        # The views read the last value
+        self.assertDifferentKey('sort=rating&sort=newest', 'sort=newest&sort=rating')
+        self.assertDifferentKey('sort=rating&sort=', 'sort=rating')
+
+    def test_values_cannot_spell_other_params(self):
+        self.assertDifferentKey('q=a%26city%3D1', 'q=a&city=1')
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class NearbyTests(TestCase):
+    """Near-me search must return exactly the businesses inside the circle"""
+
+    # Vanak square
+    LATITUDE = 35.7575
+    LONGITUDE = 51.4100
+
+    # Offsets in km (north, east) from the search point
+    OFFSETS = {
+        'here': (0, 0),
+        'north_3km': (3, 0),
+        'east_8km': (0, 8),
+        'corner_12km': (8.5, 8.5),
+        'south_20km': (-20, 0),
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.businesses = {}
+        shared = {}
+        for name, (north, east) in cls.OFFSETS.items():
+            latitude = cls.LATITUDE + math.degrees(north / EARTH_RADIUS_KM)
+            longitude = cls.LONGITUDE + math.degrees(
+                east / EARTH_RADIUS_KM / math.cos(math.radians(cls.LATITUDE))
+            )
+            business = create_business(
+                name=name,
+                slug=name.replace('_', '-'),
+                latitude=round(latitude, 6),
+                longitude=round(longitude, 6),
+                **shared,
+            )
+            shared = {'owner': business.owner, 'category': business.category, 'city': business.city}
+            cls.businesses[name] = business
+        cls.category = shared['category']
+
+    def setUp(self):
+        cache.clear()
+
+    def distance(self, business):
+        """Haversine distance in km from the search point, in Python"""
+        lat1, lng1 = math.radians(self.LATITUDE), math.radians(self.LONGITUDE)
+        lat2, lng2 = math.radians(business.latitude), math.radians(business.longitude)
+        a = (
+            math.sin((lat2 - lat1) / 2) ** 2
+            + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+        )
+        return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+    def nearby(self, radius_km):
+        queryset = filter_nearby(
+            Business.objects.filter(category=self.category), self.LATITUDE, self.LONGITUDE, radius_km
+        )
+        return {business.name: business.distance for business in queryset}
+
+    def test_geohash(self):
+        self.assertEqual(encode_geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(self.businesses['here'].geohash, encode_geohash(self.LATITUDE, self.LONGITUDE))
+
+    def test_cover_contains_the_box(self):
+        box = bounding_box(self.LATITUDE, self.LONGITUDE, 10)
+        cells = covering_geohashes(box)
+        min_lat, max_lat, min_lng, max_lng = box
+
+        for row in range(11):
+            for column in range(11):
+                geohash = encode_geohash(
+                    min_lat + (max_lat - min_lat) * row / 10,
+                    min_lng + (max_lng - min_lng) * column / 10,
+                )
+                self.assertTrue(any(geohash.startswith(cell) for cell in cells), geohash)
+
+    def test_radius(self):
+        self.assertEqual(set(self.nearby(5)), {'here', 'north_3km'})
+        # The corner is inside the 10 km bounding box but outside the circle
+        self.assertEqual(set(self.nearby(10)), {'here', 'north_3km', 'east_8km'})
+        self.assertEqual(set(self.nearby(25)), set(self.OFFSETS))
+
+    def test_distances(self):
+        for name, distance in self.nearby(25).items():
+            with self.subTest(name=name):
+                self.assertAlmostEqual(distance, self.distance(self.businesses[name]), places=3)
+                north, east = self.OFFSETS[name]
+                self.assertAlmostEqual(distance, math.hypot(north, east), delta=0.05)
+
+    def test_list_nearest_first(self):
+        response = self.client.get(reverse('businesses:business_list'), {
+            'category': self.category.id,
+            'lat': self.LATITUDE,
+            'lng': self.LONGITUDE,
+            'radius': 10,
+        })
+
+        self.assertEqual(response.status_code, 200)
+        results = json.loads(response.content)['results']
+        self.assertEqual(
+            [business['id'] for business in results],
+            [self.businesses[name].id for name in ('here', 'north_3km', 'east_8km')],
+        )
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ServicePriceStatsTests(TestCase):
+    """The price range and service count on a business must follow its active services"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = create_business()
+        cls.other = create_business(
+            owner=cls.business.owner,
+            category=cls.business.category,
+            city=cls.business.city,
+            name='سالن دیگر',
+            slug='other-salon',
+        )
+
+    def add_service(self, price, **fields):
+        return Service.objects.create(
+            business=self.business,
+            name='کوتاهی مو',
+            price=price,
+            duration_minutes=30,
+            **fields,
+        )
+
+    def assertStats(self, business, min_price, max_price, count):
+        business.refresh_from_db()
+        self.assertEqual(
+            (business.min_service_price, business.max_service_price, business.active_services_count),
+            (min_price, max_price, count),
+        )
+
+    def test_create(self):
+        self.assertStats(self.business, None, None, 0)
+
+        self.add_service(300000)
+        self.add_service(100000)
+        self.add_service(50000, is_active=False)
+
+        self.assertStats(self.business, 100000, 300000, 2)
+
+    def test_price_change(self):
+        service = self.add_service(300000)
+        self.add_service(100000)
+
+        service.price = 800000
+        service.save(update_fields=['price'])
+
+        self.assertStats(self.business, 100000, 800000, 2)
+
+    def test_deactivate(self):
+        service = self.add_service(100000)
+        self.add_service(300000)
+
+        service.is_active = False
+        service.save()
+
+        self.assertStats(self.business, 300000, 300000, 1)
+
+    def test_delete(self):
+        service = self.add_service(100000)
+        self.add_service(300000)
+
+        service.delete()
+        self.assertStats(self.business, 300000, 300000, 1)
+
+        Service.objects.get(business=self.business).delete()
+        self.assertStats(self.business, None, None, 0)
+
+    def test_move_to_another_business(self):
+        service = self.add_service(100000)
+        self.add_service(300000)
+
+        service.business = self.other
+        service.save()
+
+        self.assertStats(self.business, 300000, 300000, 1)
+        self.assertStats(self.other, 100000, 100000, 1)
+
+    def test_price_filter(self):
+        self.add_service(100000)
+        self.add_service(300000)
+
+        def listed(**params):
+            response = self.client.get(
+                reverse('businesses:business_list'), {'category': self.business.category_id, **params}
+            )
+            return [business['id'] for business in json.loads(response.content)['results']]
+
+        self.assertEqual(listed(min_price=250000), [self.business.id])
+        self.assertEqual(listed(max_price=150000), [self.business.id])
+        self.assertEqual(listed(min_price=350000), [])
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class FacetTests(TestCase):
+    """Every facet must count the filtered businesses as a separate GROUP BY would"""
+
+    # (category, area, gender_target, average_rating) per business
+    BUSINESSES = [
+        ('women', 'vanak', 'female', '4.60'),
+        ('women', 'vanak', 'female', '3.20'),
+        ('women', 'tajrish', 'unisex', '4.10'),
+        ('men', 'tajrish', 'male', '2.50'),
+        ('men', None, 'male', '0.00'),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.city = City.objects.create(name='شیراز', slug='shiraz', province='فارس')
+        cls.categories = {
+            'women': Category.objects.create(name='آرایشگاه زنانه', slug='women-salon'),
+            'men': Category.objects.create(name='آرایشگاه مردانه', slug='men-salon'),
+        }
+        cls.areas = {
+            slug: Area.objects.create(city=cls.city, name=slug, slug=slug)
+            for slug in ('vanak', 'tajrish')
+        }
+
+        owner = None
+        for index, (category, area, gender_target, rating) in enumerate(cls.BUSINESSES):
+            business = create_business(
+                owner=owner,
+                category=cls.categories[category],
+                city=cls.city,
+                area=cls.areas.get(area),
+                gender_target=gender_target,
+                name=f'سالن {index}',
+                slug=f'salon-{index}',
+            )
+            Business.objects.filter(pk=business.pk).update(average_rating=rating)
+            owner = business.owner
+
+    def setUp(self):
+        cache.clear()
+
+    def test_counts(self):
+        facets = get_facets(Business.objects.filter(city=self.city))
+
+        women, men = self.categories['women'], self.categories['men']
+        self.assertEqual(facets['category'], [
+            {'id': women.id, 'name': women.name, 'count': 3},
+            {'id': men.id, 'name': men.name, 'count': 2},
+        ])
+        self.assertEqual(facets['city'], [{'id': self.city.id, 'name': self.city.name, 'count': 5}])
+        # Businesses without an area are left out
+        self.assertCountEqual(facets['area'], [
+            {'id': area.id, 'name': area.name, 'count': 2} for area in self.areas.values()
+        ])
+        self.assertCountEqual(facets['gender_target'], [
+            {'value': 'female', 'count': 2},
+            {'value': 'male', 'count': 2},
+            {'value': 'unisex', 'count': 1},
+        ])
+        self.assertEqual(facets['rating'], [
+            {'min_rating': 4, 'count': 2},
+            {'min_rating': 3, 'count': 3},
+            {'min_rating': 2, 'count': 4},
+            {'min_rating': 1, 'count': 4},
+        ])
+
+    def test_no_businesses(self):
+        facets = get_facets(Business.objects.none())
+
+        for facet in ('category', 'city', 'area', 'gender_target'):
+            self.assertEqual(facets[facet], [])
+        self.assertEqual([bucket['count'] for bucket in facets['rating']], [0, 0, 0, 0])
+
+    def test_list_counts_the_filtered_result(self):
+        response = self.client.get(reverse('businesses:business_list'), {
+            'city': self.city.id,
+            'gender_target': 'male',
+            'facets': 'true',
+            'page_size': 1,
+        })
+
+        self.assertEqual(response.status_code, 200)
+        facets = json.loads(response.content)['facets']
+        # The whole result, not just the page
+        self.assertEqual(facets['category'], [
+            {'id': self.categories['men'].id, 'name': self.categories['men'].name, 'count': 2},
+        ])
+        self.assertEqual(facets['gender_target'], [{'value': 'male', 'count': 2}])
+        self.assertEqual(facets['rating'][2], {'min_rating': 2, 'count': 1})
+
+
+class PrefixIndexTests(SimpleTestCase):
+    """Suggestions must match word starts, heaviest first"""
+
+    def setUp(self):
+        self.index = PrefixIndex([
+            ({'id': 1, 'label': 'سالن آزاده'}, 5),
+            ({'id': 2, 'label': 'آرایشگاه آزیتا'}, 9),
+            ({'id': 3, 'label': 'باربرشاپ آزاد'}, 1),
+        ])
+
+    def search(self, prefix, limit=5):
+        return [suggestion['id'] for suggestion in self.index.search(prefix, limit)]
+
+    def test_short_prefix(self):
+        self.assertEqual(self.search('آز'), [2, 1, 3])
+        self.assertEqual(self.search('آز', limit=2), [2, 1])
+
+    def test_long_prefix(self):
+        self.assertEqual(self.search('آزاد'), [1, 3])
+        self.assertEqual(self.search('آزاده'), [1])
+        self.assertEqual(self.search('آزادی'), [])
+
+    def test_only_word_starts(self):
+        self.assertEqual(self.search('لن'), [])
+        self.assertEqual(self.search('سالن آ'), [1])
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class AutocompleteTests(TestCase):
+    """The autocomplete endpoint must follow business changes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = create_business(name='سالن کیمیا')
+
+    def setUp(self):
+        cache.clear()
+        autocomplete._index = None
+        self.addCleanup(setattr, autocomplete, '_index', None)
+
+    def suggest(self, text):
+        response = self.client.get(reverse('businesses:autocomplete'), {'q': text})
+        self.assertEqual(response.status_code, 200)
+        return [suggestion['label'] for suggestion in json.loads(response.content)['businesses']]
+
+    def test_arabic_letters_match(self):
+        self.assertEqual(self.suggest('كيم'), ['سالن کیمیا'])
+
+    def test_rebuilt_after_a_change(self):
+        self.assertEqual(self.suggest('کیمیا'), ['سالن کیمیا'])
+
+        self.business.name = 'سالن کیمیای نو'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.business.save()
+
+        with mock.patch.object(autocomplete, 'REBUILD_INTERVAL', 0):
+            self.assertEqual(self.suggest('کیمیا'), ['سالن کیمیای نو'])
+
+
+class NormalizeTextTests(SimpleTestCase):
+    """Ways of typing the same Persian text must normalize alike"""
+
+    def test_arabic_letters(self):
+        self.assertEqual(normalize_text('آرايشگاه كيانا'), 'آرایشگاه کیانا')
+        self.assertEqual(normalize_text('خانة'), 'خانه')
+
+    def test_digits(self):
+        self.assertEqual(normalize_text('پلاک ۱۲ و ٣٤'), 'پلاک 12 و 34')
+
+    def test_spacing_and_marks(self):
+        self.assertEqual(normalize_text(' می\u200cگل\xa0 '), 'می گل')
+        self.assertEqual(normalize_text('سـالُن'), 'سالن')
+        self.assertEqual(normalize_text('Nail  BAR'), 'nail bar')
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class PersianSearchTests(TestCase):
+    """Search must find businesses however the query letters, digits and spaces are typed"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.kiana = create_business(name='آرایشگاه کیانا', slug='kiana', description='شعبه ۲')
+        cls.migol = create_business(
+            owner=cls.kiana.owner,
+            category=cls.kiana.category,
+            city=cls.kiana.city,
+            name='سالن می\u200cگل',
+            slug='migol',
+        )
+        Service.objects.create(business=cls.migol, name='کراتینه مو', price=100000, duration_minutes=60)
+        cls.category = cls.kiana.category
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, text):
+        queryset = search_businesses(Business.objects.filter(category=self.category), text)
+        return {business.slug for business in queryset}
+
+    def test_arabic_letters(self):
+        self.assertEqual(self.search('آرايشگاه كيانا'), {'kiana'})
+
+    def test_word_separators(self):
+        for text in ('می گل', 'می\u200cگل', 'مي\u200cگل'):
+            with self.subTest(text=text):
+                self.assertEqual(self.search(text), {'migol'})
+
+    def test_digits_and_prefixes(self):
+        self.assertEqual(self.search('شعبه 2'), {'kiana'})
+        self.assertEqual(self.search('كراتي'), {'migol'})
+
+    def test_no_match(self):
+        self.assertEqual(self.search('ماساژ'), set())
+        self.assertEqual(self.search(' \u200c '), set())
+
+    def test_sql_matches_python(self):
+        text = ' آرايشگاه\u200cكيانا  ۱۲ NAIL '
+        normalized = Business.objects.annotate(
+            normalized=Normalized(Value(text))
+        ).values_list('normalized', flat=True)[:1].get()
+        self.assertEqual(normalized, normalize_text(text))
+
+    def test_list_search(self):
+        response = self.client.get(
+            reverse('businesses:business_list'), {'category': self.category.id, 'q': 'كيانا'}
+        )
+        results = json.loads(response.content)['results']
+        self.assertEqual([business['id'] for business in results], [self.kiana.id])
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class RankingTests(TestCase):
+    """Scores must weigh ratings by review count and favour recent bookings"""
+
+    PRIOR = 4.0
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.one_review = create_business(name='سالن 0', slug='salon-0')
+        shared = {
+            'owner': cls.one_review.owner,
+            'category': cls.one_review.category,
+            'city': cls.one_review.city,
+        }
+        cls.many_reviews = create_business(name='سالن 1', slug='salon-1', **shared)
+        cls.booked = create_business(name='سالن 2', slug='salon-2', **shared)
+        cls.category = cls.one_review.category
+        # Scored on save against whatever prior was cached; use the test's
+        update_ranking_scores(
+            [cls.one_review.id, cls.many_reviews.id, cls.booked.id], prior_rating=cls.PRIOR
+        )
+        cls.customer = create_user('09120000002')
+
+    def setUp(self):
+        cache.clear()
+        cache.set(PRIOR_RATING_KEY, self.PRIOR)
+
+    def set_rating(self, business, average_rating, total_reviews):
+        business.average_rating = average_rating
+        business.total_reviews = total_reviews
+        business.save(update_fields=['average_rating', 'total_reviews'])
+        business.refresh_from_db()
+
+    def add_booking(self, business, age_days, status='confirmed'):
+        service = Service.objects.filter(business=business).first() or Service.objects.create(
+            business=business, name='کوتاهی مو', price=100000, duration_minutes=60
+        )
+        booking = Booking.objects.create(
+            customer=self.customer,
+            business=business,
+            service=service,
+            date=timezone.now().date(),
+            time=time(10),
+            end_time=time(11),
+            duration_minutes=60,
+            status=status,
+        )
+        Booking.objects.filter(pk=booking.pk).update(
+            created_at=timezone.now() - timedelta(days=age_days)
+        )
+
+    def test_rating_score_weighs_review_count(self):
+        self.set_rating(self.one_review, '5.00', 1)
+        self.set_rating(self.many_reviews, '4.80', 100)
+
+        self.assertAlmostEqual(
+            self.one_review.rating_score, (PRIOR_REVIEWS * self.PRIOR + 5) / (PRIOR_REVIEWS + 1)
+        )
+        self.assertAlmostEqual(
+            self.many_reviews.rating_score,
+            (PRIOR_REVIEWS * self.PRIOR + 480) / (PRIOR_REVIEWS + 100),
+        )
+        self.assertGreater(self.many_reviews.rating_score, self.one_review.rating_score)
+
+        response = self.client.get(
+            reverse('businesses:business_list'), {'category': self.category.id, 'sort': 'rating'}
+        )
+        ids = [business['id'] for business in json.loads(response.content)['results']]
+        self.assertEqual(ids[:2], [self.many_reviews.id, self.one_review.id])
+
+    def test_recent_bookings_bonus(self):
+        self.add_booking(self.booked, 0)
+        self.add_booking(self.booked, 30)
+        # Cancelled, or outside the window: not counted
+        self.add_booking(self.booked, 0, status='cancelled')
+        self.add_booking(self.booked, 200)
+
+        update_ranking_scores([self.booked.id, self.many_reviews.id], prior_rating=self.PRIOR)
+        self.booked.refresh_from_db()
+        self.many_reviews.refresh_from_db()
+
+        # Same ratings: the bonus is the only difference
+        self.assertAlmostEqual(self.booked.rating_score, self.many_reviews.rating_score)
+        self.assertAlmostEqual(
+            self.booked.ranking_score - self.booked.rating_score,
+            BOOKINGS_WEIGHT * math.log(1 + 1 + 0.5),
+            places=3,
+        )
+        self.assertEqual(self.many_reviews.ranking_score, self.many_reviews.rating_score)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class BusinessPageETagTests(TestCase):
+    """A page must revalidate to 304 until something it shows changes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = create_business()
+        cls.url = reverse('businesses:business_page', args=[cls.business.id])
+
+    def setUp(self):
+        cache.clear()
+
+    def get_page(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(self.url, **headers)
+
+    def assertChangesETag(self, change):
+        etag = self.get_page()['ETag']
+        self.assertEqual(self.get_page(etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+
+        response = self.get_page(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        return json.loads(response.content)
+
+    def test_not_modified(self):
+        response = self.get_page()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+
+        response = self.get_page(response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_business_edit(self):
+        def rename():
+            self.business.name = 'سالن تازه'
+            self.business.save()
+
+        data = self.assertChangesETag(rename)
+        self.assertEqual(data['business']['name'], 'سالن تازه')
+
+    def test_new_service(self):
+        data = self.assertChangesETag(lambda: Service.objects.create(
+            business=self.business, name='مانیکور', price=200000, duration_minutes=30
+        ))
+        self.assertEqual([service['name'] for service in data['services']], ['مانیکور'])
+
+    def test_category_rename(self):
+        category = self.business.category
+
+        def rename():
+            category.name = 'سالن زیبایی'
+            category.save()
+
+        self.assertChangesETag(rename)
+
+    def test_hidden_business(self):
+        Business.objects.filter(pk=self.business.pk).update(status='suspended')
+        self.assertEqual(self.get_page().status_code, 404)
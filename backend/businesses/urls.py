@@ -9,7 +9,12 @@ from .views import (
     BusinessServicesView,
     BusinessStaffView,
     BusinessReviewsView,
-    get_available_slots
+    get_autocomplete,
+    get_business_page,
+    get_business_review_summary,
+    review_helpful,
+    get_available_slots,
+    get_available_days
 )
 
 app_name = 'businesses'
@@ -17,9 +22,14 @@ app_name = 'businesses'
 urlpatterns = [
     # Business URLs
     path('', BusinessListView.as_view(), name='business_list'),
+    path('autocomplete/', get_autocomplete, name='autocomplete'),
     path('<int:id>/', BusinessDetailView.as_view(), name='business_detail'),
+    path('<int:business_id>/page/', get_business_page, name='business_page'),
     path('<int:business_id>/services/', BusinessServicesView.as_view(), name='business_services'),
     path('<int:business_id>/staff/', BusinessStaffView.as_view(), name='business_staff'),
     path('<int:business_id>/reviews/', BusinessReviewsView.as_view(), name='business_reviews'),
+    path('<int:business_id>/reviews/summary/', get_business_review_summary, name='business_review_summary'),
+    path('reviews/<int:review_id>/helpful/', review_helpful, name='review_helpful'),
     path('<int:business_id>/available-slots/', get_available_slots, name='available_slots'),
+    path('<int:business_id>/available-days/', get_available_days, name='available_days'),
 ]
@@ -3,13 +3,24 @@ Business Views (Customer Facing) - FIXED VERSION
 """
 
 from rest_framework import generics, filters, permissions, status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q
+from django.db.models import F
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import parse_etags, quote_etag
 from datetime import datetime, timedelta
 
 from .models import Business, Staff, Category, City, Area
+from .autocomplete import DEFAULT_LIMIT as AUTOCOMPLETE_LIMIT, autocomplete
+from .facets import get_facets
+from .geo import DEFAULT_RADIUS_KM, filter_nearby
+from .listing_cache import CachedListMixin
+from .page import get_detail_queryset, get_page_data, get_page_etag
+from .pagination import KeysetPagination
+from .rendered_cache import RenderedCacheMixin
+from .search import search_businesses
 from .serializers import (
     BusinessListSerializer,
     BusinessDetailSerializer,
@@ -21,76 +32,97 @@ from .serializers import (
 from services.models import Service
 from services.serializers import ServiceListSerializer
 from reviews.models import Review
+from reviews.helpful import add_vote, remove_vote
 from reviews.serializers import ReviewListSerializer
+from reviews.stats import get_review_summary
+from bookings.availability import (
+    EARLIEST_SLOT_DAYS,
+    get_availability_calendar,
+    get_day_slots,
+    get_earliest_slots,
+)
 
 
-class CategoryListView(generics.ListAPIView):
+class CategoryListView(CachedListMixin, generics.ListAPIView):
     """List all categories"""
 
     queryset = Category.objects.filter(is_active=True)
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
+    cache_scopes = ("reference",)
 
 
-class CityListView(generics.ListAPIView):
+class CityListView(CachedListMixin, generics.ListAPIView):
     """List all cities"""
 
     queryset = City.objects.filter(is_active=True)
     serializer_class = CitySerializer
     permission_classes = [permissions.AllowAny]
+    cache_scopes = ("reference",)
 
 
-class AreaListView(generics.ListAPIView):
+class AreaListView(CachedListMixin, generics.ListAPIView):
     """List areas by city"""
 
     serializer_class = AreaSerializer
     permission_classes = [permissions.AllowAny]
+    cache_scopes = ("reference",)
 
     def get_queryset(self):
         city_id = self.kwargs.get("city_id")
         return Area.objects.filter(city_id=city_id, is_active=True)
 
 
-class BusinessListView(generics.ListAPIView):
+class BusinessListView(CachedListMixin, generics.ListAPIView):
     """Search and list businesses - FIXED"""
 
     serializer_class = BusinessListSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = KeysetPagination
+    # Text search is the indexed 'q' parameter; no default ordering, so
+    # relevance, distance and 'sort' orderings are kept
     filter_backends = [
         DjangoFilterBackend,
-        filters.SearchFilter,
         filters.OrderingFilter,
     ]
     filterset_fields = ["category", "city", "area", "gender_target"]
-    search_fields = ["name", "description"]
     ordering_fields = ["average_rating", "total_bookings", "created_at"]
-    ordering = ["-is_featured", "-average_rating"]
 
     def get_queryset(self):
         queryset = Business.objects.filter(
             is_active=True, status="approved", allow_online_booking=True
-        )
+        ).select_related("category", "city", "area__city")
 
-        # Handle 'q' parameter for search
+        # Handle 'q' parameter for search, best matches first unless sorted
         search_query = self.request.query_params.get("q")
+        sort_param = self.request.query_params.get("sort")
         if search_query:
-            queryset = queryset.filter(
-                Q(name__icontains=search_query) | Q(description__icontains=search_query)
-            )
+            queryset = search_businesses(queryset, search_query)
+            if not sort_param:
+                queryset = queryset.order_by("-relevance", "-average_rating")
+
+        # Handle 'lat'/'lng'/'radius' parameters, nearest first unless
+        # searching or sorted otherwise
+        location = self.get_location()
+        if location:
+            queryset = filter_nearby(queryset, *location)
+            if sort_param == "distance" or not (sort_param or search_query):
+                queryset = queryset.order_by("distance")
+        elif not (sort_param or search_query):
+            queryset = queryset.order_by("-is_featured", "-ranking_score")
 
         # Handle 'sort' parameter (custom sorting)
-        sort_param = self.request.query_params.get("sort")
         if sort_param:
             if sort_param == "popular":
-                queryset = queryset.order_by("-total_bookings", "-average_rating")
+                queryset = queryset.order_by("-ranking_score")
             elif sort_param == "rating":
-                queryset = queryset.order_by("-average_rating", "-total_reviews")
+                queryset = queryset.order_by("-rating_score")
             elif sort_param == "newest":
                 queryset = queryset.order_by("-created_at")
             elif sort_param == "price_low":
-                queryset = queryset.order_by("services__price")
+                queryset = queryset.order_by(F("min_service_price").asc(nulls_last=True), "id")
             elif sort_param == "price_high":
-                queryset = queryset.order_by("-services__price")
+                queryset = queryset.order_by(F("max_service_price").desc(nulls_last=True), "id")
 
         # Handle 'featured' parameter
         featured = self.request.query_params.get("featured")
@@ -105,63 +137,135 @@ class BusinessListView(generics.ListAPIView):
             except (ValueError, TypeError):
                 pass
 
-        # Filter by price range
+        # Filter by price range: businesses with active services priced
+        # within it, from the denormalized price range
         min_price = self.request.query_params.get("min_price")
         max_price = self.request.query_params.get("max_price")
-        if min_price or max_price:
-            service_filters = Q(services__is_active=True)
-            if min_price:
-                try:
-                    service_filters &= Q(services__price__gte=int(min_price))
-                except (ValueError, TypeError):
-                    pass
-            if max_price:
-                try:
-                    service_filters &= Q(services__price__lte=int(max_price))
-                except (ValueError, TypeError):
-                    pass
-            queryset = queryset.filter(service_filters).distinct()
-
-        # Apply distinct to avoid duplicates
-        queryset = queryset.distinct()
+        if min_price:
+            try:
+                queryset = queryset.filter(max_service_price__gte=int(min_price))
+            except (ValueError, TypeError):
+                pass
+        if max_price:
+            try:
+                queryset = queryset.filter(min_service_price__lte=int(max_price))
+            except (ValueError, TypeError):
+                pass
 
         return queryset
 
-    def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
+    def get_location(self):
+        try:
+            latitude = float(self.request.query_params["lat"])
+            longitude = float(self.request.query_params["lng"])
+            radius = float(self.request.query_params.get("radius", DEFAULT_RADIUS_KM))
+        except (KeyError, ValueError, TypeError):
+            return None
+
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180) or radius <= 0:
+            return None
 
-        # Handle 'limit' parameter
-        limit = self.request.query_params.get("limit")
-        if limit:
+        return latitude, longitude, radius
+
+    def get_service_category(self):
+        service_category = self.request.query_params.get("service_category")
+        try:
+            return int(service_category) if service_category else None
+        except (ValueError, TypeError):
+            return None
+
+    def get_availability_window(self):
+        now = timezone.now()
+
+        if self.request.query_params.get("available") == "today":
+            end_of_day = timezone.localtime(now).replace(hour=23, minute=59)
+            return now, end_of_day
+
+        hours = self.request.query_params.get("available_within")
+        if hours:
             try:
-                queryset = queryset[: int(limit)]
-            except (ValueError, TypeError):
+                return now, now + timedelta(hours=int(hours))
+            except (ValueError, TypeError, OverflowError):
                 pass
 
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return None
+
+    def get_row_filter(self):
+        """
+        Availability filter ('available=today' or 'available_within=<hours>'),
+        applied by the paginator to batches of filtered rows until the
+        page is full
+        """
+        window = self.get_availability_window()
+        if not window:
+            return None
+
+        self.earliest_slots = {}
+
+        def available(businesses):
+            earliest = get_earliest_slots(businesses, *window, self.get_service_category())
+            self.earliest_slots.update(earliest)
+            return [business for business in businesses if business.id in earliest]
+
+        return available
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["earliest_slots"] = getattr(self, "earliest_slots", {})
+        return context
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+
+        # Keyset page; 'limit' is accepted as the page size
+        businesses = self.paginate_queryset(queryset)
+
+        # Earliest slot badge for every card, in a fixed number of queries
+        if not hasattr(self, "earliest_slots"):
+            now = timezone.now()
+            self.earliest_slots = get_earliest_slots(
+                businesses,
+                now,
+                now + timedelta(days=EARLIEST_SLOT_DAYS),
+                self.get_service_category(),
+            )
 
+        serializer = self.get_serializer(businesses, many=True)
+        response = self.get_paginated_response(serializer.data)
 
-class BusinessDetailView(generics.RetrieveAPIView):
+        # Sidebar counts for the whole filtered result ('facets=true')
+        if request.query_params.get("facets") in ("true", "1"):
+            response.data["facets"] = get_facets(queryset)
+
+        return response
+
+
+class BusinessDetailView(RenderedCacheMixin, generics.RetrieveAPIView):
     """Get business detail"""
 
-    queryset = Business.objects.filter(is_active=True, status="approved")
     serializer_class = BusinessDetailSerializer
     permission_classes = [permissions.AllowAny]
     lookup_field = "id"
+    rendered_cache_kind = "detail"
+    business_lookup_kwarg = "id"
 
+    def get_queryset(self):
+        return get_detail_queryset()
 
-class BusinessServicesView(generics.ListAPIView):
+
+class BusinessServicesView(RenderedCacheMixin, generics.ListAPIView):
     """List business services"""
 
     serializer_class = ServiceListSerializer
     permission_classes = [permissions.AllowAny]
+    rendered_cache_kind = "services"
+    rendered_cache_params = ("page",)
 
     def get_queryset(self):
         business_id = self.kwargs.get("business_id")
-        return Service.objects.filter(business_id=business_id, is_active=True).order_by(
-            "-is_popular", "order", "name"
-        )
+        return Service.objects.filter(
+            business_id=business_id, is_active=True
+        ).select_related("service_category").order_by("-is_popular", "order", "name")
 
 
 class BusinessStaffView(generics.ListAPIView):
@@ -191,6 +295,114 @@ class BusinessReviewsView(generics.ListAPIView):
         return Review.objects.filter(business_id=business_id, is_approved=True)
 
 
+@api_view(["GET"])
+@permission_classes([permissions.AllowAny])
+def get_business_review_summary(request, business_id):
+    """
+    Star histogram, sub-rating averages, verified share and response
+    rate of a business's reviews, read from its review stats row
+    """
+    business = Business.objects.filter(
+        id=business_id, is_active=True, status="approved"
+    ).select_related("review_stats").first()
+
+    if business is None:
+        return Response(
+            {"error": "Business not found"}, status=status.HTTP_404_NOT_FOUND
+        )
+
+    stats = getattr(business, "review_stats", None)
+    return Response(get_review_summary(stats))
+
+
+@api_view(["POST", "DELETE"])
+def review_helpful(request, review_id):
+    """
+    Mark a review helpful (POST) or take the vote back (DELETE).
+    Repeating either changes nothing; helpful_count follows within seconds.
+    """
+    review = Review.objects.filter(id=review_id, is_approved=True).only("id", "customer_id").first()
+    if review is None:
+        return Response(
+            {"error": "Review not found"}, status=status.HTTP_404_NOT_FOUND
+        )
+
+    if review.customer_id == request.user.id:
+        return Response(
+            {"error": "You cannot vote on your own review"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    if request.method == "POST":
+        created = add_vote(review, request.user)
+        return Response(
+            {"helpful": True},
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+    remove_vote(review, request.user)
+    return Response({"helpful": False})
+
+
+@api_view(["GET"])
+@authentication_classes([])
+@permission_classes([permissions.AllowAny])
+def get_business_page(request, business_id):
+    """
+    Everything the salon page shows in one request: detail, active
+    services, bookable staff and the first page of reviews. Answers 304
+    when If-None-Match matches, without loading the page.
+    """
+    etag = get_page_etag(business_id)
+    if etag is None:
+        return Response(
+            {"error": "Business not found"}, status=status.HTTP_404_NOT_FOUND
+        )
+
+    if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+    if quote_etag(etag) in if_none_match or "*" in if_none_match:
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        business = get_detail_queryset().get(id=business_id)
+        services, staff, reviews = get_page_data(business)
+        context = {"request": request}
+
+        reviews_next = None
+        if business.total_reviews > len(reviews):
+            reviews_next = request.build_absolute_uri(
+                reverse("businesses:business_reviews", args=[business_id]) + "?page=2"
+            )
+
+        response = Response({
+            "business": BusinessDetailSerializer(business, context=context).data,
+            "services": ServiceListSerializer(services, many=True, context=context).data,
+            "staff": StaffSerializer(staff, many=True, context=context).data,
+            "reviews": {
+                "count": business.total_reviews,
+                "next": reviews_next,
+                "results": ReviewListSerializer(reviews, many=True, context=context).data,
+            },
+        })
+
+    response["ETag"] = quote_etag(etag)
+    # Cacheable, but revalidated on every visit
+    response["Cache-Control"] = "no-cache"
+    return response
+
+
+@api_view(["GET"])
+@permission_classes([permissions.AllowAny])
+def get_autocomplete(request):
+    """Search box suggestions: business, service, category and area names"""
+    text = request.query_params.get("q", "")
+    try:
+        limit = max(int(request.query_params.get("limit", AUTOCOMPLETE_LIMIT)), 1)
+    except (ValueError, TypeError):
+        limit = AUTOCOMPLETE_LIMIT
+
+    return Response(autocomplete(text, limit))
+
+
 @api_view(["GET"])
 @permission_classes([permissions.AllowAny])
 def get_available_slots(request, business_id):
@@ -231,50 +443,66 @@ def get_available_slots(request, business_id):
                 {"error": "Invalid staff"}, status=status.HTTP_400_BAD_REQUEST
             )
 
-    # Generate time slots
-    from bookings.models import Booking
-
-    slots = []
-    slot_duration = business.slot_duration_minutes
-    service_duration = service.duration_minutes
-
-    # Get business hours
-    start_time = business.opens_at
-    end_time = business.closes_at
-
-    # Check if date is closed
-    weekday = booking_date.weekday()
-    if weekday in business.closed_days:
-        return Response({"slots": []})
-
-    # Generate all possible slots
-    current_time = datetime.combine(booking_date, start_time)
-    end_datetime = datetime.combine(booking_date, end_time)
-
-    while current_time < end_datetime:
-        slot_end = current_time + timedelta(minutes=service_duration)
-
-        # Check if slot is within business hours
-        if slot_end.time() <= end_time:
-            # Check for existing bookings
-            overlapping = Booking.objects.filter(
-                business=business,
-                date=booking_date,
-                status__in=["pending", "confirmed"],
-                is_cancelled=False,
-                time__lt=slot_end.time(),
-                end_time__gt=current_time.time(),
-            )
+    return Response({"slots": get_day_slots(business, service, booking_date, staff)})
 
-            if staff:
-                overlapping = overlapping.filter(staff=staff)
 
-            is_available = not overlapping.exists()
+@api_view(["GET"])
+@permission_classes([permissions.AllowAny])
+def get_available_days(request, business_id):
+    """Get availability for a range of days (for the booking calendar)"""
+    try:
+        business = Business.objects.get(id=business_id)
+    except Business.DoesNotExist:
+        return Response(
+            {"error": "Business not found"}, status=status.HTTP_404_NOT_FOUND
+        )
 
-            slots.append(
-                {"time": current_time.strftime("%H:%M"), "available": is_available}
+    # Get parameters
+    service_id = request.query_params.get("service")
+    staff_id = request.query_params.get("staff")
+    start_str = request.query_params.get("start")
+    end_str = request.query_params.get("end")
+    counts_only = request.query_params.get("mode") == "count"
+
+    if not service_id or not start_str or not end_str:
+        return Response(
+            {"error": "service, start and end are required"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        service = Service.objects.get(id=service_id, business=business)
+        start_date = datetime.strptime(start_str, "%Y-%m-%d").date()
+        end_date = datetime.strptime(end_str, "%Y-%m-%d").date()
+    except (Service.DoesNotExist, ValueError):
+        return Response(
+            {"error": "Invalid service or dates"}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    if end_date < start_date:
+        return Response(
+            {"error": "end must not be before start"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    if end_date - start_date > timedelta(days=business.booking_advance_days):
+        return Response(
+            {"error": f"Range cannot exceed {business.booking_advance_days} days"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    # Get staff if specified
+    staff = None
+    if staff_id:
+        try:
+            staff = Staff.objects.get(id=staff_id, business=business)
+        except Staff.DoesNotExist:
+            return Response(
+                {"error": "Invalid staff"}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        current_time += timedelta(minutes=slot_duration)
+    days = get_availability_calendar(
+        business, service, start_date, end_date, staff, counts_only=counts_only
+    )
 
-    return Response({"slots": slots})
+    return Response({"days": days})
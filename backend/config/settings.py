@@ -26,6 +26,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # Third party apps
     'rest_framework',
@@ -193,6 +194,34 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    'precompute-availability': {
+        'task': 'bookings.tasks.precompute_availability',
+        'schedule': timedelta(hours=1),
+    },
+    'update-ranking-scores': {
+        'task': 'businesses.tasks.update_ranking_scores',
+        'schedule': timedelta(hours=1),
+    },
+    'flush-helpful-votes': {
+        'task': 'reviews.tasks.flush_helpful_votes',
+        'schedule': timedelta(seconds=10),
+    },
+}
+
+# Cache (availability, listings)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('CACHE_URL', default='redis://localhost:6379/1'),
+        'KEY_PREFIX': 'salonify',
+    }
+}
+
+# Availability
+# Recompute a day's availability in the background when it changes
+AVAILABILITY_PRECOMPUTE = config('AVAILABILITY_PRECOMPUTE', default=False, cast=bool)
+AVAILABILITY_PRECOMPUTE_CHUNK_SIZE = 50
 
 # SMS Configuration
 SMS_API_KEY = config('SMS_API_KEY', default='')
@@ -209,3 +238,4 @@ EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
 # Booking Settings
 BOOKING_CANCELLATION_HOURS = 24  # Hours before appointment to allow cancellation
 BOOKING_REMINDER_HOURS = 2  # Hours before appointment to send reminder
+BOOKING_LOCK_TIMEOUT_MS = 3000  # Longest wait for a staff day locked by another booking
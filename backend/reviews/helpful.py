@@ -0,0 +1,205 @@
+"""
+Helpful Votes
+
+Votes are ReviewHelpful rows, unique per (review, user), so voting twice
+or taking back a vote that isn't there changes nothing.
+
+Review.helpful_count isn't updated per vote, which would queue the
+voters of a popular review on its row lock. Each counted vote appends
+(review_id, +1 or -1) to a log in the cache instead, and
+flush_helpful_votes() (every few seconds, see reviews.tasks) sums the
+log and applies it in one UPDATE per batch of reviews.
+
+Log entries are numbered by a counter and the flush remembers the last
+number it applied. An entry missing below the counter is still being
+written, so the flush stops there and retries; if it is still missing on
+the next flush it was evicted and is skipped. recount_helpful_counts()
+rebuilds the counts from the votes for reconciliation, under the flush
+lock, and neutralises the log entries it covers so they aren't added
+again on top of it.
+"""
+import time
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+SEQUENCE_KEY = 'reviews:helpful:sequence'
+FLUSHED_KEY = 'reviews:helpful:flushed'
+MISSING_KEY = 'reviews:helpful:missing'
+FLUSH_LOCK_KEY = 'reviews:helpful:flush_lock'
+
+LOG_TIMEOUT = 24 * 60 * 60
+FLUSH_LOCK_TIMEOUT = 60
+FLUSH_LOCK_WAIT_STEP = 0.1
+FLUSH_BATCH_SIZE = 1000
+
+
+def _entry_key(number):
+    return f'reviews:helpful:log:{number}'
+
+
+def _next_number():
+    cache.add(SEQUENCE_KEY, 0, None)
+    try:
+        return cache.incr(SEQUENCE_KEY)
+    except ValueError:
+        # Evicted between add() and incr(); the flush restarts from 0
+        cache.set(SEQUENCE_KEY, 1, None)
+        return 1
+
+
+def record_vote(review_id, delta):
+    """Log a change to a review's helpful count once the transaction commits"""
+    def append():
+        cache.set(_entry_key(_next_number()), (review_id, delta), LOG_TIMEOUT)
+
+    transaction.on_commit(append)
+
+
+def add_vote(review, user):
+    """Mark a review helpful for a user; returns False if they already had"""
+    from .models import ReviewHelpful
+
+    _, created = ReviewHelpful.objects.get_or_create(review=review, user=user)
+    if created:
+        record_vote(review.pk, 1)
+    return created
+
+
+def remove_vote(review, user):
+    """Take back a user's vote; returns False if there was none"""
+    from .models import ReviewHelpful
+
+    deleted, _ = ReviewHelpful.objects.filter(review=review, user=user).delete()
+    if deleted:
+        record_vote(review.pk, -1)
+    return bool(deleted)
+
+
+def _read_log(flushed, last):
+    """
+    Sum the log entries after `flushed` up to `last`; returns
+    ({review_id: delta}, last number read)
+    """
+    deltas = defaultdict(int)
+    done = flushed
+
+    for start in range(flushed + 1, last + 1, FLUSH_BATCH_SIZE):
+        numbers = range(start, min(start + FLUSH_BATCH_SIZE, last + 1))
+        found = cache.get_many([_entry_key(number) for number in numbers])
+
+        for number in numbers:
+            entry = found.get(_entry_key(number))
+            if entry is None:
+                if cache.get(MISSING_KEY) != number:
+                    # Possibly still being written; retry next flush
+                    cache.set(MISSING_KEY, number, LOG_TIMEOUT)
+                    return deltas, done
+            else:
+                review_id, delta = entry
+                deltas[review_id] += delta
+            done = number
+
+    return deltas, done
+
+
+def _apply(deltas):
+    from .models import Review
+
+    review_ids = sorted(review_id for review_id, delta in deltas.items() if delta)
+
+    for start in range(0, len(review_ids), FLUSH_BATCH_SIZE):
+        batch = review_ids[start:start + FLUSH_BATCH_SIZE]
+        Review.objects.filter(pk__in=batch).update(
+            helpful_count=F('helpful_count') + Case(
+                *[When(pk=review_id, then=Value(deltas[review_id])) for review_id in batch],
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+        )
+
+    return len(review_ids)
+
+
+def _flush():
+    last = cache.get(SEQUENCE_KEY, 0)
+    flushed = cache.get(FLUSHED_KEY, 0)
+    if flushed > last:
+        # The counter was evicted and restarted
+        flushed = 0
+
+    deltas, done = _read_log(flushed, last)
+    updated = _apply(deltas)
+
+    cache.set(FLUSHED_KEY, done, None)
+    for start in range(flushed + 1, done + 1, FLUSH_BATCH_SIZE):
+        cache.delete_many([
+            _entry_key(number)
+            for number in range(start, min(start + FLUSH_BATCH_SIZE, done + 1))
+        ])
+
+    return updated
+
+
+def flush_helpful_votes():
+    """Apply the logged votes to helpful_count; returns the number of reviews updated"""
+    if not cache.add(FLUSH_LOCK_KEY, 1, FLUSH_LOCK_TIMEOUT):
+        # Another flush is running
+        return 0
+
+    try:
+        return _flush()
+    finally:
+        cache.delete(FLUSH_LOCK_KEY)
+
+
+def recount_helpful_counts(review_ids=None):
+    """
+    Set helpful_count from the votes themselves; returns rows updated.
+
+    Waits for a running flush, then flushes. Entries a flush couldn't
+    reach yet (behind a missing one) were logged after their votes
+    committed, so the recount counts them; they are set to a zero delta.
+    """
+    from .models import Review, ReviewHelpful
+
+    deadline = time.monotonic() + FLUSH_LOCK_TIMEOUT
+    while not cache.add(FLUSH_LOCK_KEY, 1, FLUSH_LOCK_TIMEOUT):
+        if time.monotonic() > deadline:
+            raise RuntimeError('Helpful vote flush lock is held')
+        time.sleep(FLUSH_LOCK_WAIT_STEP)
+
+    try:
+        last = cache.get(SEQUENCE_KEY, 0)
+        _flush()
+
+        votes = ReviewHelpful.objects.filter(
+            review=OuterRef('pk')
+        ).order_by().values('review').annotate(count=Count('id')).values('count')
+
+        reviews = Review.objects.all()
+        if review_ids is not None:
+            reviews = reviews.filter(pk__in=review_ids)
+
+        recounted = reviews.update(helpful_count=Coalesce(Subquery(votes), Value(0)))
+
+        scope = None if review_ids is None else set(review_ids)
+        flushed = cache.get(FLUSHED_KEY, 0)
+        for start in range(flushed + 1, last + 1, FLUSH_BATCH_SIZE):
+            keys = [
+                _entry_key(number)
+                for number in range(start, min(start + FLUSH_BATCH_SIZE, last + 1))
+            ]
+            covered = {
+                key: (review_id, 0)
+                for key, (review_id, delta) in cache.get_many(keys).items()
+                if delta and (scope is None or review_id in scope)
+            }
+            cache.set_many(covered, LOG_TIMEOUT)
+
+        return recounted
+    finally:
+        cache.delete(FLUSH_LOCK_KEY)
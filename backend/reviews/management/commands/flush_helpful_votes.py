@@ -0,0 +1,31 @@
+"""
+Django management command to apply buffered helpful votes to reviews
+Usage: python manage.py flush_helpful_votes [--recount]
+"""
+
+from django.core.management.base import BaseCommand
+
+from reviews.helpful import flush_helpful_votes, recount_helpful_counts
+
+
+class Command(BaseCommand):
+    help = 'Flush buffered helpful votes into review helpful counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recount',
+            action='store_true',
+            help='Afterwards, recount every review from its votes (pending votes are applied first)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('🔄 Flushing helpful votes...')
+        updated = flush_helpful_votes()
+        self.stdout.write(f'   Updated {updated} reviews')
+
+        if options['recount']:
+            self.stdout.write('🔄 Recounting helpful votes...')
+            recounted = recount_helpful_counts()
+            self.stdout.write(f'   Recounted {recounted} reviews')
+
+        self.stdout.write(self.style.SUCCESS('✅ Helpful counts are up to date'))
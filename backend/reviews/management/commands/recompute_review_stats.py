@@ -0,0 +1,31 @@
+"""
+Django management command to rebuild running review stats from reviews
+Usage: python manage.py recompute_review_stats [--business ID ...]
+"""
+
+from django.core.management.base import BaseCommand
+
+from businesses.listing_cache import invalidate_listings
+from businesses.ranking import update_ranking_scores
+from reviews.stats import recompute_review_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute review stats and business ratings from approved reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--business',
+            type=int,
+            action='append',
+            help='Only recompute this business (can be repeated)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('🔄 Recomputing review stats...')
+
+        count = recompute_review_stats(business_ids=options['business'])
+        update_ranking_scores(options['business'])
+        invalidate_listings('businesses')
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Rebuilt stats for {count} businesses'))
@@ -0,0 +1,77 @@
+# Generated by Django 5.0.1 on 2026-10-17 15:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, FloatField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce
+
+RATING_FIELDS = ['rating', 'service_quality', 'cleanliness', 'staff_behavior', 'value_for_money']
+
+
+def build_review_stats(apps, schema_editor):
+    """
+    Backfill review stats from approved reviews and copy the rating
+    totals to the businesses; a frozen copy of
+    reviews.stats.recompute_review_stats at this migration
+    """
+    Business = apps.get_model('businesses', 'Business')
+    Review = apps.get_model('reviews', 'Review')
+    ReviewStats = apps.get_model('reviews', 'ReviewStats')
+
+    totals = {}
+    for field in RATING_FIELDS:
+        totals[f'{field}_count'] = Count(field)
+        totals[f'{field}_sum'] = Coalesce(Sum(field), 0)
+
+    ReviewStats.objects.bulk_create(
+        [
+            ReviewStats(business_id=row.pop('business'), **row)
+            for row in Review.objects.filter(is_approved=True)
+            .order_by().values('business').annotate(**totals)
+        ],
+        batch_size=1000,
+    )
+
+    row = ReviewStats.objects.filter(business_id=OuterRef('pk'))
+    Business.objects.update(
+        total_reviews=Coalesce(Subquery(row.values('rating_count')), Value(0)),
+        average_rating=Coalesce(
+            Subquery(row.annotate(
+                average=Cast('rating_sum', FloatField()) / F('rating_count')
+            ).values('average')),
+            Value(0.0),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('businesses', '0006_business_ranking'),
+        ('reviews', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewStats',
+            fields=[
+                ('business', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='review_stats', serialize=False, to='businesses.business')),
+                ('rating_count', models.IntegerField(default=0)),
+                ('rating_sum', models.IntegerField(default=0)),
+                ('service_quality_count', models.IntegerField(default=0)),
+                ('service_quality_sum', models.IntegerField(default=0)),
+                ('cleanliness_count', models.IntegerField(default=0)),
+                ('cleanliness_sum', models.IntegerField(default=0)),
+                ('staff_behavior_count', models.IntegerField(default=0)),
+                ('staff_behavior_sum', models.IntegerField(default=0)),
+                ('value_for_money_count', models.IntegerField(default=0)),
+                ('value_for_money_sum', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Review Stats',
+                'verbose_name_plural': 'Review Stats',
+                'db_table': 'review_stats',
+            },
+        ),
+        migrations.RunPython(build_review_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.0.1 on 2026-10-17 15:17
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def build_review_summary(apps, schema_editor):
+    """Backfill the histogram, verified and answered counts of existing stats"""
+    Review = apps.get_model('reviews', 'Review')
+    ReviewStats = apps.get_model('reviews', 'ReviewStats')
+
+    def count(reviews):
+        return Coalesce(
+            Subquery(
+                reviews.filter(business=OuterRef('business_id'), is_approved=True)
+                .order_by()
+                .values('business')
+                .annotate(count=Count('id'))
+                .values('count')
+            ),
+            Value(0),
+        )
+
+    ReviewStats.objects.update(
+        **{
+            f'rating_{star}_count': count(Review.objects.filter(rating=star))
+            for star in range(1, 6)
+        },
+        verified_count=count(Review.objects.filter(is_verified=True)),
+        responded_count=count(Review.objects.exclude(response='')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0002_review_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reviewstats',
+            name='rating_1_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='reviewstats',
+            name='rating_2_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='reviewstats',
+            name='rating_3_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='reviewstats',
+            name='rating_4_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='reviewstats',
+            name='rating_5_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='reviewstats',
+            name='responded_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='reviewstats',
+            name='verified_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(build_review_summary, migrations.RunPython.noop),
+    ]
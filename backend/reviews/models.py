@@ -1,7 +1,7 @@
 """
 Review Models
 """
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MinValueValidator, MaxValueValidator
 from accounts.models import User
 from businesses.models import Business
@@ -91,14 +91,83 @@ class Review(models.Model):
         return f"Review by {self.customer.phone_number} for {self.business.name}"
     
     def save(self, *args, **kwargs):
+        from .stats import CONTRIBUTION_FIELDS, apply_review_change, get_state, get_stored_state
+        
         # Mark as verified if linked to a booking
         if self.booking and self.booking.status == 'completed':
             self.is_verified = True
         
-        super().save(*args, **kwargs)
+        # Update business rating by the change in this review's contribution
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not CONTRIBUTION_FIELDS & set(update_fields):
+            super().save(*args, **kwargs)
+            return
+        
+        with transaction.atomic():
+            previous = get_stored_state(self.pk) if self.pk else None
+            super().save(*args, **kwargs)
+            apply_review_change(previous, get_state(self))
+    
+    def delete(self, *args, **kwargs):
+        from .stats import apply_review_change, get_stored_state
+        
+        with transaction.atomic():
+            previous = get_stored_state(self.pk)
+            result = super().delete(*args, **kwargs)
+            apply_review_change(previous, None)
         
-        # Update business rating
-        self.business.update_stats()
+        return result
+
+
+class ReviewStats(models.Model):
+    """Running totals of a business's approved reviews (see reviews.stats)"""
+    
+    business = models.OneToOneField(
+        Business,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='review_stats'
+    )
+    
+    # Overall rating
+    rating_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    
+    # Detailed ratings (optional on a review, so counted separately)
+    service_quality_count = models.IntegerField(default=0)
+    service_quality_sum = models.IntegerField(default=0)
+    cleanliness_count = models.IntegerField(default=0)
+    cleanliness_sum = models.IntegerField(default=0)
+    staff_behavior_count = models.IntegerField(default=0)
+    staff_behavior_sum = models.IntegerField(default=0)
+    value_for_money_count = models.IntegerField(default=0)
+    value_for_money_sum = models.IntegerField(default=0)
+    
+    # Star histogram
+    rating_1_count = models.IntegerField(default=0)
+    rating_2_count = models.IntegerField(default=0)
+    rating_3_count = models.IntegerField(default=0)
+    rating_4_count = models.IntegerField(default=0)
+    rating_5_count = models.IntegerField(default=0)
+    
+    # Verified and answered reviews
+    verified_count = models.IntegerField(default=0)
+    responded_count = models.IntegerField(default=0)
+    
+    class Meta:
+        db_table = 'review_stats'
+        verbose_name = 'Review Stats'
+        verbose_name_plural = 'Review Stats'
+    
+    def __str__(self):
+        return f"Review stats for {self.business_id}"
+    
+    def get_average(self, field):
+        """Average of a rating field, or None without ratings"""
+        count = getattr(self, f'{field}_count')
+        if not count:
+            return None
+        return getattr(self, f'{field}_sum') / count
 
 
 class ReviewImage(models.Model):
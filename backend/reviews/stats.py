@@ -0,0 +1,201 @@
+"""
+Review Stats
+
+Running totals of each business's approved reviews, kept in
+ReviewStats: a count and a sum for the overall rating and every
+sub-rating, a count per star, and counts of verified and answered
+reviews. A review save or delete applies the difference between its
+stored and new contribution with F() arithmetic, in the same
+transaction, so updating a business's rating costs the same however
+many reviews it has. Edits that don't touch any of these are skipped.
+
+get_review_summary() turns a stats row into the review section summary.
+recompute_review_stats() rebuilds the totals from the reviews for
+reconciliation (see the recompute_review_stats command).
+"""
+from collections import defaultdict
+
+from django.apps import apps as global_apps
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    BooleanField,
+    Count,
+    ExpressionWrapper,
+    F,
+    FloatField,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Cast, Coalesce
+
+RATING_FIELDS = ['rating', 'service_quality', 'cleanliness', 'staff_behavior', 'value_for_money']
+SUB_RATING_FIELDS = RATING_FIELDS[1:]
+STARS = [5, 4, 3, 2, 1]
+
+# Review fields that change a review's contribution
+CONTRIBUTION_FIELDS = {
+    'business', 'business_id', 'is_approved', 'is_verified', 'response', *RATING_FIELDS
+}
+
+RECOMPUTE_BATCH_SIZE = 1000
+
+
+def get_state(review):
+    """The stats-relevant values of a review instance"""
+    state = {field: getattr(review, field) for field in RATING_FIELDS}
+    state['business_id'] = review.business_id
+    state['is_approved'] = review.is_approved
+    state['is_verified'] = review.is_verified
+    state['has_response'] = bool(review.response)
+    return state
+
+
+def get_stored_state(review_id):
+    """
+    The stats-relevant values of a review as stored, or None. Locks the
+    row, so call inside the transaction that saves the review; otherwise
+    two concurrent saves could both apply a delta from the same state.
+    """
+    from .models import Review
+
+    return Review.objects.select_for_update().filter(pk=review_id).values(
+        'business_id', 'is_approved', 'is_verified', *RATING_FIELDS,
+        has_response=ExpressionWrapper(~Q(response=''), output_field=BooleanField()),
+    ).first()
+
+
+def apply_review_change(previous, current):
+    """
+    Move a review's contribution from its previous state to its current
+    one (either may be None) and refresh the affected businesses'
+    ratings. Call inside the transaction that saves the review.
+    """
+    deltas = defaultdict(lambda: defaultdict(int))
+
+    for state, sign in ((previous, -1), (current, 1)):
+        if not state or not state['is_approved']:
+            continue
+        delta = deltas[state['business_id']]
+        for field in RATING_FIELDS:
+            if state[field] is not None:
+                delta[f'{field}_count'] += sign
+                delta[f'{field}_sum'] += sign * state[field]
+        delta[f'rating_{state["rating"]}_count'] += sign
+        if state['is_verified']:
+            delta['verified_count'] += sign
+        if state['has_response']:
+            delta['responded_count'] += sign
+
+    for business_id, delta in deltas.items():
+        delta = {field: value for field, value in delta.items() if value}
+        if delta:
+            apply_delta(business_id, delta)
+
+
+def apply_delta(business_id, delta):
+    """Add `delta` ({column: change}) to a business's stats and refresh its rating"""
+    from businesses.models import Business
+    from .models import ReviewStats
+
+    stats = ReviewStats.objects.filter(business_id=business_id)
+    changes = {field: F(field) + value for field, value in delta.items()}
+
+    if not stats.update(**changes):
+        try:
+            with transaction.atomic():
+                ReviewStats.objects.create(business_id=business_id, **delta)
+        except IntegrityError:
+            # Created concurrently
+            stats.update(**changes)
+
+    Business.objects.get(pk=business_id).update_stats()
+
+
+def recompute_review_stats(business_ids=None, apps=global_apps):
+    """
+    Rebuild stats from the approved reviews and copy the rating totals to
+    the businesses; returns the number of stats rows. The bulk writes
+    skip the model save hooks, so rendered pages of businesses whose
+    stats changed are invalidated here. Migrations pass their historical
+    `apps`.
+    """
+    from businesses.rendered_cache import invalidate_business
+
+    Business = apps.get_model('businesses', 'Business')
+    Review = apps.get_model('reviews', 'Review')
+    ReviewStats = apps.get_model('reviews', 'ReviewStats')
+
+    reviews = Review.objects.filter(is_approved=True)
+    businesses = Business.objects.all()
+    stats = ReviewStats.objects.all()
+    if business_ids is not None:
+        reviews = reviews.filter(business_id__in=business_ids)
+        businesses = businesses.filter(pk__in=business_ids)
+        stats = stats.filter(business_id__in=business_ids)
+
+    totals = {}
+    for field in RATING_FIELDS:
+        totals[f'{field}_count'] = Count(field)
+        totals[f'{field}_sum'] = Coalesce(Sum(field), 0)
+    for star in STARS:
+        totals[f'rating_{star}_count'] = Count('id', filter=Q(rating=star))
+    totals['verified_count'] = Count('id', filter=Q(is_verified=True))
+    totals['responded_count'] = Count('id', filter=~Q(response=''))
+
+    computed = {
+        row.pop('business'): row
+        for row in reviews.order_by().values('business').annotate(**totals)
+    }
+    rows = [ReviewStats(business_id=business_id, **row) for business_id, row in computed.items()]
+
+    with transaction.atomic():
+        stored = {row.pop('business_id'): row for row in stats.select_for_update().values()}
+        stats.delete()
+        ReviewStats.objects.bulk_create(rows, batch_size=RECOMPUTE_BATCH_SIZE)
+
+        row = ReviewStats.objects.filter(business_id=OuterRef('pk'))
+        businesses.update(
+            total_reviews=Coalesce(Subquery(row.values('rating_count')), Value(0)),
+            average_rating=Coalesce(
+                Subquery(row.annotate(
+                    average=Cast('rating_sum', FloatField()) / F('rating_count')
+                ).values('average')),
+                Value(0.0),
+            ),
+        )
+
+        for business_id in stored.keys() | computed.keys():
+            if stored.get(business_id) != computed.get(business_id):
+                invalidate_business(business_id)
+
+    return len(rows)
+
+
+def get_review_summary(stats):
+    """
+    Review section summary from a business's ReviewStats row (or None):
+    star histogram, sub-rating averages, verified share and response rate.
+    """
+    count = stats.rating_count if stats else 0
+
+    def share(value):
+        return round(value / count, 3) if count else None
+
+    def average(field):
+        value = stats.get_average(field) if stats else None
+        return round(value, 2) if value is not None else None
+
+    return {
+        'count': count,
+        'average': average('rating'),
+        'histogram': [
+            {'rating': star, 'count': getattr(stats, f'rating_{star}_count') if stats else 0}
+            for star in STARS
+        ],
+        'sub_ratings': {field: average(field) for field in SUB_RATING_FIELDS},
+        'verified_share': share(stats.verified_count) if stats else None,
+        'response_rate': share(stats.responded_count) if stats else None,
+    }
@@ -0,0 +1,12 @@
+"""
+Review Tasks
+"""
+from celery import shared_task
+
+from .helpful import flush_helpful_votes as flush_votes
+
+
+@shared_task(ignore_result=True)
+def flush_helpful_votes():
+    """Apply buffered helpful votes to review helpful counts"""
+    return flush_votes()
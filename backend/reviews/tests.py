@@ -0,0 +1,230 @@
+import json
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.forms.models import model_to_dict
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from businesses.page import get_page_etag
+from businesses.testing import LOCAL_CACHES, create_business, create_user
+from .helpful import _entry_key, add_vote, flush_helpful_votes, recount_helpful_counts, remove_vote
+from .models import Review, ReviewStats
+from .stats import recompute_review_stats
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ReviewStatsDeltaTests(TestCase):
+    """Running stats must match a full recompute after every kind of review change"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = create_business()
+        cls.other = create_business(
+            owner=cls.business.owner,
+            category=cls.business.category,
+            city=cls.business.city,
+            name='سالن دیگر',
+            slug='other-salon',
+        )
+        cls.customers = [create_user(f'0912000010{index}') for index in range(3)]
+
+    def add_review(self, customer, rating, is_approved=True, business=None, **fields):
+        return Review.objects.create(
+            customer=customer,
+            business=business or self.business,
+            rating=rating,
+            is_approved=is_approved,
+            **fields,
+        )
+
+    def get_stats(self, business):
+        stats = ReviewStats.objects.filter(business=business).first()
+        return model_to_dict(stats) if stats else None
+
+    def assertStatsConsistent(self):
+        """Compare the running stats of both businesses with a recompute"""
+        businesses = [self.business, self.other]
+        running = [self.get_stats(business) for business in businesses]
+
+        recompute_review_stats()
+        recomputed = [self.get_stats(business) for business in businesses]
+
+        for business, stats, expected in zip(businesses, running, recomputed):
+            # A business whose reviews all left keeps an all-zero row
+            if expected is None and stats is not None:
+                self.assertFalse(any(
+                    value for field, value in stats.items() if field != 'business'
+                ))
+            else:
+                self.assertEqual(stats, expected)
+
+    def assertRating(self, business, total_reviews, average_rating):
+        business.refresh_from_db()
+        self.assertEqual(business.total_reviews, total_reviews)
+        self.assertEqual(business.average_rating, Decimal(average_rating))
+
+    def test_approve(self):
+        review = self.add_review(self.customers[0], 4, is_approved=False, cleanliness=3)
+        self.add_review(self.customers[1], 5)
+        self.assertRating(self.business, 1, '5.00')
+
+        review.is_approved = True
+        review.save()
+
+        self.assertRating(self.business, 2, '4.50')
+        stats = ReviewStats.objects.get(business=self.business)
+        self.assertEqual(stats.rating_4_count, 1)
+        self.assertEqual(stats.cleanliness_count, 1)
+        self.assertStatsConsistent()
+
+    def test_unapprove(self):
+        review = self.add_review(self.customers[0], 2, is_verified=True)
+        self.add_review(self.customers[1], 4)
+
+        review.is_approved = False
+        review.save(update_fields=['is_approved'])
+
+        self.assertRating(self.business, 1, '4.00')
+        stats = ReviewStats.objects.get(business=self.business)
+        self.assertEqual(stats.rating_2_count, 0)
+        self.assertEqual(stats.verified_count, 0)
+        self.assertStatsConsistent()
+
+    def test_edit(self):
+        review = self.add_review(self.customers[0], 3, staff_behavior=2)
+        self.add_review(self.customers[1], 5)
+
+        review.rating = 1
+        review.staff_behavior = None
+        review.value_for_money = 4
+        review.response = 'ممنون از نظر شما'
+        review.save()
+
+        self.assertRating(self.business, 2, '3.00')
+        stats = ReviewStats.objects.get(business=self.business)
+        self.assertEqual((stats.rating_3_count, stats.rating_1_count), (0, 1))
+        self.assertEqual(stats.staff_behavior_count, 0)
+        self.assertEqual(stats.value_for_money_sum, 4)
+        self.assertEqual(stats.responded_count, 1)
+        self.assertStatsConsistent()
+
+    def test_edit_outside_stats_changes_nothing(self):
+        review = self.add_review(self.customers[0], 3)
+        before = self.get_stats(self.business)
+
+        review.comment = 'عالی بود'
+        review.helpful_count = 7
+        review.save()
+
+        self.assertEqual(self.get_stats(self.business), before)
+        self.assertStatsConsistent()
+
+    def test_delete(self):
+        review = self.add_review(self.customers[0], 1)
+        self.add_review(self.customers[1], 5)
+        self.add_review(self.customers[2], 4, is_approved=False)
+
+        review.delete()
+
+        self.assertRating(self.business, 1, '5.00')
+        self.assertStatsConsistent()
+
+    def test_delete_last_review(self):
+        self.add_review(self.customers[0], 4).delete()
+
+        self.assertRating(self.business, 0, '0.00')
+        self.assertStatsConsistent()
+
+    def test_move_to_another_business(self):
+        review = self.add_review(self.customers[0], 2, service_quality=5)
+        self.add_review(self.customers[1], 4)
+        self.add_review(self.customers[2], 5, business=self.other)
+
+        review.business = self.other
+        review.save()
+
+        self.assertRating(self.business, 1, '4.00')
+        self.assertRating(self.other, 2, '3.50')
+        self.assertEqual(
+            ReviewStats.objects.get(business=self.other).service_quality_sum, 5
+        )
+        self.assertStatsConsistent()
+
+    def test_recompute_refreshes_rendered_detail(self):
+        self.add_review(self.customers[0], 4)
+        self.add_review(self.customers[1], 2)
+        url = reverse('businesses:business_detail', args=[self.business.id])
+
+        # Drift the recompute has to repair, invisible to the save hooks
+        ReviewStats.objects.filter(business=self.business).update(rating_4_count=0)
+        summary = json.loads(self.client.get(url).content)['review_summary']
+        self.assertEqual(summary['histogram'][1], {'rating': 4, 'count': 0})
+        etag = get_page_etag(self.business.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recompute_review_stats([self.business.id])
+
+        summary = json.loads(self.client.get(url).content)['review_summary']
+        self.assertEqual(summary['histogram'][1], {'rating': 4, 'count': 1})
+        self.assertNotEqual(get_page_etag(self.business.id), etag)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class HelpfulVoteTests(TestCase):
+    """Logged votes must reach helpful_count exactly once"""
+
+    @classmethod
+    def setUpTestData(cls):
+        business = create_business()
+        cls.voters = [create_user(f'0912000010{index}') for index in range(3)]
+        cls.review = Review.objects.create(customer=business.owner, business=business, rating=5)
+
+    def setUp(self):
+        cache.clear()
+
+    def vote(self, *voters):
+        with self.captureOnCommitCallbacks(execute=True):
+            for voter in voters:
+                add_vote(self.review, voter)
+
+    def assertHelpfulCount(self, count):
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.helpful_count, count)
+
+    def test_flush(self):
+        self.vote(*self.voters)
+        with self.captureOnCommitCallbacks(execute=True):
+            remove_vote(self.review, self.voters[0])
+            self.assertFalse(add_vote(self.review, self.voters[1]))
+        self.assertHelpfulCount(0)
+
+        self.assertEqual(flush_helpful_votes(), 1)
+        self.assertHelpfulCount(2)
+
+        self.assertEqual(flush_helpful_votes(), 0)
+        self.assertHelpfulCount(2)
+
+    def test_recount_covers_pending_votes(self):
+        self.vote(self.voters[0])
+        flush_helpful_votes()
+        self.vote(self.voters[1], self.voters[2])
+
+        recount_helpful_counts()
+        self.assertHelpfulCount(3)
+
+        flush_helpful_votes()
+        self.assertHelpfulCount(3)
+
+    def test_recount_covers_votes_behind_a_missing_entry(self):
+        self.vote(*self.voters)
+        # The first entry is still being written, so a flush stops there
+        cache.delete(_entry_key(1))
+
+        recount_helpful_counts()
+        self.assertHelpfulCount(3)
+
+        # The second flush after it skips the missing entry and reads the rest
+        flush_helpful_votes()
+        flush_helpful_votes()
+        self.assertHelpfulCount(3)
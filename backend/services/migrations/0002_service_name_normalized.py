@@ -0,0 +1,58 @@
+# Generated by Django 5.0.1 on 2026-10-17 15:09
+
+from django.db import migrations, models
+from django.db.models import F, Func, TextField, Value
+
+# Frozen copy of businesses.normalization at this migration
+REPLACED = {
+    'ي': 'ی',
+    'ى': 'ی',
+    'ك': 'ک',
+    'ة': 'ه',
+    'ۀ': 'ه',
+    'أ': 'ا',
+    'إ': 'ا',
+    '۰': '0', '۱': '1', '۲': '2', '۳': '3', '۴': '4',
+    '۵': '5', '۶': '6', '۷': '7', '۸': '8', '۹': '9',
+    '٠': '0', '١': '1', '٢': '2', '٣': '3', '٤': '4',
+    '٥': '5', '٦': '6', '٧': '7', '٨': '8', '٩': '9',
+    '\u200c': ' ',  # zero width non-joiner
+    '\xa0': ' ',  # no-break space
+}
+REMOVED = ''.join(chr(code) for code in range(0x064B, 0x0653)) + '\u0670\u0640\u200d\u200e\u200f'
+
+
+class Normalized(Func):
+    function = 'TRANSLATE'
+    template = "LOWER(BTRIM(REGEXP_REPLACE(%(function)s(%(expressions)s), '\\s+', ' ', 'g')))"
+    output_field = TextField()
+
+    def __init__(self, expression, **extra):
+        super().__init__(
+            expression,
+            Value(''.join(REPLACED) + REMOVED),
+            Value(''.join(REPLACED.values())),
+            **extra,
+        )
+
+
+def normalize_names(apps, schema_editor):
+    """Backfill normalized service names"""
+    Service = apps.get_model('services', 'Service')
+    Service.objects.update(name_normalized=Normalized(F('name')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='name_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=200),
+        ),
+        migrations.RunPython(normalize_names, migrations.RunPython.noop),
+    ]
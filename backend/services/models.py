@@ -56,6 +56,7 @@ class Service(models.Model):
     
     # Basic Info
     name = models.CharField(max_length=200)
+    name_normalized = models.CharField(max_length=200, blank=True, db_index=True, editable=False)
     description = models.TextField(blank=True)
     
     # Pricing
@@ -113,6 +114,58 @@ class Service(models.Model):
     def __str__(self):
         return f"{self.business.name} - {self.name}"
     
+    def save(self, *args, **kwargs):
+        from businesses.listing_cache import invalidate_listings
+        from businesses.normalization import set_normalized_fields
+        from businesses.rendered_cache import invalidate_business
+        from businesses.search import update_search_vectors
+        
+        set_normalized_fields(self, ['name'], kwargs)
+        update_fields = kwargs.get('update_fields')
+        
+        # A service moved to another business leaves the old one's
+        # stats and search vector behind
+        previous_business_id = None
+        if self.pk and (update_fields is None or 'business' in update_fields):
+            previous_business_id = Service.objects.filter(pk=self.pk).values_list(
+                'business_id', flat=True
+            ).first()
+        if previous_business_id == self.business_id:
+            previous_business_id = None
+        
+        super().save(*args, **kwargs)
+        invalidate_business(self.business_id)
+        
+        # Price range shown and filtered on the business
+        if update_fields is None or {'price', 'is_active', 'business'} & set(update_fields):
+            self.business.update_service_stats()
+        
+        # Service names are part of the business search vector and
+        # autocomplete suggestions
+        if update_fields is None or {'name', 'is_active', 'business'} & set(update_fields):
+            update_search_vectors([self.business_id])
+            invalidate_listings('businesses')
+        
+        if previous_business_id is not None:
+            previous = Business.objects.get(pk=previous_business_id)
+            previous.update_service_stats()
+            update_search_vectors([previous_business_id])
+            invalidate_business(previous_business_id)
+    
+    def delete(self, *args, **kwargs):
+        from businesses.listing_cache import invalidate_listings
+        from businesses.rendered_cache import invalidate_business
+        from businesses.search import update_search_vectors
+        
+        business = self.business
+        result = super().delete(*args, **kwargs)
+        invalidate_business(business.id)
+        business.update_service_stats()
+        update_search_vectors([business.id])
+        invalidate_listings('businesses')
+        
+        return result
+    
     @property
     def final_price(self):
         """Return discounted price if available, otherwise regular price"""
@@ -147,3 +200,20 @@ class ServiceStaff(models.Model):
     
     def __str__(self):
         return f"{self.service.name} - {self.staff.name}"
+    
+    def save(self, *args, **kwargs):
+        from bookings.availability_cache import invalidate_calendar
+        from businesses.rendered_cache import invalidate_business
+        
+        super().save(*args, **kwargs)
+        invalidate_business(self.service.business_id)
+        invalidate_calendar(self.service.business_id)
+    
+    def delete(self, *args, **kwargs):
+        from bookings.availability_cache import invalidate_calendar
+        from businesses.rendered_cache import invalidate_business
+        
+        result = super().delete(*args, **kwargs)
+        invalidate_business(self.service.business_id)
+        invalidate_calendar(self.service.business_id)
+        return result
@@ -61,11 +61,17 @@ export const partnerAuthAPI = {
 // Business APIs
 export const businessAPI = {
   searchBusinesses: (params) => api.get('/businesses/', { params }),
+  autocomplete: (q) => api.get('/businesses/autocomplete/', { params: { q } }),
   getBusinessDetail: (id) => api.get(`/businesses/${id}/`),
+  getBusinessPage: (id) => api.get(`/businesses/${id}/page/`),
   getBusinessServices: (businessId) => api.get(`/businesses/${businessId}/services/`),
   getBusinessStaff: (businessId) => api.get(`/businesses/${businessId}/staff/`),
   getBusinessReviews: (businessId) => api.get(`/businesses/${businessId}/reviews/`),
+  getBusinessReviewSummary: (businessId) => api.get(`/businesses/${businessId}/reviews/summary/`),
+  markReviewHelpful: (reviewId) => api.post(`/businesses/reviews/${reviewId}/helpful/`),
+  unmarkReviewHelpful: (reviewId) => api.delete(`/businesses/reviews/${reviewId}/helpful/`),
   getAvailableSlots: (businessId, params) => api.get(`/businesses/${businessId}/available-slots/`, { params }),
+  getAvailableDays: (businessId, params) => api.get(`/businesses/${businessId}/available-days/`, { params }),
 };
 
 // Booking APIs